@@ -9,6 +9,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 from pathlib import Path
 import os
+import uuid
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 
@@ -150,6 +151,9 @@ class ETLPipeline:
         await self.create_districts_summary()
         await self.create_blocks_summary()
         
+        # Let running API servers know the dataset changed
+        await self.bump_dataset_generation()
+        
         # Print summary
         self.print_summary()
         
@@ -812,6 +816,22 @@ class ETLPipeline:
         
         print(f"  ✓ Created {count} block summaries")
     
+    async def bump_dataset_generation(self):
+        """Bump the shared dataset generation (see backend utils/dataset_state.py)"""
+        await self.db.dataset_state.update_one(
+            {"_id": "current"},
+            {
+                "$inc": {"generation": 1},
+                "$set": {
+                    "generation_id": uuid.uuid4().hex,
+                    "updated_at": datetime.now(timezone.utc),
+                    "last_collection": None
+                }
+            },
+            upsert=True
+        )
+        print("\n✓ Dataset generation bumped")
+    
     def print_summary(self):
         """Print ETL summary"""
         print("\n" + "=" * 60)
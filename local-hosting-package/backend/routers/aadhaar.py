@@ -7,9 +7,12 @@ import aiofiles
 import uuid
 from pathlib import Path
 import httpx
+import numpy as np
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state, metrics, snapshot
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/aadhaar", tags=["Aadhaar Analytics"])
+router = APIRouter(prefix="/aadhaar", tags=["Aadhaar Analytics"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -20,6 +23,36 @@ def init_db(database, uploads_dir):
     db = database
     UPLOADS_DIR = uploads_dir
 
+AADHAAR_SUM_FIELDS = [
+    "total_enrolment", "aadhaar_passed", "aadhaar_failed", "aadhaar_pending", "aadhaar_not_provided",
+    "name_match_verified", "mbu_pending_5_15", "mbu_pending_15_plus",
+]
+
+_EXCEPTION_TOTAL = {"$add": ["$aadhaar_failed", "$aadhaar_pending", "$aadhaar_not_provided"]}
+
+# Stored on every school at import; (scope, exception_rate) indexes back the high-risk reads
+metrics.register(
+    "aadhaar_analytics",
+    {
+        "exception_total": _EXCEPTION_TOTAL,
+        "exception_rate": {
+            "$multiply": [{"$divide": [_EXCEPTION_TOTAL, {"$max": ["$total_enrolment", 1]}]}, 100]
+        },
+    },
+    indexed=["exception_rate"],
+)
+
+# Overview, block-wise and high-risk reads answer from the in-process snapshot
+snapshot.register("aadhaar_analytics")
+
+def _exceptions(frame):
+    """Per-school failed + pending + not provided (snapshot path)"""
+    return (
+        snapshot.column(frame, "aadhaar_failed")
+        + snapshot.column(frame, "aadhaar_pending")
+        + snapshot.column(frame, "aadhaar_not_provided")
+    )
+
 @router.get("/overview")
 async def get_aadhaar_overview(
     district_code: Optional[str] = Query(None),
@@ -50,8 +83,18 @@ async def get_aadhaar_overview(
         scope_match,
     )
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    result = await cursor.to_list(length=1)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        frame = snap.scoped(district_code, block_code, udise_code)
+        result = []
+        if len(frame):
+            result = [{
+                "total_schools": len(frame),
+                **snapshot.sums(frame, AADHAAR_SUM_FIELDS),
+            }]
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        result = await cursor.to_list(length=1)
     
     if not result:
         return {
@@ -84,22 +127,11 @@ async def get_aadhaar_overview(
     exceptions = failed + pending + not_provided
     
     # Count high-risk schools (exception rate > 10%)
-    high_risk_query = {
-        **scope_match,
-        "$expr": {
-            "$gt": [
-                {
-                    "$divide": [
-                        {"$add": ["$aadhaar_failed", "$aadhaar_pending", "$aadhaar_not_provided"]},
-                        {"$max": ["$total_enrolment", 1]},
-                    ]
-                },
-                0.10,
-            ]
-        },
-    }
-    high_risk_cursor = db.aadhaar_analytics.count_documents(high_risk_query)
-    high_risk_count = await high_risk_cursor if isinstance(high_risk_cursor, int) else 0
+    if snap is not None:
+        rates = _exceptions(frame) / np.maximum(snapshot.column(frame, "total_enrolment"), 1)
+        high_risk_count = int((rates > 0.10).sum())
+    else:
+        high_risk_count = await db.aadhaar_analytics.count_documents(_high_risk_query(scope_match))
     
     return {
         "total_schools": data.get("total_schools", 0),
@@ -123,9 +155,13 @@ async def get_aadhaar_overview(
         "mbu_pending_5_15_pct": round((mbu_5_15 / total) * 100, 2),
         "mbu_pending_15_plus": mbu_15_plus,
         "mbu_pending_15_plus_pct": round((mbu_15_plus / total) * 100, 2),
-        "high_risk_schools": high_risk_count if isinstance(high_risk_count, int) else 0,
+        "high_risk_schools": high_risk_count,
     }
 
+def _high_risk_query(scope_match: dict) -> dict:
+    """Schools whose exception rate exceeds 10%"""
+    return {**scope_match, "exception_rate": {"$gt": 10}}
+
 @router.get("/block-wise")
 async def get_aadhaar_block_wise(
     district_code: Optional[str] = Query(None),
@@ -153,12 +189,19 @@ async def get_aadhaar_block_wise(
         {"$sort": {"total_enrolment": -1}}
     ], scope_match)
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        temp_list = snapshot.group_sums(
+            snap.scoped(district_code, block_code, udise_code), "block_name", AADHAAR_SUM_FIELDS,
+            count_field="total_schools", first=["block_code"], sort_by="total_enrolment",
+        )[:100]
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        temp_list = await cursor.to_list(length=100)
     blocks = []
     total_exceptions = 0
     
     # First pass to calculate total exceptions
-    temp_list = await cursor.to_list(length=100)
     for item in temp_list:
         exceptions = item.get("aadhaar_failed", 0) + item.get("aadhaar_pending", 0) + item.get("aadhaar_not_provided", 0)
         total_exceptions += exceptions
@@ -227,8 +270,14 @@ async def get_aadhaar_status_distribution(
         scope_match,
     )
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    result = await cursor.to_list(length=1)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        frame = snap.scoped(district_code, block_code, udise_code)
+        totals = snapshot.sums(frame, ["aadhaar_passed", "aadhaar_failed", "aadhaar_pending", "aadhaar_not_provided"])
+        result = [{key.replace("aadhaar_", ""): value for key, value in totals.items()}] if len(frame) else []
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        result = await cursor.to_list(length=1)
     
     if not result:
         return {"distribution": []}
@@ -256,22 +305,7 @@ async def get_high_risk_schools(
     """Get schools with highest exception rates"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
     pipeline = [
-        {"$match": scope_match} if scope_match else {"$match": {}},
-        {
-            "$addFields": {
-                "exception_total": {"$add": ["$aadhaar_failed", "$aadhaar_pending", "$aadhaar_not_provided"]},
-                "exception_rate": {
-                    "$multiply": [
-                        {"$divide": [
-                            {"$add": ["$aadhaar_failed", "$aadhaar_pending", "$aadhaar_not_provided"]},
-                            {"$max": ["$total_enrolment", 1]}
-                        ]},
-                        100
-                    ]
-                }
-            }
-        },
-        {"$match": {"exception_rate": {"$gt": 0}}},
+        {"$match": {**scope_match, "exception_rate": {"$gt": 0}}},
         {"$sort": {"exception_rate": -1}},
         {"$limit": limit},
         {
@@ -303,10 +337,31 @@ async def get_high_risk_schools(
         }
     ]
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    schools = await cursor.to_list(length=limit)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is None:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        schools = await cursor.to_list(length=limit)
+        return schools
+    
+    frame = snap.scoped(district_code, block_code, udise_code)
+    enrolment = np.maximum(snapshot.column(frame, "total_enrolment"), 1)
+    exceptions = _exceptions(frame)
+    rates = exceptions / enrolment * 100
+    candidates = np.flatnonzero(rates > 0)
+    positions = candidates[snapshot.top_n(rates[candidates], limit)]
+    schools = snapshot.records(frame, positions, HIGH_RISK_FIELDS)
+    coverage = snapshot.column(frame, "aadhaar_passed") / enrolment * 100
+    for school, pos in zip(schools, positions):
+        school["exception_total"] = int(exceptions[pos])
+        school["exception_rate"] = round(float(rates[pos]), 2)
+        school["aadhaar_coverage_pct"] = round(float(coverage[pos]), 2)
     return schools
 
+HIGH_RISK_FIELDS = [
+    "udise_code", "school_name", "block_name", "block_code", "district_code", "district_name",
+    "total_enrolment", "aadhaar_passed", "aadhaar_failed", "aadhaar_pending", "aadhaar_not_provided",
+]
+
 @router.get("/bottom-blocks")
 async def get_bottom_blocks(
     limit: int = Query(10, description="Number of blocks"),
@@ -343,8 +398,18 @@ async def get_bottom_blocks(
         {"$limit": limit}
     ], scope_match)
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    blocks = await cursor.to_list(length=limit)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        blocks = snapshot.group_sums(
+            snap.scoped(district_code, block_code, udise_code), "block_name", ["total_enrolment", "aadhaar_passed"],
+            count_field="total_schools", first=["block_code"],
+        )
+        for b in blocks:
+            b["coverage_pct"] = round(b["aadhaar_passed"] / max(b["total_enrolment"], 1) * 100, 2)
+        blocks = sorted(blocks, key=lambda b: b["coverage_pct"])[:limit]
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        blocks = await cursor.to_list(length=limit)
     return [
         {
             "block_name": b["_id"] or "Unknown",
@@ -375,8 +440,15 @@ async def get_aadhaar_pareto(
         {"$sort": {"exceptions": -1}}
     ], scope_match)
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    blocks = await cursor.to_list(length=100)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        frame = snap.scoped(district_code, block_code, udise_code)
+        blocks = snapshot.group_sums(
+            frame, "block_name", [], derived={"exceptions": _exceptions(frame)}, sort_by="exceptions",
+        )[:100]
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        blocks = await cursor.to_list(length=100)
     
     total_exceptions = sum(b["exceptions"] for b in blocks)
     cumulative = 0
@@ -413,8 +485,20 @@ async def get_mbu_analysis(
         {"$sort": {"mbu_5_15": -1}}
     ], scope_match)
     
-    cursor = db.aadhaar_analytics.aggregate(pipeline)
-    blocks = await cursor.to_list(length=100)
+    snap = snapshot.get("aadhaar_analytics")
+    if snap is not None:
+        frame = snap.scoped(district_code, block_code, udise_code)
+        blocks = snapshot.group_sums(
+            frame, "block_name", ["total_enrolment"],
+            derived={
+                "mbu_5_15": snapshot.column(frame, "mbu_pending_5_15"),
+                "mbu_15_plus": snapshot.column(frame, "mbu_pending_15_plus"),
+            },
+            sort_by="mbu_5_15",
+        )[:100]
+    else:
+        cursor = db.aadhaar_analytics.aggregate(pipeline)
+        blocks = await cursor.to_list(length=100)
     
     return [
         {
@@ -530,6 +614,9 @@ async def process_aadhaar_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logger.error(f"Aadhaar import failed: {str(e)}")
+    
+    await metrics.materialize(db, "aadhaar_analytics")
+    await dataset_state.mark_imported("aadhaar_analytics")
 
 def safe_str_val(row, columns, possible_names):
     """Safely get string value from row"""
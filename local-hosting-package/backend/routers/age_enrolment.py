@@ -9,8 +9,10 @@ from pathlib import Path
 import httpx
 import logging
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/age-enrolment", tags=["Age-wise Enrolment"])
+router = APIRouter(prefix="/age-enrolment", tags=["Age-wise Enrolment"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -392,53 +394,80 @@ async def get_school_size_distribution(
 ):
     """Get school size distribution"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
+    # Bands, summary stats and the median are all computed server-side; only
+    # a handful of rows come back regardless of how many schools are in scope
+    band_limits = [(50, "0-50"), (100, "51-100"), (200, "101-200"), (500, "201-500"), (1000, "501-1000"), (2000, "1001-2000")]
     pipeline = prepend_match([
         {
             "$group": {
                 "_id": "$udise_code",
                 "total_students": {"$sum": "$total"}
             }
+        },
+        {"$match": {"total_students": {"$ne": 0}}},
+        {
+            "$facet": {
+                "bands": [
+                    {
+                        "$group": {
+                            "_id": {
+                                "$switch": {
+                                    "branches": [
+                                        {"case": {"$lte": ["$total_students", limit]}, "then": band}
+                                        for limit, band in band_limits
+                                    ],
+                                    "default": "2000+"
+                                }
+                            },
+                            "count": {"$sum": 1}
+                        }
+                    }
+                ],
+                "stats": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "total_schools": {"$sum": 1},
+                            "avg_size": {"$avg": "$total_students"},
+                            "min_size": {"$min": "$total_students"},
+                            "max_size": {"$max": "$total_students"}
+                        }
+                    }
+                ]
+            }
         }
     ], scope_match)
     
-    cursor = db.age_enrolment.aggregate(pipeline)
-    schools = await cursor.to_list(length=10000)
-    
-    # Create size bands
-    bands = {
-        "0-50": 0, "51-100": 0, "101-200": 0, "201-500": 0,
-        "501-1000": 0, "1001-2000": 0, "2000+": 0
-    }
-    
-    enrolments = [s["total_students"] for s in schools if s["total_students"]]
-    
-    for e in enrolments:
-        if e <= 50:
-            bands["0-50"] += 1
-        elif e <= 100:
-            bands["51-100"] += 1
-        elif e <= 200:
-            bands["101-200"] += 1
-        elif e <= 500:
-            bands["201-500"] += 1
-        elif e <= 1000:
-            bands["501-1000"] += 1
-        elif e <= 2000:
-            bands["1001-2000"] += 1
-        else:
-            bands["2000+"] += 1
-    
-    import statistics
-    median_size = statistics.median(enrolments) if enrolments else 0
-    avg_size = sum(enrolments) / len(enrolments) if enrolments else 0
+    result = await db.age_enrolment.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    band_counts = {row["_id"]: row["count"] for row in facets.get("bands", [])}
+    stats = (facets.get("stats") or [{}])[0]
+    
+    # Median (same as statistics.median): skip to the middle one/two sizes of
+    # the sorted schools instead of collecting every size into one document
+    median_size = 0
+    total_schools = stats.get("total_schools", 0)
+    if total_schools:
+        median_pipeline = prepend_match([
+            {"$group": {"_id": "$udise_code", "total_students": {"$sum": "$total"}}},
+            {"$match": {"total_students": {"$ne": 0}}},
+            {"$sort": {"total_students": 1, "_id": 1}},
+            {"$skip": (total_schools - 1) // 2},
+            {"$limit": 2 - total_schools % 2},
+            {"$group": {"_id": None, "median_size": {"$avg": "$total_students"}}},
+        ], scope_match)
+        median = await db.age_enrolment.aggregate(median_pipeline, allowDiskUse=True).to_list(1)
+        median_size = median[0]["median_size"] if median else 0
     
     return {
-        "distribution": [{"band": k, "count": v} for k, v in bands.items()],
-        "median_size": round(median_size, 0),
-        "avg_size": round(avg_size, 0),
-        "total_schools": len(enrolments),
-        "min_size": min(enrolments) if enrolments else 0,
-        "max_size": max(enrolments) if enrolments else 0
+        "distribution": [{"band": band, "count": band_counts.get(band, 0)} for _, band in band_limits] + [
+            {"band": "2000+", "count": band_counts.get("2000+", 0)}
+        ],
+        "median_size": round(median_size or 0, 0),
+        "avg_size": round(stats.get("avg_size") or 0, 0),
+        "total_schools": stats.get("total_schools", 0),
+        "min_size": stats.get("min_size") or 0,
+        "max_size": stats.get("max_size") or 0
     }
 
 
@@ -496,52 +525,52 @@ async def get_age_enrolment_data_quality(
 ):
     """Get data quality metrics"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
-    # Check for inconsistencies
+    # Totals, distinct schools and zero-enrolment records counted in one scan
     pipeline = prepend_match([
         {
-            "$group": {
-                "_id": None,
-                "total_records": {"$sum": 1},
-                "boys": {"$sum": "$boys"},
-                "girls": {"$sum": "$girls"},
-                "total_students": {"$sum": "$total"}
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "total_records": {"$sum": 1},
+                            "boys": {"$sum": "$boys"},
+                            "girls": {"$sum": "$girls"},
+                            "total_students": {"$sum": "$total"}
+                        }
+                    }
+                ],
+                "schools": [{"$group": {"_id": "$udise_code"}}, {"$count": "count"}],
+                "zero_enrolment": [{"$match": {"total_students": 0}}, {"$count": "count"}]
             }
         }
     ], scope_match)
     
     cursor = db.age_enrolment.aggregate(pipeline)
     result = await cursor.to_list(length=1)
+    facets = result[0] if result else {}
     
-    if not result:
+    if not facets.get("totals"):
         return {"total_records": 0}
     
-    data = result[0]
+    data = facets["totals"][0]
     total_boys = data.get("boys", 0) or 0
     total_girls = data.get("girls", 0) or 0
     calc_total = total_boys + total_girls
     stored_total = data.get("total_students", 0) or calc_total
-    
-    # Get school count with scope filter
-    schools_query = scope_match if scope_match else {}
-    schools = await db.age_enrolment.distinct("udise_code", schools_query)
-    
-    # Check for zero enrolment with scope filter
-    zero_query = {"total_students": 0}
-    if scope_match:
-        zero_query.update(scope_match)
-    zero_cursor = db.age_enrolment.find(zero_query)
-    zero_records = await zero_cursor.to_list(length=10000)
+    total_schools = facets["schools"][0]["count"] if facets.get("schools") else 0
+    zero_records = facets["zero_enrolment"][0]["count"] if facets.get("zero_enrolment") else 0
     
     return {
         "total_records": data.get("total_records", 0),
-        "total_schools": len(schools),
+        "total_schools": total_schools,
         "boys": total_boys,
         "girls": total_girls,
         "calculated_total": calc_total,
         "stored_total": stored_total,
         "data_consistent": calc_total == stored_total,
-        "zero_enrolment_records": len(zero_records),
-        "completeness_score": round((1 - len(zero_records) / data.get("total_records", 1)) * 100, 1)
+        "zero_enrolment_records": zero_records,
+        "completeness_score": round((1 - zero_records / data.get("total_records", 1)) * 100, 1)
     }
 
 
@@ -635,5 +664,7 @@ async def process_age_enrolment_file(file_path: str, filename: str, import_id: s
         
     except Exception as e:
         logging.error(f"Age-wise Enrolment import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("age_enrolment")
 
 
@@ -5,6 +5,8 @@ from typing import Optional, List, Dict, Any, Tuple
 import os
 import json
 import uuid
+import asyncio
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 import numpy as np
@@ -15,10 +17,17 @@ load_dotenv(ROOT_DIR / ".env")
 # Optional local overrides (do not commit secrets)
 load_dotenv(ROOT_DIR / ".env.local", override=True)
 
+from pymongo import UpdateOne
+
+from utils import dataset_state, leader, stats
 from utils.auth import get_current_user
+from utils.metrics import CTET_QUALIFIED
 from utils.scope import build_scope_match, prepend_match
+from utils.responses import ORJSONRoute
+
+logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -76,29 +85,95 @@ def _safe_div(num: float, den: float) -> float:
     return float(num) / float(den) if den else 0.0
 
 
-def _percentile(values: List[float], p: float) -> float:
-    if not values:
-        return 0.0
-    return float(np.percentile(np.array(values, dtype=float), p))
+# ---- Aggregation expression helpers (predictions group server-side) ----
+
+def _first_truthy(*fields: str, default: Any = "Unknown") -> Any:
+    """Expression for `doc.get(a) or doc.get(b) or default` (null/"" count as empty)"""
+    expr: Any = default
+    for field in reversed(fields):
+        expr = {"$cond": [{"$in": [{"$ifNull": [f"${field}", ""]}, [""]]}, expr, f"${field}"]}
+    return expr
+
 
+def _sum_fields(*fields: str) -> Dict[str, Any]:
+    """$sum accumulator over the per-document total of several fields (missing = 0)"""
+    return {"$sum": {"$add": [{"$ifNull": [f"${field}", 0]} for field in fields]}}
 
-def _z_scores(values: List[float]) -> List[float]:
-    if not values:
-        return []
-    arr = np.array(values, dtype=float)
-    std = float(arr.std()) if len(arr) > 1 else 0.0
-    if std == 0.0:
-        return [0.0 for _ in values]
-    mean = float(arr.mean())
-    return [float((x - mean) / std) for x in arr.tolist()]
 
+def _count_if(condition: Dict[str, Any]) -> Dict[str, Any]:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
 
-def _top(items: List[Dict[str, Any]], key: str, n: int = 5) -> List[Dict[str, Any]]:
-    return sorted(items, key=lambda x: float(x.get(key, 0) or 0), reverse=True)[:n]
 
+def _entity_key(level: str) -> Dict[str, Any]:
+    """Group key/name per scope level: schools inside a block, blocks otherwise"""
+    if level in ("block", "school"):
+        return {"key": _first_truthy("udise_code", "school_name"), "name": _first_truthy("school_name", "udise_code")}
+    return {"key": _first_truthy("block_code", "block_name"), "name": _first_truthy("block_name", "block_code")}
 
-def _bottom(items: List[Dict[str, Any]], key: str, n: int = 5) -> List[Dict[str, Any]]:
-    return sorted(items, key=lambda x: float(x.get(key, 0) or 0))[:n]
+
+def _age_from_dob_expr() -> Dict[str, Any]:
+    """Age in whole years from a d/m/yyyy `dob` string.
+
+    Null (like the old date() parsing) when it does not parse, is not a real
+    calendar date (31/02/1985) or gives an age outside 0-120.
+    """
+    today = date.today()
+    dob = {"$trim": {"input": {"$ifNull": ["$dob", ""]}}}
+    age = {
+        "$subtract": [
+            {"$subtract": [today.year, "$$yyyy"]},
+            {
+                "$cond": [
+                    {"$or": [
+                        {"$lt": [today.month, "$$mm"]},
+                        {"$and": [{"$eq": [today.month, "$$mm"]}, {"$lt": [today.day, "$$dd"]}]},
+                    ]},
+                    1,
+                    0,
+                ]
+            },
+        ]
+    }
+    # $dateFromParts carries overflowing days into the next month, so a date is
+    # real only if its day of month comes back unchanged
+    real_date = {
+        "$and": [
+            {"$gte": ["$$yyyy", 1]}, {"$lte": ["$$yyyy", 9999]},
+            {"$gte": ["$$mm", 1]}, {"$lte": ["$$mm", 12]},
+            {"$gte": ["$$dd", 1]}, {"$lte": ["$$dd", 31]},
+            {"$eq": [{"$dayOfMonth": {"$dateFromParts": {"year": "$$yyyy", "month": "$$mm", "day": "$$dd"}}}, "$$dd"]},
+        ]
+    }
+    return {
+        "$cond": [
+            {"$regexMatch": {"input": dob, "regex": "^\\d{1,2}/\\d{1,2}/\\d{1,4}$"}},
+            {
+                "$let": {
+                    "vars": {"parts": {"$split": [dob, "/"]}},
+                    "in": {
+                        "$let": {
+                            "vars": {
+                                "dd": {"$toInt": {"$arrayElemAt": ["$$parts", 0]}},
+                                "mm": {"$toInt": {"$arrayElemAt": ["$$parts", 1]}},
+                                "yyyy": {"$toInt": {"$arrayElemAt": ["$$parts", 2]}},
+                            },
+                            "in": {
+                                # $and short-circuits, so $dateFromParts only sees in-range parts
+                                "$cond": [
+                                    real_date,
+                                    {"$let": {"vars": {"age": age}, "in": {
+                                        "$cond": [{"$and": [{"$gte": ["$$age", 0]}, {"$lte": ["$$age", 120]}]}, "$$age", None]
+                                    }}},
+                                    None,
+                                ]
+                            },
+                        }
+                    },
+                }
+            },
+            None,
+        ]
+    }
 
 
 def _local_dropout_insights(risk_data: Any) -> str:
@@ -110,23 +185,23 @@ def _local_dropout_insights(risk_data: Any) -> str:
     if not risk_data:
         return "No data available to generate insights."
 
-    avg_dropout = round(sum(r["dropout_rate"] for r in risk_data) / max(len(risk_data), 1), 2)
-    high = [r for r in risk_data if r.get("risk_level") == "High"]
-    top5 = _top(risk_data, "risk_score", 5)
+    avg_dropout = round(float(stats.column(risk_data, "dropout_rate").mean()), 2)
+    level_counts = stats.group_reduce([r.get("risk_level") for r in risk_data])
+    risk_scores = stats.column(risk_data, "risk_score")
+    top5 = stats.top(risk_data, "risk_score", 5, values=risk_scores)
 
     # ML-style: z-score outliers on risk_score
-    z = _z_scores([float(r.get("risk_score", 0) or 0) for r in risk_data])
+    z = stats.z_scores(risk_scores)
     outliers = [
-        {**risk_data[i], "z": round(z[i], 2)}
-        for i in range(len(risk_data))
-        if z[i] >= 1.5
-    ][:5]
+        {**risk_data[i], "z": round(float(z[i]), 2)}
+        for i in np.flatnonzero(z >= 1.5)[:5]
+    ]
 
     lines = []
     lines.append("## Key Findings")
     lines.append(f"- Total {entity_label} analyzed: **{len(risk_data)}**")
     lines.append(f"- Average dropout rate: **{avg_dropout}%**")
-    lines.append(f"- High-risk {entity_label}: **{len(high)}**")
+    lines.append(f"- High-risk {entity_label}: **{int(level_counts.get('High', 0))}**")
     if top5:
         lines.append(
             f"- Highest risk: **{top5[0]['block']}** (risk score **{top5[0]['risk_score']}**, dropout rate **{top5[0]['dropout_rate']}%**)"
@@ -169,25 +244,27 @@ def _local_infra_insights(forecast_data: Any) -> str:
     if not forecast_data:
         return "No data available to generate insights."
 
-    total_classrooms = sum(int(f.get("total_classrooms", 0) or 0) for f in forecast_data)
-    repair_needed = sum(int(f.get("current_repair_needed", 0) or 0) for f in forecast_data)
-    dilapidated = sum(int(f.get("dilapidated", 0) or 0) for f in forecast_data)
+    classrooms = stats.column(forecast_data, "total_classrooms").astype(int)
+    repairs = stats.column(forecast_data, "current_repair_needed").astype(int)
+    dilapidated_counts = stats.column(forecast_data, "dilapidated").astype(int)
+    total_classrooms = int(classrooms.sum())
+    repair_needed = int(repairs.sum())
+    dilapidated = int(dilapidated_counts.sum())
     repair_rate = round(_safe_div(repair_needed, total_classrooms) * 100, 2) if total_classrooms else 0.0
 
     # Priority ranking: use estimated budget + dilapidated + repair
-    scored = []
-    for f in forecast_data:
-        tc = int(f.get("total_classrooms", 0) or 0)
-        rn = int(f.get("current_repair_needed", 0) or 0)
-        dil = int(f.get("dilapidated", 0) or 0)
-        budget = float(f.get("estimated_budget_lakhs", 0) or 0)
-        score = (10 * _safe_div(rn, max(tc, 1))) + (20 * _safe_div(dil, max(tc, 1))) + (0.02 * budget)
-        scored.append({**f, "_score": round(score, 3)})
-    top5 = _top(scored, "_score", 5)
+    denominators = np.maximum(classrooms, 1)
+    scores = np.round(
+        10 * repairs / denominators
+        + 20 * dilapidated_counts / denominators
+        + 0.02 * stats.column(forecast_data, "estimated_budget_lakhs"),
+        3,
+    )
+    top5 = [forecast_data[i] for i in stats.top_k(scores, 5)]
     top3 = top5[:3]
     # Use medians to flag outliers (robust to extremes)
-    med_repair = _percentile([float(f.get("repair_rate", 0) or 0) for f in forecast_data], 50)
-    med_dil = _percentile([float(f.get("dilapidated", 0) or 0) for f in forecast_data], 50)
+    med_repair = stats.percentile(stats.column(forecast_data, "repair_rate"), 50)
+    med_dil = stats.percentile(dilapidated_counts, 50)
 
     lines = []
     lines.append("## Infrastructure Health Summary")
@@ -253,21 +330,23 @@ def _local_teacher_insights(shortage_data: Any) -> str:
     if not shortage_data:
         return "No data available to generate insights."
 
-    total_teachers = sum(int(s.get("total_teachers", 0) or 0) for s in shortage_data)
-    retiring_5 = sum(int(s.get("retiring_in_5_years", 0) or 0) for s in shortage_data)
-    avg_ctet = round(sum(float(s.get("ctet_rate", 0) or 0) for s in shortage_data) / max(len(shortage_data), 1), 1)
-    high_risk = [s for s in shortage_data if s.get("risk_level") == "High"]
-    top5 = _top(shortage_data, "retirement_risk_pct", 5)
+    total_teachers = int(stats.column(shortage_data, "total_teachers").sum())
+    retiring_5 = int(stats.column(shortage_data, "retiring_in_5_years").sum())
+    ctet_rates = stats.column(shortage_data, "ctet_rate")
+    avg_ctet = round(float(ctet_rates.mean()), 1)
+    level_counts = stats.group_reduce([s.get("risk_level") for s in shortage_data])
+    top5 = stats.top(shortage_data, "retirement_risk_pct", 5)
     top3 = top5[:3]
-    ctet_median = _percentile([float(s.get("ctet_rate", 0) or 0) for s in shortage_data], 50)
-    net_shortage_pos = [s for s in shortage_data if int(s.get("forecast_shortage_5yr", 0) or 0) > 0]
+    ctet_median = stats.percentile(ctet_rates, 50)
+    net_shortage = stats.column(shortage_data, "forecast_shortage_5yr")
+    net_shortage_pos = np.flatnonzero(net_shortage > 0)
 
     lines = []
     lines.append("## Workforce Health Analysis")
     lines.append(f"- Total teachers analyzed: **{total_teachers:,}**")
     lines.append(f"- Retiring in 5 years: **{retiring_5:,}** (**{round(_safe_div(retiring_5, total_teachers)*100,1)}%**)")
     lines.append(f"- Average CTET qualification rate: **{avg_ctet}%**")
-    lines.append(f"- High retirement-risk {entity_label}: **{len(high_risk)}**")
+    lines.append(f"- High retirement-risk {entity_label}: **{int(level_counts.get('High', 0))}**")
 
     lines.append(f"\n## Retirement Wave Impact (Top 5 {entity_label})")
     for s in top5:
@@ -287,8 +366,8 @@ def _local_teacher_insights(shortage_data: Any) -> str:
                 f"  - **{s['block']}**: retirement risk **{s.get('retirement_risk_pct', 0)}%**, "
                 f"net shortage(5y) **{s.get('forecast_shortage_5yr', 0)}**, CTET **{s.get('ctet_rate', 0)}%**"
             )
-    if net_shortage_pos:
-        worst = _top(net_shortage_pos, "forecast_shortage_5yr", 3)
+    if net_shortage_pos.size:
+        worst = [shortage_data[net_shortage_pos[i]] for i in stats.top_k(net_shortage[net_shortage_pos], 3)]
         lines.append("- Net-shortage hotspots (retirements > new entrants):")
         for s in worst:
             lines.append(f"  - **{s['block']}**: net shortage(5y) **{s.get('forecast_shortage_5yr', 0)}**")
@@ -321,30 +400,6 @@ def _local_teacher_insights(shortage_data: Any) -> str:
     return "\n".join(lines)
 
 
-def _parse_ddmmyyyy(s: Any) -> Optional[date]:
-    if not s or not isinstance(s, str):
-        return None
-    try:
-        parts = s.strip().split("/")
-        if len(parts) != 3:
-            return None
-        dd, mm, yyyy = int(parts[0]), int(parts[1]), int(parts[2])
-        return date(yyyy, mm, dd)
-    except Exception:
-        return None
-
-
-def _age_from_dob(dob: Any) -> Optional[int]:
-    d = _parse_ddmmyyyy(dob)
-    if not d:
-        return None
-    today = date.today()
-    years = today.year - d.year - ((today.month, today.day) < (d.month, d.day))
-    if years < 0 or years > 120:
-        return None
-    return years
-
-
 def _local_completion_insights(block_data: Any) -> str:
     payload: Dict[str, Any] = block_data if isinstance(block_data, dict) else {"block_data": block_data}
     block_data = payload.get("block_data", []) or []
@@ -354,10 +409,11 @@ def _local_completion_insights(block_data: Any) -> str:
     if not block_data:
         return "No data available to generate insights."
 
-    bottom5 = _bottom(block_data, "rate", 5)
-    top5 = _top(block_data, "rate", 5)
-    max_weeks = max(int(b.get("estimated_weeks", 0) or 0) for b in block_data)
-    median_rate = _percentile([float(b.get("rate", 0) or 0) for b in block_data], 50)
+    rates = stats.column(block_data, "rate")
+    bottom5 = stats.bottom(block_data, "rate", 5, values=rates)
+    top5 = stats.top(block_data, "rate", 5, values=rates)
+    max_weeks = int(stats.column(block_data, "estimated_weeks").max())
+    median_rate = stats.percentile(rates, 50)
 
     lines = []
     lines.append("## Completion Status Summary")
@@ -587,6 +643,20 @@ async def get_dropout_risk_predictions(
     block_name: Optional[str] = Query(None),
     school_name: Optional[str] = Query(None),
 ):
+    """AI-powered dropout risk analysis"""
+    return await _scoped_insights(
+        "dropout-risk", district_code, block_code, udise_code, district_name, block_name, school_name
+    )
+
+
+async def _compute_dropout_risk(
+    district_code: Optional[str] = None,
+    block_code: Optional[str] = None,
+    udise_code: Optional[str] = None,
+    district_name: Optional[str] = None,
+    block_name: Optional[str] = None,
+    school_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """AI-powered dropout risk analysis"""
     scope_match = build_scope_match(
         district_code=district_code,
@@ -597,31 +667,25 @@ async def get_dropout_risk_predictions(
         school_name=school_name,
     )
     
-    # Gather data for analysis
-    dropbox_data = await db.dropbox_analytics.find(scope_match, {"_id": 0}).to_list(5000)
-    # enrolment_data currently unused; keep for future modeling but scope it for correctness
-    _ = await db.enrolment_analytics.find(scope_match, {"_id": 0}).to_list(1)
-    
     level = _scope_level(district_code, block_code, udise_code)
-    # Calculate dropout metrics by entity (district->block, block->school, school->school)
-    block_metrics = {}
-    for d in dropbox_data:
-        if level in ("block", "school"):
-            key = d.get("udise_code") or d.get("school_name") or "Unknown"
-            name = d.get("school_name") or str(key)
-        else:
-            key = d.get("block_code") or d.get("block_name") or "Unknown"
-            name = d.get("block_name") or str(key)
-
-        if key not in block_metrics:
-            block_metrics[key] = {"name": name, "dropout": 0, "total_remarks": 0, "migration": 0}
-        block_metrics[key]["dropout"] += d.get("dropout", 0)
-        block_metrics[key]["total_remarks"] += d.get("total_remarks", 0)
-        block_metrics[key]["migration"] += d.get("migration", 0)
+    # Dropout metrics by entity (district->block, block->school, school->school), grouped in Mongo
+    entity = _entity_key(level)
+    pipeline = prepend_match([
+        {
+            "$group": {
+                "_id": entity["key"],
+                "name": {"$first": entity["name"]},
+                "dropout": {"$sum": "$dropout"},
+                "total_remarks": {"$sum": "$total_remarks"},
+                "migration": {"$sum": "$migration"},
+            }
+        },
+    ], scope_match)
+    block_metrics = await db.dropbox_analytics.aggregate(pipeline).to_list(None)
     
     # Calculate risk scores
     risk_data = []
-    for _, metrics in block_metrics.items():
+    for metrics in block_metrics:
         dropout_rate = metrics["dropout"] / max(metrics["total_remarks"], 1) * 100
         risk_score = min(100, dropout_rate * 2 + (metrics["migration"] / max(metrics["total_remarks"], 1) * 50))
         risk_data.append({
@@ -674,6 +738,20 @@ async def get_infrastructure_forecast(
     block_name: Optional[str] = Query(None),
     school_name: Optional[str] = Query(None),
 ):
+    """Infrastructure gap analysis and forecast"""
+    return await _scoped_insights(
+        "infrastructure-forecast", district_code, block_code, udise_code, district_name, block_name, school_name
+    )
+
+
+async def _compute_infrastructure_forecast(
+    district_code: Optional[str] = None,
+    block_code: Optional[str] = None,
+    udise_code: Optional[str] = None,
+    district_name: Optional[str] = None,
+    block_name: Optional[str] = None,
+    school_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """Infrastructure gap analysis and forecast"""
     scope_match = build_scope_match(
         district_code=district_code,
@@ -684,38 +762,28 @@ async def get_infrastructure_forecast(
         school_name=school_name,
     )
     
-    # Gather infrastructure data
-    ct_data = await db.classrooms_toilets.find(scope_match, {"_id": 0}).to_list(100000)
-    
     level = _scope_level(district_code, block_code, udise_code)
-    # Aggregate by entity (district->block, block->school, school->school)
-    block_infra = {}
-    for school in ct_data:
-        if level in ("block", "school"):
-            key = school.get("udise_code") or school.get("school_name") or "Unknown"
-            name = school.get("school_name") or str(key)
-        else:
-            key = school.get("block_code") or school.get("block_name") or "Unknown"
-            name = school.get("block_name") or str(key)
-
-        if key not in block_infra:
-            block_infra[key] = {
-                "name": name,
-                "schools": 0, "classrooms": 0, "good": 0, "minor_repair": 0, "major_repair": 0,
-                "toilets": 0, "functional_toilets": 0, "dilapidated": 0
+    # Aggregate by entity (district->block, block->school, school->school), grouped in Mongo
+    entity = _entity_key(level)
+    pipeline = prepend_match([
+        {
+            "$group": {
+                "_id": entity["key"],
+                "name": {"$first": entity["name"]},
+                "schools": {"$sum": 1},
+                "classrooms": {"$sum": "$classrooms_instructional"},
+                "good": _sum_fields("pucca_good", "part_pucca_good"),
+                "minor_repair": _sum_fields("pucca_minor", "part_pucca_minor"),
+                "major_repair": _sum_fields("pucca_major", "part_pucca_major"),
+                "dilapidated": {"$sum": "$classrooms_dilapidated"},
             }
-        block_infra[key]["schools"] += 1
-        block_infra[key]["classrooms"] += school.get("classrooms_instructional", 0)
-        block_infra[key]["good"] += school.get("pucca_good", 0) + school.get("part_pucca_good", 0)
-        block_infra[key]["minor_repair"] += school.get("pucca_minor", 0) + school.get("part_pucca_minor", 0)
-        block_infra[key]["major_repair"] += school.get("pucca_major", 0) + school.get("part_pucca_major", 0)
-        block_infra[key]["toilets"] += school.get("boys_toilets_total", 0) + school.get("girls_toilets_total", 0)
-        block_infra[key]["functional_toilets"] += school.get("boys_toilets_functional", 0) + school.get("girls_toilets_functional", 0)
-        block_infra[key]["dilapidated"] += school.get("classrooms_dilapidated", 0)
+        },
+    ], scope_match)
+    block_infra = await db.classrooms_toilets.aggregate(pipeline).to_list(None)
     
     # Calculate forecasts
     forecast_data = []
-    for _, data in block_infra.items():
+    for data in block_infra:
         total_cr = data["classrooms"]
         repair_rate = (data["minor_repair"] + data["major_repair"]) / max(total_cr, 1) * 100
         
@@ -780,6 +848,20 @@ async def get_teacher_shortage_predictions(
     block_name: Optional[str] = Query(None),
     school_name: Optional[str] = Query(None),
 ):
+    """Teacher shortage and retirement forecast"""
+    return await _scoped_insights(
+        "teacher-shortage", district_code, block_code, udise_code, district_name, block_name, school_name
+    )
+
+
+async def _compute_teacher_shortage(
+    district_code: Optional[str] = None,
+    block_code: Optional[str] = None,
+    udise_code: Optional[str] = None,
+    district_name: Optional[str] = None,
+    block_name: Optional[str] = None,
+    school_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """Teacher shortage and retirement forecast"""
     scope_match = build_scope_match(
         district_code=district_code,
@@ -790,53 +872,49 @@ async def get_teacher_shortage_predictions(
         school_name=school_name,
     )
     
-    # Gather teacher data (project only what we need)
-    ct_data = await db.ctteacher_analytics.find(
-        scope_match,
-        {"_id": 0, "district_code": 1, "block_code": 1, "udise_code": 1, "block_name": 1, "school_name": 1, "dob": 1, "ctet_qualified": 1},
-    ).to_list(200000)
-
     level = _scope_level(district_code, block_code, udise_code)
     entity_label = "school" if level == "school" else ("schools" if level == "block" else "blocks")
     
-    # Aggregate by entity (district->block, block->school, school->school)
-    block_teachers = {}
-    age_distribution = {"<30": 0, "30-40": 0, "40-50": 0, "50-55": 0, "55+": 0}
+    # Aggregate by entity (district->block, block->school, school->school) in Mongo.
+    # Age comes from the dd/mm/yyyy DOB; unparseable or implausible ages count as 40.
+    unit = _first_truthy("school_name", "udise_code") if level in ("block", "school") else _first_truthy("block_name")
+    age = {"$ifNull": [_age_from_dob_expr(), 40]}
+    pipeline = prepend_match([
+        {
+            "$project": {
+                "_id": 0,
+                "unit": unit,
+                "ctet_qualified": 1,
+                "age": {"$cond": [{"$or": [{"$lt": [age, 0]}, {"$gt": [age, 120]}]}, 40, age]},
+            }
+        },
+        {
+            "$group": {
+                "_id": "$unit",
+                "total": {"$sum": 1},
+                "retiring_5yr": _count_if({"$gte": ["$age", 55]}),
+                "retiring_3yr": _count_if({"$and": [{"$gte": ["$age", 52]}, {"$lt": ["$age", 55]}]}),
+                "age_40_50": _count_if({"$and": [{"$gte": ["$age", 40]}, {"$lt": ["$age", 52]}]}),
+                "age_30_40": _count_if({"$and": [{"$gte": ["$age", 30]}, {"$lt": ["$age", 40]}]}),
+                "new_entrants": _count_if({"$lt": ["$age", 30]}),
+                "ctet": _count_if(CTET_QUALIFIED),
+            }
+        },
+    ], scope_match)
+    block_teachers = await db.ctteacher_analytics.aggregate(pipeline).to_list(None)
     
-    for teacher in ct_data:
-        unit = (
-            (teacher.get("school_name") or teacher.get("udise_code") or "Unknown")
-            if level in ("block", "school")
-            else (teacher.get("block_name") or "Unknown")
-        )
-        age = _age_from_dob(teacher.get("dob"))
-        if age is None:
-            age = 40
-        
-        if unit not in block_teachers:
-            block_teachers[unit] = {"total": 0, "retiring_5yr": 0, "retiring_3yr": 0, "new_entrants": 0, "ctet": 0}
-        
-        block_teachers[unit]["total"] += 1
-        if age >= 55:
-            block_teachers[unit]["retiring_5yr"] += 1
-            age_distribution["55+"] += 1
-        elif age >= 52:
-            block_teachers[unit]["retiring_3yr"] += 1
-            age_distribution["50-55"] += 1
-        elif age >= 40:
-            age_distribution["40-50"] += 1
-        elif age >= 30:
-            age_distribution["30-40"] += 1
-        else:
-            block_teachers[unit]["new_entrants"] += 1
-            age_distribution["<30"] += 1
-        
-        if teacher.get("ctet_qualified"):
-            block_teachers[unit]["ctet"] += 1
+    age_distribution = {
+        "<30": sum(b["new_entrants"] for b in block_teachers),
+        "30-40": sum(b["age_30_40"] for b in block_teachers),
+        "40-50": sum(b["age_40_50"] for b in block_teachers),
+        "50-55": sum(b["retiring_3yr"] for b in block_teachers),
+        "55+": sum(b["retiring_5yr"] for b in block_teachers),
+    }
     
     # Calculate shortage forecasts
     shortage_data = []
-    for block, data in block_teachers.items():
+    for data in block_teachers:
+        block = data["_id"]
         retiring_pct = data["retiring_5yr"] / max(data["total"], 1) * 100
         shortage_data.append({
             "block": block,
@@ -898,6 +976,20 @@ async def get_data_completion_forecast(
     block_name: Optional[str] = Query(None),
     school_name: Optional[str] = Query(None),
 ):
+    """APAAR/Aadhaar completion timeline prediction"""
+    return await _scoped_insights(
+        "data-completion", district_code, block_code, udise_code, district_name, block_name, school_name
+    )
+
+
+async def _compute_data_completion(
+    district_code: Optional[str] = None,
+    block_code: Optional[str] = None,
+    udise_code: Optional[str] = None,
+    district_name: Optional[str] = None,
+    block_name: Optional[str] = None,
+    school_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """APAAR/Aadhaar completion timeline prediction"""
     scope_match = build_scope_match(
         district_code=district_code,
@@ -908,50 +1000,24 @@ async def get_data_completion_forecast(
         school_name=school_name,
     )
     
-    # Gather data
-    apaar_data = await db.apaar_analytics.find(scope_match, {"_id": 0}).to_list(200000)
-    # aadhaar_data currently unused; keep for future modeling but scope it for correctness
-    _ = await db.aadhaar_analytics.find(scope_match, {"_id": 0}).to_list(1)
-    
     level = _scope_level(district_code, block_code, udise_code)
-    # Calculate APAAR metrics (district->block, block->school, school->school)
-    apaar_metrics = []
-    for school in apaar_data:
-        if level in ("block", "school"):
-            block = school.get("school_name", "Unknown")
-        else:
-            block = school.get("block_name", "Unknown")  # scope: district/school view uses block_name
-        total = school.get("total_student", 0)
-        generated = school.get("total_generated", 0)
-        rate = generated / max(total, 1) * 100
-        
-        # Estimate completion based on current rate
-        pending = total - generated
-        # Assume 2% weekly progress
-        weeks_to_complete = int(pending / max(total * 0.02, 1)) if rate < 100 else 0
-        
-        apaar_metrics.append({
-            "school": school.get("school_name", "Unknown")[:40],
-            "block": block,
-            "total_students": total,
-            "generated": generated,
-            "generation_rate": round(rate, 1),
-            "pending": pending,
-            "weeks_to_complete": min(weeks_to_complete, 52)
-        })
-    
-    # Aggregate by block
-    block_completion = {}
-    for m in apaar_metrics:
-        block = m["block"]
-        if block not in block_completion:
-            block_completion[block] = {"total": 0, "generated": 0, "schools": 0}
-        block_completion[block]["total"] += m["total_students"]
-        block_completion[block]["generated"] += m["generated"]
-        block_completion[block]["schools"] += 1
+    # APAAR totals by entity (district->block, block->school, school->school), grouped in Mongo
+    unit_field = "$school_name" if level in ("block", "school") else "$block_name"
+    pipeline = prepend_match([
+        {
+            "$group": {
+                "_id": {"$ifNull": [unit_field, "Unknown"]},
+                "total": {"$sum": "$total_student"},
+                "generated": {"$sum": "$total_generated"},
+                "schools": {"$sum": 1},
+            }
+        },
+    ], scope_match)
+    block_completion = await db.apaar_analytics.aggregate(pipeline).to_list(None)
     
     block_data = []
-    for block, data in block_completion.items():
+    for data in block_completion:
+        block = data["_id"]
         rate = data["generated"] / max(data["total"], 1) * 100
         pending = data["total"] - data["generated"]
         weeks = int(pending / max(data["total"] * 0.02, 1)) if rate < 100 else 0
@@ -1011,6 +1077,20 @@ async def get_executive_insights(
     block_name: Optional[str] = Query(None),
     school_name: Optional[str] = Query(None),
 ):
+    """AI-generated executive summary with insights and recommendations"""
+    return await _scoped_insights(
+        "executive-summary", district_code, block_code, udise_code, district_name, block_name, school_name
+    )
+
+
+async def _compute_executive_summary(
+    district_code: Optional[str] = None,
+    block_code: Optional[str] = None,
+    udise_code: Optional[str] = None,
+    district_name: Optional[str] = None,
+    block_name: Optional[str] = None,
+    school_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """AI-generated executive summary with insights and recommendations"""
     scope_match = build_scope_match(
         district_code=district_code,
@@ -1158,9 +1238,9 @@ async def get_executive_insights(
                 + (100 - float(x.get("toilet_functional", 0) or 0))
                 + (float(x.get("dropout_rate", 0) or 0) * 20.0)
             )
-        items.sort(key=score, reverse=True)
-        worst = items[:5]
-        best = sorted(items, key=score)[:5]
+        scores = np.fromiter((score(x) for x in items), dtype=float, count=len(items))
+        worst = [items[i] for i in stats.top_k(scores, 5)]
+        best = [items[i] for i in stats.top_k(scores, 5, descending=False)]
         return worst, best
 
     async def _rank_schools(block_code_in: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
@@ -1212,9 +1292,9 @@ async def get_executive_insights(
                 + (100 - float(x.get("classroom_health", 0) or 0))
                 + (100 - float(x.get("toilet_functional", 0) or 0))
             )
-        items.sort(key=score, reverse=True)
-        worst = items[:5]
-        best = sorted(items, key=score)[:5]
+        scores = np.fromiter((score(x) for x in items), dtype=float, count=len(items))
+        worst = [items[i] for i in stats.top_k(scores, 5)]
+        best = [items[i] for i in stats.top_k(scores, 5, descending=False)]
         return worst, best
 
     # Gather all key metrics
@@ -1289,6 +1369,139 @@ async def get_executive_insights(
     }
 
 
+# ============= PRECOMPUTED INSIGHTS =============
+# Every prediction/summary payload for the state, each district and each block
+# is computed once per dataset generation (by one worker) and stored keyed by
+# scope, so those requests are a single indexed read. School scope and
+# name-based filters are still computed on demand.
+
+PRECOMPUTED_COLLECTION = "analytics_precomputed"
+PRECOMPUTE_BATCH_SIZE = 200
+
+_COMPUTE = {
+    "dropout-risk": _compute_dropout_risk,
+    "infrastructure-forecast": _compute_infrastructure_forecast,
+    "teacher-shortage": _compute_teacher_shortage,
+    "data-completion": _compute_data_completion,
+    "executive-summary": _compute_executive_summary,
+}
+
+# Collections the payloads are built from; their scopes are precomputed
+_SCOPE_SOURCES = ["classrooms_toilets", "apaar_analytics", "dropbox_analytics", "ctteacher_analytics"]
+
+_precompute_task: Optional[asyncio.Task] = None
+
+
+def _precomputed_query(kind: str, district_code: Optional[str], block_code: Optional[str]) -> Dict[str, Any]:
+    """Lookup on the (kind, level, block_code, district_code) index for the current generation"""
+    query: Dict[str, Any] = {"kind": kind, "generation": dataset_state.generation()}
+    if block_code:
+        query.update(level="block", block_code=block_code)
+        if district_code:
+            query["district_code"] = district_code
+    elif district_code:
+        query.update(level="district", block_code=None, district_code=district_code)
+    else:
+        query.update(level="state", block_code=None, district_code=None)
+    return query
+
+
+def _rescoped(kind: str, payload: Dict[str, Any], district_code: Optional[str], block_code: Optional[str]) -> Dict[str, Any]:
+    """Echo the requested codes in a stored prediction payload (e.g. a block requested without its district)"""
+    scope = payload.get("scope") or {}
+    if kind == "executive-summary" or (scope.get("district_code") == district_code and scope.get("block_code") == block_code):
+        return payload
+    old_prefix = _scope_prefix_md(scope.get("district_code"), scope.get("block_code"), None)
+    new_prefix = _scope_prefix_md(district_code, block_code, None)
+    return {
+        **payload,
+        "scope": {**scope, "district_code": district_code, "block_code": block_code},
+        "ai_insights": (payload.get("ai_insights") or "").replace(old_prefix, new_prefix, 1),
+    }
+
+
+async def _scoped_insights(
+    kind: str,
+    district_code: Optional[str],
+    block_code: Optional[str],
+    udise_code: Optional[str],
+    district_name: Optional[str],
+    block_name: Optional[str],
+    school_name: Optional[str],
+) -> Dict[str, Any]:
+    """Serve the precomputed payload for state/district/block scope, else compute it"""
+    if not (udise_code or district_name or block_name or school_name):
+        doc = await db[PRECOMPUTED_COLLECTION].find_one(
+            _precomputed_query(kind, district_code, block_code), {"_id": 0, "payload": 1}
+        )
+        if doc:
+            return _rescoped(kind, doc["payload"], district_code, block_code)
+    return await _COMPUTE[kind](district_code, block_code, udise_code, district_name, block_name, school_name)
+
+
+async def _precompute_scopes() -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """State, every district and every (district, block) pair present in the source collections"""
+    pairs = set()
+    for name in _SCOPE_SOURCES:
+        rows = await db[name].aggregate([
+            {"$group": {"_id": {"district_code": "$district_code", "block_code": "$block_code"}}},
+        ]).to_list(None)
+        for row in rows:
+            district = row["_id"].get("district_code")
+            block = row["_id"].get("block_code")
+            if district not in (None, ""):
+                pairs.add((str(district), str(block) if block not in (None, "") else None))
+
+    districts = sorted({district for district, _ in pairs})
+    blocks = sorted((district, block) for district, block in pairs if block)
+    return (
+        [("state", None, None)]
+        + [("district", district, None) for district in districts]
+        + [("block", district, block) for district, block in blocks]
+    )
+
+
+async def rebuild_precomputed(generation: int):
+    """Compute and store every kind of payload for every state/district/block scope"""
+    collection = db[PRECOMPUTED_COLLECTION]
+    scopes = await _precompute_scopes()
+    ops = []
+    for level, district_code, block_code in scopes:
+        for kind, compute in _COMPUTE.items():
+            if dataset_state.generation() != generation:
+                logger.info(f"Precompute for generation {generation} superseded; stopping")
+                return
+            try:
+                payload = await compute(district_code, block_code)
+            except Exception as e:
+                logger.warning(f"Precompute {kind} for {level} {district_code}/{block_code} failed: {str(e)}")
+                continue
+            key = {"kind": kind, "level": level, "block_code": block_code, "district_code": district_code}
+            ops.append(UpdateOne(key, {"$set": {**key, "generation": generation, "payload": payload}}, upsert=True))
+            if len(ops) >= PRECOMPUTE_BATCH_SIZE:
+                await collection.bulk_write(ops, ordered=False)
+                ops = []
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+    await collection.delete_many({"generation": {"$ne": generation}})
+    logger.info(f"Precomputed analytics for generation {generation}: {len(scopes)} scopes")
+
+
+async def _precompute(generation: int):
+    try:
+        await leader.run_once(db, f"analytics-precompute:{generation}", lambda: rebuild_precomputed(generation))
+    except Exception as e:
+        logger.error(f"Analytics precompute for generation {generation} failed: {str(e)}")
+
+
+async def refresh_precomputed():
+    """Dataset change hook: precompute in the background so imports/startup don't wait on it"""
+    global _precompute_task
+    if _precompute_task is not None and not _precompute_task.done():
+        _precompute_task.cancel()
+    _precompute_task = asyncio.create_task(_precompute(dataset_state.generation()))
+
+
 @router.get("/map/block-metrics")
 async def get_block_map_metrics(
     district_code: Optional[str] = Query(None),
@@ -1331,12 +1544,7 @@ async def get_block_map_metrics(
             "ctet": {
                 "$sum": {
                     "$cond": [
-                        {
-                            "$or": [
-                                {"$eq": ["$ctet_qualified", True]},
-                                {"$gt": ["$ctet_qualified", 0]},
-                            ]
-                        },
+                        CTET_QUALIFIED,
                         1,
                         0,
                     ]
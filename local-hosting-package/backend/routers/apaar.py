@@ -9,8 +9,10 @@ from pathlib import Path
 import httpx
 import logging
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state, metrics
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/apaar", tags=["APAAR Status"])
+router = APIRouter(prefix="/apaar", tags=["APAAR Status"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -21,6 +23,22 @@ def init_db(database, uploads_dir):
     db = database
     UPLOADS_DIR = uploads_dir
 
+# Stored on every school at import; (scope, metric) indexes back the top-N reads
+metrics.register(
+    "apaar_analytics",
+    {
+        "pending": {"$subtract": ["$total_student", "$total_generated"]},
+        "generation_rate": {
+            "$cond": [
+                {"$gt": ["$total_student", 0]},
+                {"$multiply": [{"$divide": ["$total_generated", "$total_student"]}, 100]},
+                0,
+            ]
+        },
+    },
+    indexed=["pending", "generation_rate"],
+)
+
 @router.get("/overview")
 async def get_apaar_overview(
     district_code: Optional[str] = Query(None),
@@ -251,14 +269,6 @@ async def get_top_pending_schools(
         match_stage.update(scope_match)
     pipeline = [
         {"$match": match_stage},
-        {
-            "$addFields": {
-                "pending": {"$subtract": ["$total_student", "$total_generated"]},
-                "generation_rate": {
-                    "$multiply": [{"$divide": ["$total_generated", "$total_student"]}, 100]
-                }
-            }
-        },
         {"$sort": {"pending": -1}},
         {"$limit": n},
         {
@@ -292,19 +302,11 @@ async def get_low_performing_schools(
 ):
     """Get schools below generation rate threshold"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
-    match_stage = {"total_student": {"$gt": 50}}
+    match_stage = {"total_student": {"$gt": 50}, "generation_rate": {"$lt": threshold}}
     if scope_match:
         match_stage.update(scope_match)
     pipeline = [
         {"$match": match_stage},
-        {
-            "$addFields": {
-                "generation_rate": {
-                    "$multiply": [{"$divide": ["$total_generated", "$total_student"]}, 100]
-                }
-            }
-        },
-        {"$match": {"generation_rate": {"$lt": threshold}}},
         {"$sort": {"generation_rate": 1}},
         {"$limit": 50},
         {
@@ -336,60 +338,53 @@ async def get_risk_schools(
 ):
     """Get high-risk schools requiring intervention"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
-    # Critical: Gen% < 70% AND Students > 200
-    critical_match = {"total_student": {"$gt": 200}}
-    if scope_match:
-        critical_match.update(scope_match)
-    critical_pipeline = [
-        {"$match": critical_match},
-        {
-            "$addFields": {
-                "generation_rate": {
-                    "$multiply": [{"$divide": ["$total_generated", "$total_student"]}, 100]
-                }
-            }
-        },
-        {"$match": {"generation_rate": {"$lt": 70}}},
-        {"$sort": {"generation_rate": 1}},
-        {"$limit": 20}
-    ]
-    
-    cursor = db.apaar_analytics.aggregate(critical_pipeline)
-    critical = await cursor.to_list(length=20)
-    
-    # High failure: Failed > 50
-    failure_match = {"total_failed": {"$gt": 50}}
-    if scope_match:
-        failure_match.update(scope_match)
-    failure_pipeline = [
-        {"$match": failure_match},
-        {"$sort": {"total_failed": -1}},
-        {"$limit": 20}
-    ]
-    
-    cursor = db.apaar_analytics.aggregate(failure_pipeline)
-    high_failure = await cursor.to_list(length=20)
-    
-    # High not applied: Not Applied > 60%
-    consent_match = {"total_student": {"$gt": 100}}
-    if scope_match:
-        consent_match.update(scope_match)
-    consent_pipeline = [
-        {"$match": consent_match},
+    # One scan of the scoped schools feeds all three risk lists
+    pipeline = prepend_match([
         {
-            "$addFields": {
-                "not_applied_pct": {
-                    "$multiply": [{"$divide": ["$total_not_applied", "$total_student"]}, 100]
-                }
+            "$facet": {
+                # Critical: Gen% < 70% AND Students > 200
+                "critical": [
+                    {"$match": {"total_student": {"$gt": 200}}},
+                    {
+                        "$addFields": {
+                            "generation_rate": {
+                                "$multiply": [{"$divide": ["$total_generated", "$total_student"]}, 100]
+                            }
+                        }
+                    },
+                    {"$match": {"generation_rate": {"$lt": 70}}},
+                    {"$sort": {"generation_rate": 1}},
+                    {"$limit": 20}
+                ],
+                # High failure: Failed > 50
+                "high_failure": [
+                    {"$match": {"total_failed": {"$gt": 50}}},
+                    {"$sort": {"total_failed": -1}},
+                    {"$limit": 20}
+                ],
+                # High not applied: Not Applied > 60%
+                "consent_gap": [
+                    {"$match": {"total_student": {"$gt": 100}}},
+                    {
+                        "$addFields": {
+                            "not_applied_pct": {
+                                "$multiply": [{"$divide": ["$total_not_applied", "$total_student"]}, 100]
+                            }
+                        }
+                    },
+                    {"$match": {"not_applied_pct": {"$gt": 60}}},
+                    {"$sort": {"not_applied_pct": -1}},
+                    {"$limit": 20}
+                ],
             }
-        },
-        {"$match": {"not_applied_pct": {"$gt": 60}}},
-        {"$sort": {"not_applied_pct": -1}},
-        {"$limit": 20}
-    ]
+        }
+    ], scope_match)
     
-    cursor = db.apaar_analytics.aggregate(consent_pipeline)
-    consent_gap = await cursor.to_list(length=20)
+    result = await db.apaar_analytics.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    critical = facets.get("critical", [])
+    high_failure = facets.get("high_failure", [])
+    consent_gap = facets.get("consent_gap", [])
     
     return {
         "critical_schools": len(critical),
@@ -526,6 +521,9 @@ async def process_apaar_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logging.error(f"APAAR import failed: {str(e)}")
+    
+    await metrics.materialize(db, "apaar_analytics")
+    await dataset_state.mark_imported("apaar_analytics")
 
 
 # Search
@@ -538,7 +536,7 @@ async def search(
     results = {"districts": [], "blocks": [], "schools": []}
     q_lower = q.lower()
     
-    has_data = await get_data_from_db()
+    has_data = dataset_state.has_data("schools")
     
     if type in ["all", "district"]:
         districts = await get_districts_from_db() if has_data else generate_mock_district_data()
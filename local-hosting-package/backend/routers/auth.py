@@ -11,10 +11,11 @@ from models.user import (
 )
 from utils.auth import (
     verify_password, get_password_hash, create_access_token,
-    create_reset_token, verify_reset_token, get_current_user, require_admin
+    create_reset_token, verify_reset_token, get_current_user, require_admin, invalidate_user
 )
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -91,6 +92,7 @@ async def google_login(google_token: dict):
             "updated_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(user)
+        invalidate_user(email)
     
     if not user.get("is_active", True):
         raise HTTPException(status_code=403, detail="Account is disabled")
@@ -227,6 +229,7 @@ async def create_user(user: UserCreate, current_user: dict = Depends(require_adm
     }
     
     await db.users.insert_one(user_data)
+    invalidate_user(user.email)
     
     return UserResponse(
         id=user_id,
@@ -251,6 +254,8 @@ async def update_user(user_id: str, update: UserUpdate, current_user: dict = Dep
     update_data["updated_at"] = datetime.now(timezone.utc)
     
     await db.users.update_one({"id": user_id}, {"$set": update_data})
+    # Role, district and deactivation apply to the user's existing tokens right away
+    invalidate_user(user["email"])
     
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
     return updated_user
@@ -261,9 +266,10 @@ async def delete_user(user_id: str, current_user: dict = Depends(require_admin))
     if user_id == current_user["user_id"]:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    user = await db.users.find_one_and_delete({"id": user_id}, {"email": 1})
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user["email"])
     
     return {"message": "User deleted successfully"}
 
@@ -9,8 +9,10 @@ from pathlib import Path
 import httpx
 import logging
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/classrooms-toilets", tags=["Classrooms & Toilets"])
+router = APIRouter(prefix="/classrooms-toilets", tags=["Classrooms & Toilets"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -504,80 +506,80 @@ async def get_risk_schools(
         block_name=block_name,
         school_name=school_name
     )
-    # Zero toilet schools
     zero_toilet_query = {"$or": [{"boys_toilets_total": 0}, {"girls_toilets_total": 0}]}
-    if scope_match:
-        zero_toilet_query.update(scope_match)
-    zero_toilet_cursor = db.classrooms_toilets.find(
-        zero_toilet_query,
-        {"_id": 0, "udise_code": 1, "school_name": 1, "block_name": 1, "boys_toilets_total": 1, "girls_toilets_total": 1}
-    ).limit(50)
-    zero_toilet_schools = await zero_toilet_cursor.to_list(length=50)
-    
-    # No water schools (functional toilets but no water)
-    no_water_match = {
-            "$expr": {
-                "$and": [
-                    {"$gt": [{"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}, 0]},
-                    {"$eq": [{"$add": ["$boys_toilets_water", "$girls_toilets_water"]}, 0]}
-                ]
-            }
-    }
-    if scope_match:
-        no_water_match.update(scope_match)
-    no_water_pipeline = [
-        {"$match": no_water_match},
-        {"$project": {
-            "_id": 0, "udise_code": 1, "school_name": 1, "block_name": 1,
-            "functional_toilets": {"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}
-        }},
-        {"$limit": 50}
-    ]
-    no_water_cursor = db.classrooms_toilets.aggregate(no_water_pipeline)
-    no_water_schools = await no_water_cursor.to_list(length=50)
-    
-    # No handwash schools
     no_handwash_query = {"handwash_facility": False}
-    if scope_match:
-        no_handwash_query.update(scope_match)
-    no_handwash_cursor = db.classrooms_toilets.find(
-        no_handwash_query,
-        {"_id": 0, "udise_code": 1, "school_name": 1, "block_name": 1}
-    ).limit(50)
-    no_handwash_schools = await no_handwash_cursor.to_list(length=50)
-    
-    # Major repair schools (>50% classrooms need major repair)
-    major_repair_pipeline = prepend_match([
-        {"$project": {
-            "_id": 0, "udise_code": 1, "school_name": 1, "block_name": 1,
-            "total_classrooms": "$classrooms_instructional",
-            "major_repair": {"$add": ["$pucca_major", "$part_pucca_major", "$kuchcha_major", "$tent_major"]},
-            "major_pct": {
-                "$cond": [
-                    {"$gt": ["$classrooms_instructional", 0]},
-                    {"$multiply": [{"$divide": [{"$add": ["$pucca_major", "$part_pucca_major", "$kuchcha_major", "$tent_major"]}, "$classrooms_instructional"]}, 100]},
-                    0
-                ]
+    school_fields = {"_id": 0, "udise_code": 1, "school_name": 1, "block_name": 1}
+    
+    # One scan of the scoped schools feeds every risk list and count
+    pipeline = prepend_match([
+        {
+            "$facet": {
+                "total": [{"$count": "count"}],
+                # Zero toilet schools
+                "zero_toilet": [
+                    {"$match": zero_toilet_query},
+                    {"$project": {**school_fields, "boys_toilets_total": 1, "girls_toilets_total": 1}},
+                    {"$limit": 50}
+                ],
+                "zero_toilet_count": [{"$match": zero_toilet_query}, {"$count": "count"}],
+                # No water schools (functional toilets but no water)
+                "no_water": [
+                    {"$match": {
+                        "$expr": {
+                            "$and": [
+                                {"$gt": [{"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}, 0]},
+                                {"$eq": [{"$add": ["$boys_toilets_water", "$girls_toilets_water"]}, 0]}
+                            ]
+                        }
+                    }},
+                    {"$project": {
+                        **school_fields,
+                        "functional_toilets": {"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}
+                    }},
+                    {"$limit": 50}
+                ],
+                # No handwash schools
+                "no_handwash": [
+                    {"$match": no_handwash_query},
+                    {"$project": school_fields},
+                    {"$limit": 50}
+                ],
+                "no_handwash_count": [{"$match": no_handwash_query}, {"$count": "count"}],
+                # Major repair schools (>30% classrooms need major repair)
+                "major_repair": [
+                    {"$project": {
+                        **school_fields,
+                        "total_classrooms": "$classrooms_instructional",
+                        "major_repair": {"$add": ["$pucca_major", "$part_pucca_major", "$kuchcha_major", "$tent_major"]},
+                        "major_pct": {
+                            "$cond": [
+                                {"$gt": ["$classrooms_instructional", 0]},
+                                {"$multiply": [{"$divide": [{"$add": ["$pucca_major", "$part_pucca_major", "$kuchcha_major", "$tent_major"]}, "$classrooms_instructional"]}, 100]},
+                                0
+                            ]
+                        }
+                    }},
+                    {"$match": {"major_pct": {"$gt": 30}}},
+                    {"$sort": {"major_pct": -1}},
+                    {"$limit": 50}
+                ],
             }
-        }},
-        {"$match": {"major_pct": {"$gt": 30}}},
-        {"$sort": {"major_pct": -1}},
-        {"$limit": 50}
+        }
     ], scope_match)
-    major_repair_cursor = db.classrooms_toilets.aggregate(major_repair_pipeline)
-    major_repair_schools = await major_repair_cursor.to_list(length=50)
-    
-    # Risk counts
-    count_query = scope_match if scope_match else {}
-    total_schools = await db.classrooms_toilets.count_documents(count_query)
-    zero_toilet_count_query = {"$or": [{"boys_toilets_total": 0}, {"girls_toilets_total": 0}]}
-    if scope_match:
-        zero_toilet_count_query.update(scope_match)
-    zero_toilet_count = await db.classrooms_toilets.count_documents(zero_toilet_count_query)
-    no_handwash_count_query = {"handwash_facility": False}
-    if scope_match:
-        no_handwash_count_query.update(scope_match)
-    no_handwash_count = await db.classrooms_toilets.count_documents(no_handwash_count_query)
+    result = await db.classrooms_toilets.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    
+    def _count(name: str) -> int:
+        rows = facets.get(name) or []
+        return rows[0]["count"] if rows else 0
+    
+    zero_toilet_schools = facets.get("zero_toilet", [])
+    no_water_schools = facets.get("no_water", [])
+    no_handwash_schools = facets.get("no_handwash", [])
+    major_repair_schools = facets.get("major_repair", [])
+    total_schools = _count("total")
+    zero_toilet_count = _count("zero_toilet_count")
+    no_handwash_count = _count("no_handwash_count")
     
     return {
         "risk_summary": {
@@ -940,5 +942,7 @@ async def process_classrooms_toilets_file(file_path: str, filename: str, import_
         
     except Exception as e:
         logging.error(f"Error processing Classrooms & Toilets file: {str(e)}")
+    
+    await dataset_state.mark_imported("classrooms_toilets")
 
 
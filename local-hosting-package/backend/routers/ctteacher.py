@@ -8,9 +8,12 @@ import uuid
 from pathlib import Path
 import httpx
 import logging
+from utils.metrics import CTET_QUALIFIED
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/ctteacher", tags=["CT Teacher Analytics"])
+router = APIRouter(prefix="/ctteacher", tags=["CT Teacher Analytics"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -48,7 +51,7 @@ async def get_ctteacher_overview(
                 "female_count": {"$sum": {"$cond": [{"$in": ["$gender", ["2-Female", "Female"]]}, 1, 0]}},
                 "aadhaar_verified": {"$sum": {"$cond": [{"$eq": ["$aadhaar_verified", 1]}, 1, 0]}},
                 "completed": {"$sum": {"$cond": [{"$eq": ["$completion_status", "Completed"]}, 1, 0]}},
-                "ctet_qualified": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+                "ctet_qualified": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
                 "nishtha_completed": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}},
             }
         }
@@ -111,7 +114,7 @@ async def get_ctteacher_block_wise(
                 "male_count": {"$sum": {"$cond": [{"$in": ["$gender", ["1-Male", "Male"]]}, 1, 0]}},
                 "female_count": {"$sum": {"$cond": [{"$in": ["$gender", ["2-Female", "Female"]]}, 1, 0]}},
                 "aadhaar_verified": {"$sum": {"$cond": [{"$eq": ["$aadhaar_verified", 1]}, 1, 0]}},
-                "ctet_qualified": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+                "ctet_qualified": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
                 "nishtha_completed": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}},
                 "schools": {"$addToSet": "$udise_code"}
             }
@@ -232,21 +235,27 @@ async def get_ctteacher_qualification(
 ):
     """Get academic and professional qualification distribution"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
-    # Academic qualification
-    academic_pipeline = prepend_match([
-        {"$group": {"_id": "$academic_qualification", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ], scope_match)
-    cursor = db.ctteacher_analytics.aggregate(academic_pipeline)
-    academic = await cursor.to_list(length=20)
-    
-    # Professional qualification
-    prof_pipeline = prepend_match([
-        {"$group": {"_id": "$professional_qualification", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
+    # Academic and professional qualification in one scan
+    pipeline = prepend_match([
+        {
+            "$facet": {
+                "academic": [
+                    {"$group": {"_id": "$academic_qualification", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": 20}
+                ],
+                "professional": [
+                    {"$group": {"_id": "$professional_qualification", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": 20}
+                ],
+            }
+        }
     ], scope_match)
-    cursor = db.ctteacher_analytics.aggregate(prof_pipeline)
-    professional = await cursor.to_list(length=20)
+    result = await db.ctteacher_analytics.aggregate(pipeline).to_list(1)
+    facets = result[0] if result else {}
+    academic = facets.get("academic", [])
+    professional = facets.get("professional", [])
     
     # Simplify names
     academic_data = []
@@ -542,26 +551,35 @@ async def get_ctteacher_data_quality(
 ):
     """Get data quality metrics"""
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
-    query = scope_match if scope_match else {}
-    total_count = await db.ctteacher_analytics.count_documents(query)
-    
-    # Missing staff code
-    missing_staff_query = {"teacher_code": {"$in": [None, "", "nan"]}}
-    if scope_match:
-        missing_staff_query.update(scope_match)
-    missing_staff = await db.ctteacher_analytics.count_documents(missing_staff_query)
-    
-    # Aadhaar not verified (aadhaar_verified is 1 for verified, 2 or other for not)
-    aadhaar_query = {"aadhaar_verified": {"$ne": 1}}
-    if scope_match:
-        aadhaar_query.update(scope_match)
-    aadhaar_not_verified = await db.ctteacher_analytics.count_documents(aadhaar_query)
-    
-    # Not completed
-    not_completed_query = {"completion_status": {"$ne": "Completed"}}
-    if scope_match:
-        not_completed_query.update(scope_match)
-    not_completed = await db.ctteacher_analytics.count_documents(not_completed_query)
+    # All four counts from one scan
+    pipeline = prepend_match([
+        {
+            "$facet": {
+                "total": [{"$count": "count"}],
+                # Missing staff code
+                "missing_staff": [
+                    {"$match": {"teacher_code": {"$in": [None, "", "nan"]}}},
+                    {"$count": "count"}
+                ],
+                # Aadhaar not verified (aadhaar_verified is 1 for verified, 2 or other for not)
+                "aadhaar_not_verified": [
+                    {"$match": {"aadhaar_verified": {"$ne": 1}}},
+                    {"$count": "count"}
+                ],
+                # Not completed
+                "not_completed": [
+                    {"$match": {"completion_status": {"$ne": "Completed"}}},
+                    {"$count": "count"}
+                ],
+            }
+        }
+    ], scope_match)
+    result = await db.ctteacher_analytics.aggregate(pipeline).to_list(1)
+    counts = {name: rows[0]["count"] if rows else 0 for name, rows in (result[0] if result else {}).items()}
+    total_count = counts.get("total", 0)
+    missing_staff = counts.get("missing_staff", 0)
+    aadhaar_not_verified = counts.get("aadhaar_not_verified", 0)
+    not_completed = counts.get("not_completed", 0)
     
     return {
         "total_records": total_count,
@@ -590,7 +608,7 @@ async def get_ctteacher_certification(
             "$group": {
                 "_id": None,
                 "total": {"$sum": 1},
-                "ctet_yes": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+                "ctet_yes": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
                 "ctet_no": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 2]}, 1, 0]}},
                 "ctet_unknown": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 9]}, 1, 0]}},
                 "nishtha_yes": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}},
@@ -752,5 +770,7 @@ async def process_ctteacher_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logging.error(f"CTTeacher import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("ctteacher_analytics")
 
 
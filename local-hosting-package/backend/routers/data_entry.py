@@ -8,8 +8,10 @@ import uuid
 from pathlib import Path
 import httpx
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/data-entry", tags=["Data Entry Status"])
+router = APIRouter(prefix="/data-entry", tags=["Data Entry Status"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -568,5 +570,7 @@ async def process_data_entry_file(file_path: str, filename: str, import_id: str)
         
     except Exception as e:
         logger.error(f"Data Entry Status import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("data_entry_analytics")
 
 
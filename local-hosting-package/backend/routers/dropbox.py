@@ -8,8 +8,10 @@ import uuid
 from pathlib import Path
 import httpx
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state, metrics
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/dropbox", tags=["Dropbox Remarks"])
+router = APIRouter(prefix="/dropbox", tags=["Dropbox Remarks"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -20,6 +22,9 @@ def init_db(database, uploads_dir):
     db = database
     UPLOADS_DIR = uploads_dir
 
+# total_remarks is already stored; index it per scope for the top/bottom school reads
+metrics.register("dropbox_analytics", {}, indexed=["total_remarks"])
+
 # Helper functions
 def safe_str_val(row, columns, possible_names):
     """Safely get string value from row"""
@@ -251,7 +256,9 @@ async def get_dropbox_top_schools(
     scope_match = build_scope_match(district_code=district_code, block_code=block_code, udise_code=udise_code)
     
     pipeline = [
-        {"$match": {**scope_match, "total_remarks": {"$gt": 0}}} if scope_match else {"$match": {"total_remarks": {"$gt": 0}}},
+        {"$match": {**scope_match, "total_remarks": {"$gt": 0}}},
+        {"$sort": {"total_remarks": sort_order}},
+        {"$limit": 20},
         {
             "$project": {
                 "udise_code": 1,
@@ -266,9 +273,7 @@ async def get_dropbox_top_schools(
                 "wrong_entry": 1,
                 "class12_passed": 1,
             }
-        },
-        {"$sort": {"total_remarks": sort_order}},
-        {"$limit": 20}
+        }
     ]
     
     cursor = db.dropbox_analytics.aggregate(pipeline)
@@ -571,5 +576,7 @@ async def process_dropbox_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logger.error(f"Dropbox import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("dropbox_analytics")
 
 
@@ -8,8 +8,10 @@ import uuid
 from pathlib import Path
 import httpx
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state, metrics
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/enrolment", tags=["Enrolment Analytics"])
+router = APIRouter(prefix="/enrolment", tags=["Enrolment Analytics"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -20,6 +22,21 @@ def init_db(database, uploads_dir):
     db = database
     UPLOADS_DIR = uploads_dir
 
+# Stored on every school at import; (scope, metric) indexes back the risk-school reads
+metrics.register(
+    "enrolment_analytics",
+    {
+        "gpi": {
+            "$cond": [
+                {"$gt": ["$boys_enrolment", 0]},
+                {"$divide": ["$girls_enrolment", "$boys_enrolment"]},
+                0,
+            ]
+        },
+    },
+    indexed=["gpi", "total_enrolment"],
+)
+
 @router.get("/overview")
 async def get_enrolment_overview(
     district_code: Optional[str] = Query(None),
@@ -522,12 +539,15 @@ async def get_risk_schools(
         sort_field = "total_enrolment"
         sort_order = -1
     else:  # gender risk
-        match_condition = {}
+        match_condition = {"boys_enrolment": {"$gt": 0}, "gpi": {"$lt": 0.85}}
         sort_field = "gpi"
         sort_order = 1
     
+    # Sort on the stored field first so the (scope, metric) index serves the top 20
     pipeline = [
-        {"$match": {**scope_match, **match_condition}} if scope_match or match_condition else {"$match": {}},
+        {"$match": {**scope_match, **match_condition}},
+        {"$sort": {sort_field: sort_order}},
+        {"$limit": 20},
         {
             "$project": {
                 "_id": 0,
@@ -537,17 +557,11 @@ async def get_risk_schools(
                 "total_boys": "$boys_enrolment",
                 "total_girls": "$girls_enrolment",
                 "grand_total": "$total_enrolment",
-                "gpi": {"$cond": [{"$gt": ["$boys_enrolment", 0]}, {"$divide": ["$girls_enrolment", "$boys_enrolment"]}, 0]}
+                "gpi": 1
             }
-        },
-        {"$sort": {sort_field: sort_order}},
-        {"$limit": 20}
+        }
     ]
     
-    if risk_type == "gender":
-        pipeline[0] = {"$match": {**scope_match, "boys_enrolment": {"$gt": 0}}} if scope_match else {"$match": {"boys_enrolment": {"$gt": 0}}}
-        pipeline.insert(3, {"$match": {"gpi": {"$lt": 0.85}}})
-    
     cursor = db.enrolment_analytics.aggregate(pipeline)
     results = await cursor.to_list(length=20)
     
@@ -708,5 +722,8 @@ async def process_enrolment_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logger.error(f"Enrolment import failed: {str(e)}")
+    
+    await metrics.materialize(db, "enrolment_analytics")
+    await dataset_state.mark_imported("enrolment_analytics")
 
 
@@ -2,9 +2,11 @@
 from fastapi import APIRouter, HTTPException, Query
 from datetime import datetime, timezone
 from typing import List, Optional
+from utils.metrics import CTET_QUALIFIED
 from utils.scope import build_scope_match, prepend_match
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/executive", tags=["Executive Dashboard"])
+router = APIRouter(prefix="/executive", tags=["Executive Dashboard"], route_class=ORJSONRoute)
 
 # Maharashtra district name -> code (used as fallback for map drilldowns)
 MAHA_DISTRICT_CODES = {
@@ -352,7 +354,7 @@ async def get_teacher_staffing(
             "unique_teachers": {"$addToSet": "$teacher_code"},
             "total_schools": {"$addToSet": "$udise_code"},
             "aadhaar_verified": {"$sum": {"$cond": [{"$eq": ["$aadhaar_verified", 1]}, 1, 0]}},
-            "ctet_qualified": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+            "ctet_qualified": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
             "nishtha_completed": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}},
             "female_count": {"$sum": {"$cond": [{"$regexMatch": {"input": "$gender", "regex": "Female|2-"}}, 1, 0]}},
             "male_count": {"$sum": {"$cond": [{"$regexMatch": {"input": "$gender", "regex": "Male|1-"}}, 1, 0]}}
@@ -381,7 +383,7 @@ async def get_teacher_staffing(
         {"$group": {
             "_id": {"block_code": "$block_code", "block_name": "$block_name"},
             "teachers": {"$sum": 1},
-            "ctet": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+            "ctet": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
             "nishtha": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}}
         }},
         {"$project": {
@@ -876,7 +878,7 @@ async def get_district_map_data(
             "_id": "$district_name",
             "district_code": {"$first": "$district_code"},
             "total_teachers": {"$sum": 1},
-            "ctet_qualified": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", 1]}, 1, 0]}},
+            "ctet_qualified": {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}},
             "nishtha_completed": {"$sum": {"$cond": [{"$eq": ["$training_nishtha", 1]}, 1, 0]}}
         }}
     ]
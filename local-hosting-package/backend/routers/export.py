@@ -1,26 +1,23 @@
 """Export routes for PDF and Excel"""
-from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Optional, List, Any, AsyncIterator, Awaitable, Callable, Dict
+import asyncio
+import csv
 import io
 import json
+import os
+import tempfile
+import zlib
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-
+from utils import export_cache, export_jobs, export_render, render_pool
 from utils.auth import require_export_permission
+from utils.metrics import CTET_QUALIFIED
+from utils.scope import build_scope_match, prepend_match
+from utils.responses import ORJSONResponse, ORJSONRoute
 
-router = APIRouter(prefix="/export", tags=["Export"])
+router = APIRouter(prefix="/export", tags=["Export"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -29,74 +26,94 @@ def init_db(database):
     global db
     db = database
 
-# Excel styling
-HEADER_FILL = PatternFill(start_color="1E3A5F", end_color="1E3A5F", fill_type="solid")
-HEADER_FONT = Font(bold=True, color="FFFFFF", size=11)
-DATA_FONT = Font(size=10)
-THIN_BORDER = Border(
-    left=Side(style='thin'),
-    right=Side(style='thin'),
-    top=Side(style='thin'),
-    bottom=Side(style='thin')
-)
-
-def style_excel_sheet(ws, headers, start_row=1):
-    """Apply styling to Excel sheet"""
-    # Set headers
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = THIN_BORDER
-    
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        max_length = len(str(headers[col-1]))
-        for row in range(start_row + 1, ws.max_row + 1):
-            try:
-                cell_value = ws.cell(row=row, column=col).value
-                if cell_value:
-                    max_length = max(max_length, len(str(cell_value)))
-            except:
-                pass
-        ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
-
-def add_data_rows(ws, data, start_row=2):
-    """Add data rows to Excel sheet"""
-    for row_idx, row_data in enumerate(data, start_row):
-        for col_idx, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.font = DATA_FONT
-            cell.border = THIN_BORDER
-            cell.alignment = Alignment(horizontal='center' if isinstance(value, (int, float)) else 'left')
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Documents per keyset page when reading an export's rows
+EXPORT_PAGE_SIZE = 2000
+# The dashboard PDF shows a sample table, not the full dataset
+PDF_MAX_ROWS = 30
+# Uncached exports with more rows than this are rendered as background jobs
+EXPORT_JOB_MIN_ROWS = int(os.environ.get("EXPORT_JOB_MIN_ROWS", "50000"))
+
+def _scope_key(district_code: Optional[str], block_code: Optional[str]) -> dict:
+    return {"district_code": district_code, "block_code": block_code}
+
+async def spool_rows(rows: AsyncIterator[list]) -> str:
+    """Write rows to a temp file (one JSON array per line) for a render worker; returns its path"""
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            async for row in rows:
+                f.write(json.dumps(row, default=str))
+                f.write("\n")
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+def _limited(current_user: dict, render: Callable[[str], Awaitable[None]], wait: bool = False):
+    """Wrap a render so it counts against the user's concurrent export limit"""
+    async def run(path: str):
+        async with render_pool.user_slot(current_user.get("email") or "", wait=wait):
+            await render(path)
+    return run
+
+async def deliver(
+    request: Request,
+    current_user: dict,
+    kind: str,
+    scope: Optional[dict],
+    suffix: str,
+    media_type: str,
+    filename: str,
+    render: Callable[[str], Awaitable[None]],
+    count_rows: Optional[Callable[[], Awaitable[int]]] = None,
+):
+    """Serve an export from the cache, rendering it now or, when large, as a background job.
+
+    A job answers 202 with a status URL; once it is done the original URL is
+    served straight from the cache.
+    """
+    if (count_rows is not None and export_cache.enabled()
+            and not export_cache.has(kind, scope, suffix)
+            and await count_rows() > EXPORT_JOB_MIN_ROWS):
+        job_id = export_cache.cache_key(kind, scope)
+        job = await export_jobs.active(job_id, current_user.get("email"))
+        if job is None:
+            render_pool.check_capacity(current_user.get("email") or "")
+            download_url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+            job = await export_jobs.submit(
+                job_id,
+                owner=current_user.get("email"),
+                download_url=download_url,
+                work=lambda: export_cache.ensure(kind, scope, suffix, _limited(current_user, render, wait=True)),
+            )
+        status_url = f"/api/export/jobs/{job['job_id']}"
+        return ORJSONResponse(status_code=202, content={**job, "status_url": status_url},
+                              headers={"Location": status_url})
+    
+    return await export_cache.serve(request, kind, scope, suffix, media_type, filename, _limited(current_user, render))
 
 # ============== EXCEL EXPORTS ==============
 
 @router.get("/excel/executive-summary")
-async def export_executive_summary_excel(current_user: dict = Depends(require_export_permission)):
+async def export_executive_summary_excel(request: Request, current_user: dict = Depends(require_export_permission)):
     """Export Executive Summary to Excel"""
-    wb = Workbook()
-    
-    # Sheet 1: Overview KPIs
-    ws1 = wb.active
-    ws1.title = "Executive Summary"
-    
+    return await deliver(
+        request, current_user, "excel:executive-summary", None, ".xlsx", XLSX_MEDIA_TYPE,
+        f"executive_summary_{datetime.now().strftime('%Y%m%d')}.xlsx", render_executive_summary_excel
+    )
+
+async def render_executive_summary_excel(path: str):
     # Fetch data from all collections
-    shi_data = await get_shi_data()
-    
-    # Add title
-    ws1.merge_cells('A1:F1')
-    ws1['A1'] = "Maharashtra Education Dashboard - Executive Summary"
-    ws1['A1'].font = Font(bold=True, size=14)
-    ws1['A1'].alignment = Alignment(horizontal='center')
-    
-    ws1['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    
-    # KPI Summary
+    plan = FetchPlan()
+    shi_data, block_data = await asyncio.gather(get_shi_data(plan), plan.block_rankings())
+    await render_pool.run(export_render.build_workbook, path, executive_summary_sheets(shi_data, block_data))
+
+def executive_summary_sheets(shi_data: dict, block_data: List[dict]) -> List[dict]:
+    """Executive Summary and Block Rankings sheets for export_render.build_workbook"""
+    # Sheet 1: Overview KPIs
     headers = ["Domain", "Score", "Status", "Key Metric 1", "Key Metric 2", "Weight"]
-    style_excel_sheet(ws1, headers, start_row=5)
-    
     data = [
         ["Student Identity", shi_data.get("identity_index", 0), "Green" if shi_data.get("identity_index", 0) >= 85 else "Amber", 
          f"Aadhaar: {shi_data.get('aadhaar_pct', 0)}%", f"APAAR: {shi_data.get('apaar_pct', 0)}%", "25%"],
@@ -108,295 +125,288 @@ async def export_executive_summary_excel(current_user: dict = Depends(require_ex
          f"Completion: {shi_data.get('completion_rate', 0)}%", f"Certification: {shi_data.get('cert_rate', 0)}%", "25%"],
         ["School Health Index", shi_data.get("shi", 0), shi_data.get("rag_status", "Red"), "", "", "100%"]
     ]
-    add_data_rows(ws1, data, start_row=6)
     
     # Sheet 2: Block Rankings
-    ws2 = wb.create_sheet("Block Rankings")
-    block_data = await get_block_rankings()
-    
-    headers = ["Rank", "Block Name", "SHI Score", "Identity", "Infrastructure", "Teacher", "Operational", "RAG Status"]
-    style_excel_sheet(ws2, headers)
-    
+    block_headers = ["Rank", "Block Name", "SHI Score", "Identity", "Infrastructure", "Teacher", "Operational", "RAG Status"]
     block_rows = [[b["rank"], b["block_name"], b["shi_score"], b["identity"], b["infra"], b["teacher"], b["ops"], b["rag"]] 
                   for b in block_data]
-    add_data_rows(ws2, block_rows)
-    
-    # Save to bytes
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
     
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=executive_summary_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    return [
+        {"name": "Executive Summary", "title": "Maharashtra Education Dashboard - Executive Summary",
+         "headers": headers, "rows": data},
+        {"name": "Block Rankings", "headers": block_headers, "rows": block_rows},
+    ]
 
 @router.get("/excel/{dashboard_name}")
-async def export_dashboard_excel(dashboard_name: str, current_user: dict = Depends(require_export_permission)):
+async def export_dashboard_excel(
+    request: Request,
+    dashboard_name: str,
+    district_code: Optional[str] = Query(None),
+    block_code: Optional[str] = Query(None),
+    current_user: dict = Depends(require_export_permission)
+):
     """Export specific dashboard to Excel"""
-    wb = Workbook()
-    ws = wb.active
-    
-    # Map dashboard names to data fetchers
-    dashboard_map = {
-        "aadhaar": ("Aadhaar Analytics", fetch_aadhaar_data),
-        "apaar": ("APAAR Status", fetch_apaar_data),
-        "teacher": ("Teacher Analytics", fetch_teacher_data),
-        "infrastructure": ("Infrastructure", fetch_infrastructure_data),
-        "enrolment": ("Enrolment Analytics", fetch_enrolment_data),
-        "classrooms-toilets": ("Classrooms & Toilets", fetch_classrooms_toilets_data),
-        "dropbox": ("Dropbox Remarks", fetch_dropbox_data),
-        "data-entry": ("Data Entry Status", fetch_data_entry_data),
-        "age-enrolment": ("Age-wise Enrolment", fetch_age_enrolment_data),
-        "ctteacher": ("CTTeacher Analytics", fetch_ctteacher_data),
-    }
-    
-    if dashboard_name not in dashboard_map:
-        raise HTTPException(status_code=404, detail=f"Dashboard '{dashboard_name}' not found")
-    
-    title, fetch_func = dashboard_map[dashboard_name]
-    ws.title = title[:31]  # Excel sheet name limit
-    
-    # Add title
-    ws.merge_cells('A1:H1')
-    ws['A1'] = f"Maharashtra Education Dashboard - {title}"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    
-    # Fetch and add data
-    data = await fetch_func()
-    if data["headers"] and data["rows"]:
-        style_excel_sheet(ws, data["headers"], start_row=5)
-        add_data_rows(ws, data["rows"], start_row=6)
-    
-    # Add KPI summary sheet
-    if data.get("kpis"):
-        ws2 = wb.create_sheet("KPI Summary")
-        kpi_headers = ["Metric", "Value", "Target", "Status"]
-        style_excel_sheet(ws2, kpi_headers)
-        add_data_rows(ws2, [[k["name"], k["value"], k.get("target", "-"), k.get("status", "-")] for k in data["kpis"]])
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    spec = get_dashboard_export(dashboard_name)
+    scope_match = build_scope_match(district_code=district_code, block_code=block_code)
+    return await deliver(
+        request, current_user, f"excel:{dashboard_name}", _scope_key(district_code, block_code), ".xlsx", XLSX_MEDIA_TYPE,
+        f"{dashboard_name}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+        lambda path: render_dashboard_excel(path, spec, scope_match),
+        count_rows=lambda: count_export_rows(spec, scope_match),
+    )
+
+async def render_dashboard_excel(path: str, spec: dict, scope_match: dict):
+    title = spec["title"]
+    # Every row in scope, spooled to disk for the render worker
+    spool = await spool_rows(export_rows(spec, scope_match))
+    try:
+        sheets = [{"name": title, "title": f"Maharashtra Education Dashboard - {title}", "span": 8,
+                   "headers": spec["headers"], "rows_file": spool}]
+        
+        # Add KPI summary sheet
+        kpis = await export_kpis(spec, FetchPlan(scope_match))
+        if kpis:
+            sheets.append({"name": "KPI Summary", "headers": ["Metric", "Value", "Target", "Status"],
+                           "rows": [[k["name"], k["value"], k.get("target", "-"), k.get("status", "-")] for k in kpis]})
+        
+        await render_pool.run(export_render.build_workbook, path, sheets)
+    finally:
+        os.unlink(spool)
+
+# ============== CSV EXPORTS ==============
+
+async def csv_chunks(headers: List[str], rows: AsyncIterator[list], compress: bool = False) -> AsyncIterator[bytes]:
+    """Encode rows as CSV (optionally gzip) and yield ~EXPORT_CHUNK_SIZE pieces.
+
+    The header line is flushed first so the download starts before the
+    first page of data has been read.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    gzipper = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    
+    def take(final: bool = False, sync: bool = False) -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        if gzipper is None:
+            return data
+        out = gzipper.compress(data)
+        if final:
+            out += gzipper.flush()
+        elif sync:
+            out += gzipper.flush(zlib.Z_SYNC_FLUSH)
+        return out
+    
+    writer.writerow(headers)
+    yield take(sync=True)
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            chunk = take()
+            if chunk:
+                yield chunk
+    chunk = take(final=True)
+    if chunk:
+        yield chunk
+
+@router.get("/csv/{dashboard_name}")
+async def export_dashboard_csv(
+    dashboard_name: str,
+    district_code: Optional[str] = Query(None),
+    block_code: Optional[str] = Query(None),
+    compress: bool = Query(False, alias="gzip", description="Return a gzip-compressed .csv.gz file"),
+    current_user: dict = Depends(require_export_permission)
+):
+    """Export all rows of a dashboard in scope as CSV (or gzip CSV), streamed as it is read"""
+    spec = get_dashboard_export(dashboard_name)
+    scope_match = build_scope_match(district_code=district_code, block_code=block_code)
+    filename = f"{dashboard_name}_{datetime.now().strftime('%Y%m%d')}.csv"
+    if compress:
+        filename += ".gz"
     
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={dashboard_name}_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+        csv_chunks(spec["headers"], export_rows(spec, scope_match), compress=compress),
+        media_type="application/gzip" if compress else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 # ============== PDF EXPORTS ==============
 
 @router.get("/pdf/executive-summary")
-async def export_executive_summary_pdf(current_user: dict = Depends(require_export_permission)):
+async def export_executive_summary_pdf(request: Request, current_user: dict = Depends(require_export_permission)):
     """Export Executive Summary to PDF with charts"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=20)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=1, textColor=colors.grey)
-    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=14, spaceBefore=15, spaceAfter=10)
-    
-    elements = []
-    
-    # Title
-    elements.append(Paragraph("Maharashtra Education Dashboard", title_style))
-    elements.append(Paragraph("Executive Summary Report", subtitle_style))
-    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", subtitle_style))
-    elements.append(Spacer(1, 20))
-    
-    # Fetch data
-    shi_data = await get_shi_data()
-    
-    # School Health Index section
-    elements.append(Paragraph("School Health Index (SHI)", heading_style))
-    
-    shi_table_data = [
-        ["Metric", "Score", "Status"],
-        ["School Health Index", f"{shi_data.get('shi', 0)}", shi_data.get('rag_status', 'Red')],
-        ["Student Identity", f"{shi_data.get('identity_index', 0)}", "25% Weight"],
-        ["Infrastructure", f"{shi_data.get('infra_index', 0)}", "25% Weight"],
-        ["Teacher Quality", f"{shi_data.get('teacher_index', 0)}", "25% Weight"],
-        ["Operational", f"{shi_data.get('ops_index', 0)}", "25% Weight"],
-    ]
-    
-    shi_table = Table(shi_table_data, colWidths=[3*inch, 2*inch, 2*inch])
-    shi_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor("#E8F5E9") if shi_data.get('shi', 0) >= 85 else colors.HexColor("#FFEBEE")),
-        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(shi_table)
-    elements.append(Spacer(1, 20))
-    
-    # Key Statistics
-    elements.append(Paragraph("Key Statistics", heading_style))
-    stats_data = [
-        ["Total Schools", "Total Students", "Total Teachers", "Total Classrooms", "Total Toilets"],
-        [f"{shi_data.get('total_schools', 0):,}", f"{shi_data.get('total_students', 0):,}", 
-         f"{shi_data.get('total_teachers', 0):,}", f"{shi_data.get('total_classrooms', 0):,}",
-         f"{shi_data.get('total_toilets', 0):,}"]
-    ]
-    stats_table = Table(stats_data, colWidths=[1.5*inch]*5)
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 1), (-1, 1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(stats_table)
-    elements.append(PageBreak())
-    
-    # Block Rankings
-    elements.append(Paragraph("Block-wise Performance Rankings", heading_style))
-    block_data = await get_block_rankings()
-    
-    block_table_data = [["Rank", "Block", "SHI", "Identity", "Infra", "Teacher", "Ops", "Status"]]
-    for b in block_data[:15]:
-        block_table_data.append([
-            str(b["rank"]), b["block_name"], f"{b['shi_score']}", 
-            f"{b['identity']}", f"{b['infra']}", f"{b['teacher']}", f"{b['ops']}", b["rag"]
-        ])
-    
-    block_table = Table(block_table_data, colWidths=[0.5*inch, 1.5*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch])
-    block_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
-    ]))
-    elements.append(block_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=executive_summary_{datetime.now().strftime('%Y%m%d')}.pdf"}
+    return await deliver(
+        request, current_user, "pdf:executive-summary", None, ".pdf", "application/pdf",
+        f"executive_summary_{datetime.now().strftime('%Y%m%d')}.pdf", render_executive_summary_pdf
     )
 
+async def render_executive_summary_pdf(path: str):
+    plan = FetchPlan()
+    shi_data, block_data = await asyncio.gather(get_shi_data(plan), plan.block_rankings())
+    await render_pool.run(export_render.build_executive_summary_pdf, path, shi_data, block_data)
+
 @router.get("/pdf/{dashboard_name}")
-async def export_dashboard_pdf(dashboard_name: str, current_user: dict = Depends(require_export_permission)):
+async def export_dashboard_pdf(
+    request: Request,
+    dashboard_name: str,
+    district_code: Optional[str] = Query(None),
+    block_code: Optional[str] = Query(None),
+    current_user: dict = Depends(require_export_permission)
+):
     """Export specific dashboard to PDF"""
-    dashboard_map = {
-        "aadhaar": ("Aadhaar Analytics", fetch_aadhaar_data),
-        "apaar": ("APAAR Status", fetch_apaar_data),
-        "teacher": ("Teacher Analytics", fetch_teacher_data),
-        "infrastructure": ("Infrastructure", fetch_infrastructure_data),
-        "enrolment": ("Enrolment Analytics", fetch_enrolment_data),
-        "classrooms-toilets": ("Classrooms & Toilets", fetch_classrooms_toilets_data),
-        "dropbox": ("Dropbox Remarks", fetch_dropbox_data),
-        "data-entry": ("Data Entry Status", fetch_data_entry_data),
-        "age-enrolment": ("Age-wise Enrolment", fetch_age_enrolment_data),
-        "ctteacher": ("CTTeacher Analytics", fetch_ctteacher_data),
-    }
-    
-    if dashboard_name not in dashboard_map:
-        raise HTTPException(status_code=404, detail=f"Dashboard '{dashboard_name}' not found")
-    
-    title, fetch_func = dashboard_map[dashboard_name]
-    data = await fetch_func()
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=1, spaceAfter=15)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=1, textColor=colors.grey)
-    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=12, spaceBefore=10, spaceAfter=8)
-    
-    elements = []
-    
-    # Title
-    elements.append(Paragraph(f"Maharashtra Education Dashboard - {title}", title_style))
-    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", subtitle_style))
-    elements.append(Spacer(1, 15))
-    
-    # KPIs
-    if data.get("kpis"):
-        elements.append(Paragraph("Key Performance Indicators", heading_style))
-        kpi_data = [["Metric", "Value", "Status"]]
-        for kpi in data["kpis"][:10]:
-            kpi_data.append([kpi["name"], str(kpi["value"]), kpi.get("status", "-")])
+    spec = get_dashboard_export(dashboard_name)
+    scope_match = build_scope_match(district_code=district_code, block_code=block_code)
+    return await deliver(
+        request, current_user, f"pdf:{dashboard_name}", _scope_key(district_code, block_code), ".pdf", "application/pdf",
+        f"{dashboard_name}_{datetime.now().strftime('%Y%m%d')}.pdf",
+        lambda path: render_dashboard_pdf(path, spec, scope_match)
+    )
+
+async def render_dashboard_pdf(path: str, spec: dict, scope_match: dict):
+    data = await dashboard_pdf_data(spec, FetchPlan(scope_match))
+    await render_pool.run(export_render.build_dashboard_pdf, path, spec["title"], data)
+
+async def dashboard_pdf_data(spec: dict, plan: "FetchPlan") -> dict:
+    """KPIs plus the first PDF_MAX_ROWS rows of a dashboard"""
+    rows, kpis = await asyncio.gather(
+        _collect(export_rows(spec, plan.scope_match, limit=PDF_MAX_ROWS)),
+        export_kpis(spec, plan),
+    )
+    return {"headers": spec["headers"], "rows": rows, "kpis": kpis}
+
+async def _collect(rows: AsyncIterator[list]) -> List[list]:
+    return [row async for row in rows]
+
+# ============== BUNDLE EXPORTS ==============
+
+def _bundle_names(dashboards: Optional[str]) -> List[str]:
+    if not dashboards:
+        return list(DASHBOARD_EXPORTS)
+    names = []
+    for name in (n.strip() for n in dashboards.split(",")):
+        if name and name not in names:
+            get_dashboard_export(name)
+            names.append(name)
+    return names
+
+@router.get("/bundle")
+async def export_bundle(
+    request: Request,
+    file_format: str = Query("excel", alias="format", pattern="^(excel|pdf)$",
+                             description="excel: one multi-sheet workbook, pdf: a zip of PDFs"),
+    dashboards: Optional[str] = Query(None, description="Comma-separated dashboard names (default: all)"),
+    district_code: Optional[str] = Query(None),
+    block_code: Optional[str] = Query(None),
+    current_user: dict = Depends(require_export_permission)
+):
+    """Export the executive summary and several dashboards in one download"""
+    names = _bundle_names(dashboards)
+    scope_match = build_scope_match(district_code=district_code, block_code=block_code)
+    kind = f"bundle-{file_format}:{','.join(names)}"
+    date = datetime.now().strftime('%Y%m%d')
+    
+    if file_format == "excel":
+        return await deliver(
+            request, current_user, kind, _scope_key(district_code, block_code), ".xlsx", XLSX_MEDIA_TYPE,
+            f"dashboards_{date}.xlsx",
+            lambda path: render_bundle_excel(path, names, scope_match),
+            count_rows=lambda: count_bundle_rows(names, scope_match),
+        )
+    return await deliver(
+        request, current_user, kind, _scope_key(district_code, block_code), ".zip", "application/zip",
+        f"dashboards_{date}.zip",
+        lambda path: render_bundle_pdf(path, names, scope_match),
+    )
+
+async def count_bundle_rows(names: List[str], scope_match: dict) -> int:
+    counts = await asyncio.gather(*(count_export_rows(DASHBOARD_EXPORTS[name], scope_match) for name in names))
+    return sum(counts)
+
+async def render_bundle_excel(path: str, names: List[str], scope_match: dict):
+    """One workbook: executive summary, block rankings, a sheet per dashboard and all KPIs"""
+    plan = FetchPlan(scope_match)
+    specs = [DASHBOARD_EXPORTS[name] for name in names]
+    spools: List[str] = []
+    
+    async def spool(spec: dict) -> str:
+        rows_file = await spool_rows(export_rows(spec, scope_match))
+        spools.append(rows_file)
+        return rows_file
+    
+    try:
+        shi_data, block_data, kpis, row_files = await asyncio.gather(
+            get_shi_data(plan),
+            plan.block_rankings(),
+            asyncio.gather(*(export_kpis(spec, plan) for spec in specs)),
+            asyncio.gather(*(spool(spec) for spec in specs)),
+        )
         
-        kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch, 1.5*inch])
-        kpi_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
-        elements.append(kpi_table)
-        elements.append(Spacer(1, 15))
-    
-    # Data table
-    if data.get("headers") and data.get("rows"):
-        elements.append(Paragraph("Detailed Data", heading_style))
-        table_data = [data["headers"]] + data["rows"][:30]  # Limit rows for PDF
+        sheets = executive_summary_sheets(shi_data, block_data)
+        for spec, rows_file in zip(specs, row_files):
+            sheets.append({"name": spec["title"], "title": f"Maharashtra Education Dashboard - {spec['title']}", "span": 8,
+                           "headers": spec["headers"], "rows_file": rows_file})
+        sheets.append({
+            "name": "KPI Summary",
+            "headers": ["Dashboard", "Metric", "Value", "Target", "Status"],
+            "rows": [[spec["title"], k["name"], k["value"], k.get("target", "-"), k.get("status", "-")]
+                     for spec, spec_kpis in zip(specs, kpis) for k in spec_kpis],
+        })
         
-        col_width = min(1.2*inch, 10*inch / len(data["headers"]))
-        detail_table = Table(table_data, colWidths=[col_width] * len(data["headers"]))
-        detail_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
-        ]))
-        elements.append(detail_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={dashboard_name}_{datetime.now().strftime('%Y%m%d')}.pdf"}
+        await render_pool.run(export_render.build_workbook, path, sheets)
+    finally:
+        for rows_file in spools:
+            os.unlink(rows_file)
+
+async def render_bundle_pdf(path: str, names: List[str], scope_match: dict):
+    """A zip holding the executive summary PDF and one PDF per dashboard"""
+    plan = FetchPlan(scope_match)
+    specs = [DASHBOARD_EXPORTS[name] for name in names]
+    shi_data, block_data, datas = await asyncio.gather(
+        get_shi_data(plan),
+        plan.block_rankings(),
+        asyncio.gather(*(dashboard_pdf_data(spec, plan) for spec in specs)),
     )
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        summary_file = os.path.join(tmp, "executive_summary.pdf")
+        files = [(f"{name}.pdf", os.path.join(tmp, f"{name}.pdf")) for name in names]
+        # The PDFs are independent, so the pool renders them in parallel
+        await asyncio.gather(
+            render_pool.run(export_render.build_executive_summary_pdf, summary_file, shi_data, block_data),
+            *(render_pool.run(export_render.build_dashboard_pdf, file, spec["title"], data)
+              for (_, file), spec, data in zip(files, specs, datas)),
+        )
+        await render_pool.run(export_render.zip_files, path, [("executive_summary.pdf", summary_file), *files])
+
+# ============== EXPORT JOBS ==============
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(job_id: str, current_user: dict = Depends(require_export_permission)):
+    """Status of a background export; `download_url` serves the file once it is done.
+
+    Only users who submitted or joined the job see it; to anyone else it does not exist.
+    """
+    job = await export_jobs.get(job_id, current_user.get("email"))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
 
 # ============== DATA FETCHERS ==============
 
-async def get_shi_data():
+async def get_shi_data(plan: Optional["FetchPlan"] = None):
     """Fetch SHI and overview data"""
-    # Get infrastructure data
-    ct_pipeline = [{"$group": {"_id": None, "schools": {"$sum": 1}, "classrooms": {"$sum": "$classrooms_instructional"},
-                               "good": {"$sum": {"$add": ["$pucca_good", "$part_pucca_good"]}},
-                               "toilets": {"$sum": {"$add": ["$boys_toilets_total", "$girls_toilets_total"]}},
-                               "func_toilets": {"$sum": {"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}}}}]
-    ct_result = await db.classrooms_toilets.aggregate(ct_pipeline).to_list(1)
-    ct = ct_result[0] if ct_result else {}
-    
-    # Get APAAR data
-    apaar_pipeline = [{"$group": {"_id": None, "students": {"$sum": "$total_student"}, "generated": {"$sum": "$total_generated"}}}]
-    apaar_result = await db.apaar_status.aggregate(apaar_pipeline).to_list(1)
-    apaar = apaar_result[0] if apaar_result else {}
-    
-    # Get teacher data
-    teacher_count = await db.ctteacher.count_documents({})
+    plan = plan or FetchPlan()
+    # Infrastructure, APAAR and teacher totals (shared with the KPIs of those dashboards)
+    ct, apaar, teachers = await asyncio.gather(
+        plan.totals("classrooms_toilets"), plan.totals("apaar_status"), plan.totals("ctteacher")
+    )
+    teacher_count = teachers.get("count", 0)
     
     # Calculate indices
-    classroom_health = round(ct.get("good", 0) / max(ct.get("classrooms", 1), 1) * 100, 1)
+    classroom_health = round(ct.get("shi_good", 0) / max(ct.get("classrooms", 1), 1) * 100, 1)
     toilet_pct = round(ct.get("func_toilets", 0) / max(ct.get("toilets", 1), 1) * 100, 1)
-    apaar_pct = round(apaar.get("generated", 0) / max(apaar.get("students", 1), 1) * 100, 1)
+    apaar_pct = round(apaar.get("generated", 0) / max(apaar.get("total", 1), 1) * 100, 1)
     
     infra_index = round((classroom_health * 0.5 + toilet_pct * 0.5), 1)
     identity_index = round(apaar_pct * 0.6 + 40, 1)  # Simplified
@@ -420,16 +430,16 @@ async def get_shi_data():
         "nishtha_pct": 32.3,
         "completion_rate": 99.9,
         "cert_rate": 45,
-        "total_schools": ct.get("schools", 0),
-        "total_students": apaar.get("students", 0),
+        "total_schools": ct.get("count", 0),
+        "total_students": apaar.get("total", 0),
         "total_teachers": teacher_count,
         "total_classrooms": ct.get("classrooms", 0),
         "total_toilets": ct.get("toilets", 0)
     }
 
-async def get_block_rankings():
+async def get_block_rankings(scope_match: Optional[dict] = None):
     """Fetch block-wise rankings"""
-    pipeline = [
+    pipeline = prepend_match([
         {"$group": {
             "_id": "$block_name",
             "schools": {"$sum": 1},
@@ -437,7 +447,7 @@ async def get_block_rankings():
             "good": {"$sum": {"$add": ["$pucca_good", "$part_pucca_good"]}}
         }},
         {"$sort": {"schools": -1}}
-    ]
+    ], scope_match or {})
     blocks = await db.classrooms_toilets.aggregate(pipeline).to_list(30)
     
     result = []
@@ -461,186 +471,291 @@ async def get_block_rankings():
     
     return result
 
-async def fetch_aadhaar_data():
-    """Fetch Aadhaar analytics data"""
-    data = await db.aadhaar_analytics.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Total Students", "Aadhaar Available", "Coverage %", "Name Mismatch", "MBU Pending"]
-    rows = []
-    for d in data[:100]:
-        rows.append([
-            d.get("block_name", ""),
-            d.get("total_students", 0),
-            d.get("aadhaar_available", 0),
-            round(d.get("aadhaar_available", 0) / max(d.get("total_students", 1), 1) * 100, 1),
-            d.get("name_match_failed", 0),
-            d.get("mbu_pending", 0)
-        ])
-    
-    total = sum(d.get("total_students", 0) for d in data)
-    aadhaar = sum(d.get("aadhaar_available", 0) for d in data)
-    kpis = [
-        {"name": "Total Students", "value": total, "status": "Info"},
-        {"name": "Aadhaar Coverage", "value": f"{round(aadhaar/max(total,1)*100, 1)}%", "status": "Good" if aadhaar/max(total,1) > 0.9 else "Warning"}
-    ]
-    
-    return {"headers": headers, "rows": rows, "kpis": kpis}
+# ============== DASHBOARD EXPORTS ==============
+# Each dashboard declares its source collection, the fields to project, how a
+# document becomes a row and the `$group` totals its KPIs are computed from.
+# Rows are read page by page, so exports cover the whole scope in constant memory.
 
-async def fetch_apaar_data():
-    """Fetch APAAR status data"""
-    data = await db.apaar_status.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Total Students", "Generated", "Generation %", "Pending", "Not Applied"]
-    rows = []
-    for d in data[:100]:
-        rows.append([
-            d.get("block_name", ""),
-            d.get("total_student", 0),
-            d.get("total_generated", 0),
-            round(d.get("total_generated", 0) / max(d.get("total_student", 1), 1) * 100, 1),
-            d.get("total_pending", 0),
-            d.get("total_not_applied", 0)
-        ])
-    
-    total = sum(d.get("total_student", 0) for d in data)
-    generated = sum(d.get("total_generated", 0) for d in data)
-    kpis = [
-        {"name": "Total Students", "value": total, "status": "Info"},
-        {"name": "APAAR Generated", "value": generated, "status": "Info"},
-        {"name": "Generation Rate", "value": f"{round(generated/max(total,1)*100, 1)}%", "status": "Good" if generated/max(total,1) > 0.85 else "Warning"}
+def _pct(part, whole) -> float:
+    return round(part / max(whole, 1) * 100, 1)
+
+def _aadhaar_row(d):
+    return [d.get("block_name", ""), d.get("total_students", 0), d.get("aadhaar_available", 0),
+            _pct(d.get("aadhaar_available", 0), d.get("total_students", 1)),
+            d.get("name_match_failed", 0), d.get("mbu_pending", 0)]
+
+def _aadhaar_kpis(t):
+    return [
+        {"name": "Total Students", "value": t["total"], "status": "Info"},
+        {"name": "Aadhaar Coverage", "value": f"{_pct(t['aadhaar'], t['total'])}%", "status": "Good" if t["aadhaar"]/max(t["total"],1) > 0.9 else "Warning"}
     ]
-    
-    return {"headers": headers, "rows": rows, "kpis": kpis}
 
-async def fetch_teacher_data():
-    """Fetch teacher analytics data"""
-    data = await db.teacher_analytics.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Teachers CY", "Teachers PY", "Growth", "CTET", "CWSN Trained"]
-    rows = [[d.get("block_name", ""), d.get("teachers_cy", 0), d.get("teachers_py", 0),
-             d.get("teachers_cy", 0) - d.get("teachers_py", 0), d.get("ctet_cy", 0), d.get("cwsn_trained", 0)]
-            for d in data[:100]]
-    
-    kpis = [{"name": "Total Teachers CY", "value": sum(d.get("teachers_cy", 0) for d in data), "status": "Info"}]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
-
-async def fetch_infrastructure_data():
-    """Fetch infrastructure data"""
-    data = await db.infrastructure_analytics.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Schools", "Tap Water", "Water Purifier", "Water Tested", "Ramp"]
-    rows = [[d.get("block_name", ""), 1, 1 if d.get("tap_water") else 0, 1 if d.get("water_purifier") else 0,
-             1 if d.get("water_tested") else 0, 1 if d.get("ramp") else 0] for d in data[:100]]
-    
-    kpis = [{"name": "Total Schools", "value": len(data), "status": "Info"}]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
-
-async def fetch_enrolment_data():
-    """Fetch enrolment data"""
-    data = await db.enrolment_analytics.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Total Enrolment", "Boys", "Girls", "Girls %"]
-    rows = [[d.get("block_name", ""), d.get("total_enrolment", 0), d.get("boys", 0), d.get("girls", 0),
-             round(d.get("girls", 0) / max(d.get("total_enrolment", 1), 1) * 100, 1)] for d in data[:100]]
-    
-    total = sum(d.get("total_enrolment", 0) for d in data)
-    girls = sum(d.get("girls", 0) for d in data)
-    kpis = [
-        {"name": "Total Enrolment", "value": total, "status": "Info"},
-        {"name": "Girls %", "value": f"{round(girls/max(total,1)*100, 1)}%", "status": "Good" if girls/max(total,1) > 0.48 else "Warning"}
+def _apaar_row(d):
+    return [d.get("block_name", ""), d.get("total_student", 0), d.get("total_generated", 0),
+            _pct(d.get("total_generated", 0), d.get("total_student", 1)),
+            d.get("total_pending", 0), d.get("total_not_applied", 0)]
+
+def _apaar_kpis(t):
+    return [
+        {"name": "Total Students", "value": t["total"], "status": "Info"},
+        {"name": "APAAR Generated", "value": t["generated"], "status": "Info"},
+        {"name": "Generation Rate", "value": f"{_pct(t['generated'], t['total'])}%", "status": "Good" if t["generated"]/max(t["total"],1) > 0.85 else "Warning"}
     ]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
 
-async def fetch_classrooms_toilets_data():
-    """Fetch classrooms and toilets data"""
-    data = await db.classrooms_toilets.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["School", "Block", "Classrooms", "Good Condition", "Toilets", "Functional"]
-    rows = [[d.get("school_name", "")[:30], d.get("block_name", ""), d.get("classrooms_instructional", 0),
-             d.get("pucca_good", 0) + d.get("part_pucca_good", 0),
-             d.get("boys_toilets_total", 0) + d.get("girls_toilets_total", 0),
-             d.get("boys_toilets_functional", 0) + d.get("girls_toilets_functional", 0)] for d in data[:100]]
-    
-    total_classrooms = sum(d.get("classrooms_instructional", 0) for d in data)
-    good = sum(d.get("pucca_good", 0) + d.get("part_pucca_good", 0) for d in data)
-    kpis = [
-        {"name": "Total Schools", "value": len(data), "status": "Info"},
-        {"name": "Classroom Health", "value": f"{round(good/max(total_classrooms,1)*100, 1)}%", "status": "Good"}
+def _teacher_row(d):
+    return [d.get("block_name", ""), d.get("teachers_cy", 0), d.get("teachers_py", 0),
+            d.get("teachers_cy", 0) - d.get("teachers_py", 0), d.get("ctet_cy", 0), d.get("cwsn_trained", 0)]
+
+def _infrastructure_row(d):
+    return [d.get("block_name", ""), 1, 1 if d.get("tap_water") else 0, 1 if d.get("water_purifier") else 0,
+            1 if d.get("water_tested") else 0, 1 if d.get("ramp") else 0]
+
+def _enrolment_row(d):
+    return [d.get("block_name", ""), d.get("total_enrolment", 0), d.get("boys", 0), d.get("girls", 0),
+            _pct(d.get("girls", 0), d.get("total_enrolment", 1))]
+
+def _enrolment_kpis(t):
+    return [
+        {"name": "Total Enrolment", "value": t["total"], "status": "Info"},
+        {"name": "Girls %", "value": f"{_pct(t['girls'], t['total'])}%", "status": "Good" if t["girls"]/max(t["total"],1) > 0.48 else "Warning"}
     ]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
 
-async def fetch_dropbox_data():
-    """Fetch dropbox remarks data"""
-    data = await db.dropbox_analytics.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Total Remarks", "Dropout", "Migration", "Class 12 Passed", "Wrong Entry"]
-    rows = [[d.get("block_name", ""), d.get("total_remarks", 0), d.get("dropout", 0),
-             d.get("migration", 0), d.get("class12_passed", 0), d.get("wrong_entry", 0)] for d in data[:100]]
-    
-    kpis = [{"name": "Total Remarks", "value": sum(d.get("total_remarks", 0) for d in data), "status": "Info"}]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
-
-async def fetch_data_entry_data():
-    """Fetch data entry status"""
-    data = await db.data_entry_status.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Total Students", "Completed", "Pending", "Certified"]
-    rows = [[d.get("block_name", ""), d.get("total_students", 0), d.get("completed", 0),
-             d.get("pending", 0), "Yes" if d.get("certified") else "No"] for d in data[:100]]
-    
-    kpis = [{"name": "Total Students", "value": sum(d.get("total_students", 0) for d in data), "status": "Info"}]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
-
-async def fetch_age_enrolment_data():
-    """Fetch age-wise enrolment data"""
-    data = await db.age_enrolment.find({}, {"_id": 0}).to_list(1000)
-    if not data:
-        return {"headers": [], "rows": [], "kpis": []}
-    
-    headers = ["Block", "Age Group", "Boys", "Girls", "Total"]
-    rows = [[d.get("block_name", ""), d.get("age_group", ""), d.get("boys", 0),
-             d.get("girls", 0), d.get("boys", 0) + d.get("girls", 0)] for d in data[:100]]
-    
-    kpis = [{"name": "Total Records", "value": len(data), "status": "Info"}]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
+def _classrooms_toilets_row(d):
+    return [(d.get("school_name") or "")[:30], d.get("block_name", ""), d.get("classrooms_instructional", 0),
+            d.get("pucca_good", 0) + d.get("part_pucca_good", 0),
+            d.get("boys_toilets_total", 0) + d.get("girls_toilets_total", 0),
+            d.get("boys_toilets_functional", 0) + d.get("girls_toilets_functional", 0)]
 
-async def fetch_ctteacher_data():
-    """Fetch CTTeacher data"""
-    pipeline = [
-        {"$group": {
-            "_id": "$block_name",
-            "count": {"$sum": 1},
-            "ctet": {"$sum": {"$cond": [{"$eq": ["$ctet_qualified", True]}, 1, 0]}},
-            "nishtha": {"$sum": {"$cond": [{"$eq": ["$nishtha_completed", True]}, 1, 0]}}
-        }},
-        {"$sort": {"count": -1}}
+def _classrooms_toilets_kpis(t):
+    return [
+        {"name": "Total Schools", "value": t["count"], "status": "Info"},
+        {"name": "Classroom Health", "value": f"{_pct(t['good'], t['classrooms'])}%", "status": "Good"}
     ]
-    data = await db.ctteacher.aggregate(pipeline).to_list(100)
-    
-    headers = ["Block", "Teachers", "CTET Qualified", "CTET %", "NISHTHA Completed", "NISHTHA %"]
-    rows = [[d["_id"], d["count"], d["ctet"], round(d["ctet"]/max(d["count"],1)*100, 1),
-             d["nishtha"], round(d["nishtha"]/max(d["count"],1)*100, 1)] for d in data]
-    
-    total = sum(d["count"] for d in data)
-    ctet = sum(d["ctet"] for d in data)
-    kpis = [
-        {"name": "Total Teachers", "value": total, "status": "Info"},
-        {"name": "CTET Rate", "value": f"{round(ctet/max(total,1)*100, 1)}%", "status": "Warning" if ctet/max(total,1) < 0.5 else "Good"}
+
+def _dropbox_row(d):
+    return [d.get("block_name", ""), d.get("total_remarks", 0), d.get("dropout", 0),
+            d.get("migration", 0), d.get("class12_passed", 0), d.get("wrong_entry", 0)]
+
+def _data_entry_row(d):
+    return [d.get("block_name", ""), d.get("total_students", 0), d.get("completed", 0),
+            d.get("pending", 0), "Yes" if d.get("certified") else "No"]
+
+def _age_enrolment_row(d):
+    return [d.get("block_name", ""), d.get("age_group", ""), d.get("boys", 0),
+            d.get("girls", 0), d.get("boys", 0) + d.get("girls", 0)]
+
+def _ctteacher_row(d):
+    return [d["_id"], d["count"], d["ctet"], _pct(d["ctet"], d["count"]),
+            d["nishtha"], _pct(d["nishtha"], d["count"])]
+
+def _ctteacher_kpis(t):
+    return [
+        {"name": "Total Teachers", "value": t["count"], "status": "Info"},
+        {"name": "CTET Rate", "value": f"{_pct(t['ctet'], t['count'])}%", "status": "Warning" if t["ctet"]/max(t["count"],1) < 0.5 else "Good"}
     ]
-    return {"headers": headers, "rows": rows, "kpis": kpis}
+
+def _single_kpi(name, total="total"):
+    return lambda t: [{"name": name, "value": t[total], "status": "Info"}]
+
+_CTET = {"$sum": {"$cond": [CTET_QUALIFIED, 1, 0]}}
+
+# Totals behind the School Health Index, merged into the `$group` each
+# collection already runs for its dashboard KPIs (see collection_totals)
+SHI_TOTALS = {
+    "classrooms_toilets": {
+        "classrooms": {"$sum": "$classrooms_instructional"},
+        "shi_good": {"$sum": {"$add": ["$pucca_good", "$part_pucca_good"]}},
+        "toilets": {"$sum": {"$add": ["$boys_toilets_total", "$girls_toilets_total"]}},
+        "func_toilets": {"$sum": {"$add": ["$boys_toilets_functional", "$girls_toilets_functional"]}},
+    },
+    "apaar_status": {"total": {"$sum": "$total_student"}, "generated": {"$sum": "$total_generated"}},
+}
+
+DASHBOARD_EXPORTS = {
+    "aadhaar": {
+        "title": "Aadhaar Analytics", "collection": "aadhaar_analytics",
+        "headers": ["Block", "Total Students", "Aadhaar Available", "Coverage %", "Name Mismatch", "MBU Pending"],
+        "fields": ["block_name", "total_students", "aadhaar_available", "name_match_failed", "mbu_pending"],
+        "row": _aadhaar_row,
+        "totals": {"total": {"$sum": "$total_students"}, "aadhaar": {"$sum": "$aadhaar_available"}},
+        "kpis": _aadhaar_kpis,
+    },
+    "apaar": {
+        "title": "APAAR Status", "collection": "apaar_status",
+        "headers": ["Block", "Total Students", "Generated", "Generation %", "Pending", "Not Applied"],
+        "fields": ["block_name", "total_student", "total_generated", "total_pending", "total_not_applied"],
+        "row": _apaar_row,
+        "totals": {"total": {"$sum": "$total_student"}, "generated": {"$sum": "$total_generated"}},
+        "kpis": _apaar_kpis,
+    },
+    "teacher": {
+        "title": "Teacher Analytics", "collection": "teacher_analytics",
+        "headers": ["Block", "Teachers CY", "Teachers PY", "Growth", "CTET", "CWSN Trained"],
+        "fields": ["block_name", "teachers_cy", "teachers_py", "ctet_cy", "cwsn_trained"],
+        "row": _teacher_row,
+        "totals": {"total": {"$sum": "$teachers_cy"}},
+        "kpis": _single_kpi("Total Teachers CY"),
+    },
+    "infrastructure": {
+        "title": "Infrastructure", "collection": "infrastructure_analytics",
+        "headers": ["Block", "Schools", "Tap Water", "Water Purifier", "Water Tested", "Ramp"],
+        "fields": ["block_name", "tap_water", "water_purifier", "water_tested", "ramp"],
+        "row": _infrastructure_row,
+        "totals": {},
+        "kpis": _single_kpi("Total Schools", "count"),
+    },
+    "enrolment": {
+        "title": "Enrolment Analytics", "collection": "enrolment_analytics",
+        "headers": ["Block", "Total Enrolment", "Boys", "Girls", "Girls %"],
+        "fields": ["block_name", "total_enrolment", "boys", "girls"],
+        "row": _enrolment_row,
+        "totals": {"total": {"$sum": "$total_enrolment"}, "girls": {"$sum": "$girls"}},
+        "kpis": _enrolment_kpis,
+    },
+    "classrooms-toilets": {
+        "title": "Classrooms & Toilets", "collection": "classrooms_toilets",
+        "headers": ["School", "Block", "Classrooms", "Good Condition", "Toilets", "Functional"],
+        "fields": ["school_name", "block_name", "classrooms_instructional", "pucca_good", "part_pucca_good",
+                   "boys_toilets_total", "girls_toilets_total", "boys_toilets_functional", "girls_toilets_functional"],
+        "row": _classrooms_toilets_row,
+        "totals": {"classrooms": {"$sum": "$classrooms_instructional"},
+                   "good": {"$sum": {"$add": [{"$ifNull": ["$pucca_good", 0]}, {"$ifNull": ["$part_pucca_good", 0]}]}}},
+        "kpis": _classrooms_toilets_kpis,
+    },
+    "dropbox": {
+        "title": "Dropbox Remarks", "collection": "dropbox_analytics",
+        "headers": ["Block", "Total Remarks", "Dropout", "Migration", "Class 12 Passed", "Wrong Entry"],
+        "fields": ["block_name", "total_remarks", "dropout", "migration", "class12_passed", "wrong_entry"],
+        "row": _dropbox_row,
+        "totals": {"total": {"$sum": "$total_remarks"}},
+        "kpis": _single_kpi("Total Remarks"),
+    },
+    "data-entry": {
+        "title": "Data Entry Status", "collection": "data_entry_status",
+        "headers": ["Block", "Total Students", "Completed", "Pending", "Certified"],
+        "fields": ["block_name", "total_students", "completed", "pending", "certified"],
+        "row": _data_entry_row,
+        "totals": {"total": {"$sum": "$total_students"}},
+        "kpis": _single_kpi("Total Students"),
+    },
+    "age-enrolment": {
+        "title": "Age-wise Enrolment", "collection": "age_enrolment",
+        "headers": ["Block", "Age Group", "Boys", "Girls", "Total"],
+        "fields": ["block_name", "age_group", "boys", "girls"],
+        "row": _age_enrolment_row,
+        "totals": {},
+        "kpis": _single_kpi("Total Records", "count"),
+    },
+    "ctteacher": {
+        "title": "CTTeacher Analytics", "collection": "ctteacher",
+        "headers": ["Block", "Teachers", "CTET Qualified", "CTET %", "NISHTHA Completed", "NISHTHA %"],
+        # Block-level rows: grouped server-side instead of paging raw documents
+        "pipeline": [
+            {"$group": {
+                "_id": "$block_name",
+                "count": {"$sum": 1},
+                "ctet": _CTET,
+                "nishtha": {"$sum": {"$cond": [{"$eq": ["$nishtha_completed", True]}, 1, 0]}}
+            }},
+            {"$sort": {"count": -1}}
+        ],
+        "row": _ctteacher_row,
+        "totals": {"ctet": _CTET},
+        "kpis": _ctteacher_kpis,
+    },
+}
+
+def get_dashboard_export(dashboard_name: str) -> dict:
+    spec = DASHBOARD_EXPORTS.get(dashboard_name)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Dashboard '{dashboard_name}' not found")
+    return spec
+
+async def iter_documents(collection: str, match: dict, fields: List[str], limit: Optional[int] = None,
+                         page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[dict]:
+    """Yield projected documents in `_id` order, one keyset page at a time.
+
+    Each page is a short query resuming after the last `_id` seen, so no
+    server cursor stays open while the client is slow to read the export.
+    """
+    projection = {field: 1 for field in fields}
+    last_id = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        query = match
+        if last_id is not None:
+            after = {"_id": {"$gt": last_id}}
+            query = {"$and": [match, after]} if match else after
+        page = await db[collection].find(query, projection).sort("_id", 1).limit(size).to_list(size)
+        for doc in page:
+            yield doc
+        if len(page) < size:
+            return
+        last_id = page[-1]["_id"]
+        if remaining is not None:
+            remaining -= len(page)
+
+async def export_rows(spec: dict, match: dict, limit: Optional[int] = None) -> AsyncIterator[list]:
+    """Rows of a dashboard export for the given scope"""
+    if "pipeline" in spec:
+        pipeline = prepend_match(spec["pipeline"], match)
+        if limit is not None:
+            pipeline = [*pipeline, {"$limit": limit}]
+        async for doc in db[spec["collection"]].aggregate(pipeline, allowDiskUse=True):
+            yield spec["row"](doc)
+        return
+    async for doc in iter_documents(spec["collection"], match, spec["fields"], limit=limit):
+        yield spec["row"](doc)
+
+async def count_export_rows(spec: dict, match: dict) -> int:
+    """Rows an export will contain (grouped exports are always small)"""
+    if "pipeline" in spec:
+        return 0
+    return await db[spec["collection"]].count_documents(match)
+
+def _totals_spec(collection: str) -> dict:
+    """Union of the `$group` totals every export needs from `collection`"""
+    totals = {}
+    for spec in DASHBOARD_EXPORTS.values():
+        if spec["collection"] == collection:
+            totals.update(spec["totals"])
+    totals.update(SHI_TOTALS.get(collection, {}))
+    return totals
+
+async def collection_totals(collection: str, match: dict) -> dict:
+    """All totals of `collection` in scope from one `$group` (`count` is 0 when empty)"""
+    pipeline = prepend_match([{"$group": {"_id": None, "count": {"$sum": 1}, **_totals_spec(collection)}}], match)
+    result = await db[collection].aggregate(pipeline).to_list(1)
+    return result[0] if result else {"count": 0}
+
+async def export_kpis(spec: dict, plan: "FetchPlan") -> List[dict]:
+    """KPIs over the whole scope; empty when the scope has no documents"""
+    totals = await plan.totals(spec["collection"])
+    if not totals.get("count"):
+        return []
+    return spec["kpis"](totals)
+
+class FetchPlan:
+    """Memoized fetches shared by every part of one export.
+
+    Parts of an export ask the plan instead of querying directly, so a query
+    several parts need (e.g. the classrooms_toilets totals behind both the SHI
+    and the Classrooms & Toilets KPIs) runs once, and independent queries run
+    concurrently.
+    """
+
+    def __init__(self, scope_match: Optional[dict] = None):
+        self.scope_match = scope_match or {}
+        self._tasks: Dict[Any, asyncio.Future] = {}
+
+    def fetch(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.ensure_future(factory())
+        return self._tasks[key]
+
+    def totals(self, collection: str) -> Awaitable[dict]:
+        return self.fetch(("totals", collection), lambda: collection_totals(collection, self.scope_match))
+
+    def block_rankings(self) -> Awaitable[List[dict]]:
+        return self.fetch(("block_rankings",), lambda: get_block_rankings(self.scope_match))
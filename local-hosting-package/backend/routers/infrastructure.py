@@ -9,8 +9,10 @@ from pathlib import Path
 import httpx
 import logging
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/infrastructure", tags=["Infrastructure"])
+router = APIRouter(prefix="/infrastructure", tags=["Infrastructure"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -823,5 +825,7 @@ async def process_infrastructure_file(file_path: str, filename: str, import_id:
         
     except Exception as e:
         logging.error(f"Infrastructure import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("infrastructure_analytics")
 
 
@@ -8,8 +8,10 @@ They intentionally derive values from analytics collections bundled with the pac
 from fastapi import APIRouter, Query
 from typing import List, Optional
 
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/scope", tags=["Scope"])
+
+router = APIRouter(prefix="/scope", tags=["Scope"], route_class=ORJSONRoute)
 
 # Database will be injected
 db = None
@@ -9,8 +9,10 @@ from pathlib import Path
 import logging
 import httpx
 from utils.scope import build_scope_match, prepend_match
+from utils import dataset_state
+from utils.responses import ORJSONRoute
 
-router = APIRouter(prefix="/teacher", tags=["Teacher Analytics"])
+router = APIRouter(prefix="/teacher", tags=["Teacher Analytics"], route_class=ORJSONRoute)
 logger = logging.getLogger(__name__)
 
 # Helper functions
@@ -588,5 +590,7 @@ async def process_teacher_file(file_path: str, filename: str, import_id: str):
         
     except Exception as e:
         logger.error(f"Teacher import failed: {str(e)}")
+    
+    await dataset_state.mark_imported("teacher_analytics")
 
 
@@ -1,13 +1,14 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, BackgroundTasks
-from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+from pymongo import ReplaceOne
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, timezone
 import pandas as pd
@@ -15,22 +16,55 @@ import io
 import aiofiles
 import hashlib
 import httpx
+from utils import (
+    auth, batch, compression, conditional, dataset_state, export_cache, export_jobs, leader, metrics,
+    mongo, render_pool, response_cache, snapshot,
+)
+from utils.shi import (
+    DEFAULT_WEIGHTS, calculate_shi, get_rag_status, get_score_matrix,
+    load_score_matrix, recompute_school_scores, set_score_matrix,
+)
+from utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, keyset_match, sort_spec, validate_sort
+from utils.responses import ORJSONResponse, ORJSONRoute
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 # Optional local overrides (do not commit secrets)
 load_dotenv(ROOT_DIR / ".env.local", override=True)
 
-# MongoDB connection
+# MongoDB connection (opened in the lifespan handler, see wire_database)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+# One-time startup work is skipped by workers starting within this many seconds
+# of the last run (e.g. the other uvicorn workers of the same deployment)
+STARTUP_TASK_TTL_SECONDS = float(os.environ.get("STARTUP_TASK_TTL_SECONDS", "300"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    client = mongo.create_client(mongo_url)
+    wire_database(client[os.environ['DB_NAME']])
+
+    # Admin bootstrap and index builds run in one worker; the others wait
+    await leader.run_once(db, "startup", run_startup_tasks, done_ttl=STARTUP_TASK_TTL_SECONDS)
+
+    # Prime the dataset-state cache and keep it fresh in the background
+    await dataset_state.refresh()
+    dataset_state.start_watcher()
+    try:
+        yield
+    finally:
+        await dataset_state.stop_watcher()
+        render_pool.shutdown()
+        client.close()
 
 # Create the main app
-app = FastAPI(title="Maharashtra Education Dashboard API")
+app = FastAPI(title="Maharashtra Education Dashboard API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=ORJSONRoute)
 
 # Configure logging
 logging.basicConfig(
@@ -103,6 +137,19 @@ class SchoolDetail(BaseModel):
     certified: bool = False
     shi_score: float = 0.0
     rag_status: str = "green"
+    shi_components: Optional[Dict[str, float]] = None
+
+class SHIWeights(BaseModel):
+    identity: float = Field(DEFAULT_WEIGHTS["identity"], ge=0)
+    infrastructure: float = Field(DEFAULT_WEIGHTS["infrastructure"], ge=0)
+    teacher: float = Field(DEFAULT_WEIGHTS["teacher"], ge=0)
+    operational: float = Field(DEFAULT_WEIGHTS["operational"], ge=0)
+    age_integrity: float = Field(DEFAULT_WEIGHTS["age_integrity"], ge=0)
+
+class WhatIfRequest(BaseModel):
+    scenarios: List[SHIWeights] = Field(..., min_length=1, max_length=10)
+    district_code: Optional[str] = None
+    top_n: int = Field(10, ge=0, le=100)
 
 class ImportStatus(BaseModel):
     import_id: str
@@ -161,52 +208,6 @@ DISTRICT_CODE_TO_NAME = {d["code"]: d["name"] for d in MAHARASHTRA_DISTRICTS}
 
 # ============= HELPER FUNCTIONS =============
 
-def calculate_shi(school_data: dict) -> float:
-    """Calculate School Health Index (0-100)"""
-    # Identity Score (25%)
-    aadhaar_pct = school_data.get("aadhaar_percentage", 0)
-    apaar_pct = school_data.get("apaar_percentage", 0)
-    identity_score = (aadhaar_pct * 0.5 + apaar_pct * 0.3 + 100 * 0.2)
-    
-    # Infrastructure Score (25%)
-    water = 100 if school_data.get("water_available", True) else 0
-    toilet = 100 if school_data.get("toilets_available", True) else 0
-    classroom_ratio = school_data.get("students_per_classroom", 40)
-    classroom_score = min(100, (40 / max(classroom_ratio, 1)) * 100)
-    infra_score = (water * 0.4 + toilet * 0.3 + classroom_score * 0.3)
-    
-    # Teacher Score (20%)
-    ptr = school_data.get("ptr", 30)
-    teacher_score = min(100, (30 / max(ptr, 1)) * 100)
-    
-    # Operational Score (20%)
-    data_entry = 100 if school_data.get("certified", False) else 50
-    operational_score = data_entry
-    
-    # Age Integrity Score (10%)
-    age_integrity = 90
-    
-    # Final SHI
-    shi = (
-        identity_score * 0.25 +
-        infra_score * 0.25 +
-        teacher_score * 0.20 +
-        operational_score * 0.20 +
-        age_integrity * 0.10
-    )
-    return round(min(100, max(0, shi)), 1)
-
-def get_rag_status(shi_score: float) -> str:
-    """Get RAG status based on SHI score"""
-    if shi_score >= 85:
-        return "green"
-    elif shi_score >= 70:
-        return "amber"
-    elif shi_score >= 50:
-        return "amber"
-    else:
-        return "red"
-
 def generate_district_code(district_name: str) -> str:
     """Generate or lookup district code from name"""
     district_upper = district_name.upper().strip()
@@ -223,13 +224,16 @@ def generate_block_code(district_code: str, block_name: str) -> str:
 
 # ============= DATA ACCESS FUNCTIONS =============
 
-async def get_data_from_db() -> bool:
-    """Check if we have imported data in the database"""
-    count = await db.schools.count_documents({})
-    return count > 0
+def get_data_from_db() -> bool:
+    """Check if we have imported data in the database (cached, see utils.dataset_state)"""
+    return dataset_state.has_data("schools")
+
+async def aggregate_districts() -> List[DistrictSummary]:
+    """Aggregate district summaries from the schools collection (full scan).
 
-async def get_districts_from_db() -> List[DistrictSummary]:
-    """Get district data from MongoDB"""
+    Only used to (re)build the district_rollups collection; request handlers
+    read the rollups via get_districts_from_db().
+    """
     pipeline = [
         {
             "$group": {
@@ -294,8 +298,12 @@ async def get_districts_from_db() -> List[DistrictSummary]:
     
     return districts
 
-async def get_blocks_from_db(district_code: str = None, district_name: str = None) -> List[BlockSummary]:
-    """Get block data from MongoDB"""
+async def aggregate_blocks(district_code: str = None, district_name: str = None) -> List[BlockSummary]:
+    """Aggregate block summaries from the schools collection (full scan).
+
+    Only used to (re)build the block_rollups collection; request handlers
+    read the rollups via get_blocks_from_db().
+    """
     match_stage = {}
     if district_code:
         match_stage["district_code"] = district_code
@@ -358,27 +366,243 @@ async def get_blocks_from_db(district_code: str = None, district_name: str = Non
     
     return blocks
 
-async def get_schools_from_db(block_code: str = None, block_name: str = None, district_name: str = None, limit: int = 100) -> List[SchoolDetail]:
-    """Get school data from MongoDB"""
-    query = {}
-    if block_code:
-        query["block_code"] = block_code
-    if block_name:
-        query["block_name"] = block_name
-    if district_name:
-        query["district_name"] = district_name
+# ============= MATERIALIZED ROLLUPS =============
+#
+# district_rollups / block_rollups hold one precomputed summary (including SHI
+# and RAG status) per district / block. They are rebuilt whenever the dataset
+# generation changes, so request handlers only do indexed point or range reads.
+
+ROLLUP_EXCLUDED_FIELDS = {"_id": 0, "generation": 0, "updated_at": 0}
+
+async def ensure_indexes():
+    """Create the indexes backing rollup point reads and sorted/paged listings"""
+    await db.district_rollups.create_index("district_code")
+    await db.district_rollups.create_index([("shi_score", -1)])
+    await db.district_rollups.create_index([("rag_status", 1), ("shi_score", -1)])
+    await db.block_rollups.create_index("block_code")
+    await db.block_rollups.create_index([("district_code", 1), ("shi_score", -1)])
+    await db.block_rollups.create_index([("district_code", 1), ("rag_status", 1), ("shi_score", -1)])
+    await db.schools.create_index("udise_code")
+    # Per-request account state lookups (utils.auth)
+    await db.users.create_index("email")
+    await db.schools.create_index([("block_code", 1), ("udise_code", 1)])
+    await db.schools.create_index([("block_code", 1), ("shi_score", -1), ("udise_code", -1)])
+    await db.schools.create_index([("block_code", 1), ("rag_status", 1), ("shi_score", -1), ("udise_code", -1)])
+    await db.schools.create_index([("block_code", 1), ("rag_status", 1), ("udise_code", 1)])
+    await db.schools.create_index([("district_code", 1), ("shi_score", -1)])
+    await db.analytics_precomputed.create_index(
+        [("kind", 1), ("level", 1), ("block_code", 1), ("district_code", 1)], unique=True
+    )
+
+async def _replace_rollups(collection, key_field: str, summaries: list, generation: int):
+    """Upsert the given summaries and drop rows left over from older generations"""
+    now = datetime.now(timezone.utc)
+    ops = [
+        ReplaceOne(
+            {key_field: getattr(item, key_field)},
+            {**item.model_dump(), "generation": generation, "updated_at": now},
+            upsert=True
+        )
+        for item in summaries
+    ]
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+    await collection.delete_many({"generation": {"$ne": generation}})
+
+@dataset_state.on_change
+async def refresh_school_scores():
+    """Rescore every school (vectorized) and persist SHI, components and RAG band.
+
+    One worker recomputes per generation; the others load the persisted
+    component scores for what-if analysis.
+    """
+    generation = dataset_state.generation()
+    if not dataset_state.has_data("schools"):
+        set_score_matrix(None)
+        return
+    ran = await leader.run_once(
+        db, f"school-scores:{generation}", lambda: recompute_school_scores(db, generation)
+    )
+    if not ran:
+        set_score_matrix(await load_score_matrix(db, generation))
+
+@dataset_state.on_change
+async def refresh_rollups():
+    """Rebuild district and block rollups (once per generation across workers)"""
+    generation = dataset_state.generation()
+    await leader.run_once(db, f"rollups:{generation}", lambda: rebuild_rollups(generation))
+
+@dataset_state.on_change
+async def refresh_derived_metrics():
+    """Store derived metrics on documents loaded without them (e.g. by the standalone ETL)"""
+    generation = dataset_state.generation()
+    await leader.run_once(
+        db, f"derived-metrics:{generation}", lambda: metrics.materialize_all(db, only_missing=True)
+    )
+
+async def rebuild_rollups(generation: int):
+    if not dataset_state.has_data("schools"):
+        await db.district_rollups.delete_many({})
+        await db.block_rollups.delete_many({})
+        return
     
-    cursor = db.schools.find(query, {"_id": 0}).limit(limit)
-    schools = []
+    districts = await aggregate_districts()
+    blocks = await aggregate_blocks()
+    await _replace_rollups(db.district_rollups, "district_code", districts, generation)
+    await _replace_rollups(db.block_rollups, "block_code", blocks, generation)
+    logger.info(f"Rollups refreshed for generation {generation}: {len(districts)} districts, {len(blocks)} blocks")
+
+# Columnar copies of the analytics collections for in-process aggregations
+dataset_state.on_change(snapshot.refresh_all)
+
+# Rendered export files are only valid for the generation they were built from
+dataset_state.on_change(export_cache.purge_stale)
+
+# Cached API responses likewise
+dataset_state.on_change(response_cache.purge_stale)
+
+# ============= LIST QUERY HELPERS =============
+
+DISTRICT_SORT_FIELDS = set(DistrictSummary.model_fields)
+BLOCK_SORT_FIELDS = set(BlockSummary.model_fields)
+# Only fields with a (block_code, field, udise_code) index, so paging never sorts a block in memory
+SCHOOL_SORT_FIELDS = {"shi_score", "rag_status", "udise_code"}
+RAG_STATUSES = ("green", "amber", "red")
+
+def validate_rag_filter(rag_filter: Optional[str]):
+    if rag_filter and rag_filter not in RAG_STATUSES:
+        raise HTTPException(status_code=400, detail=f"rag_filter must be one of: {', '.join(RAG_STATUSES)}")
+
+def _and_match(*conditions: dict) -> dict:
+    """Combine match dicts with $and, skipping empty ones"""
+    conditions = [c for c in conditions if c]
+    if not conditions:
+        return {}
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": list(conditions)}
+
+def _next_cursor(last: Optional[dict], count: int, sort_by: str, tiebreak_field: str, limit: Optional[int]) -> Optional[str]:
+    """Cursor for the page after the one ending with stored document `last`.
+
+    None when this was the last page, or when the sort value is missing
+    (a $lt/$gt range on null would not resume the page).
+    """
+    if not limit or count < limit or last is None:
+        return None
+    sort_value = last.get(sort_by)
+    if sort_value is None:
+        return None
+    return encode_cursor(sort_value, last.get(tiebreak_field))
+
+def _page_response(items: list, next_cursor: Optional[str]) -> ORJSONResponse:
+    """Encode a page of summaries built from the DB as is, with its X-Next-Cursor header.
+
+    The models are constructed by this module, so validating them again
+    against the route's response_model would only repeat work.
+    """
+    return ORJSONResponse(items, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+def _summary_page(items: list, sort_by: str, tiebreak_field: str, limit: Optional[int]) -> ORJSONResponse:
+    """Page response for rollup summaries (stored as is, so the model holds the stored values)"""
+    last = items[-1].model_dump(include={sort_by, tiebreak_field}) if items else None
+    return _page_response(items, _next_cursor(last, len(items), sort_by, tiebreak_field, limit))
+
+def _sort_summaries(items: list, sort_by: Optional[str], sort_order: str) -> list:
+    """In-memory sort, used for mock and fallback data"""
+    if items and sort_by and hasattr(items[0], sort_by):
+        items.sort(key=lambda x: getattr(x, sort_by), reverse=sort_order == "desc")
+    return items
+
+async def _find_rollups(collection, model, query: dict, sort_by: str, sort_order: str,
+                        tiebreak_field: str, limit: Optional[int], cursor: Optional[str]) -> list:
+    """Indexed, keyset-paged read of a rollup collection"""
+    match = _and_match(query, keyset_match(cursor, sort_by, sort_order, tiebreak_field))
+    find_cursor = db[collection].find(match, ROLLUP_EXCLUDED_FIELDS).sort(sort_spec(sort_by, sort_order, tiebreak_field))
+    if limit:
+        find_cursor = find_cursor.limit(limit)
+    return [model(**doc) async for doc in find_cursor]
+
+async def get_districts_from_db(
+    rag_filter: Optional[str] = None,
+    sort_by: str = "shi_score",
+    sort_order: str = "desc",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> List[DistrictSummary]:
+    """Get district summaries from the district_rollups collection"""
+    query = {"rag_status": rag_filter} if rag_filter else {}
+    districts = await _find_rollups("district_rollups", DistrictSummary, query, sort_by, sort_order, "district_code", limit, cursor)
     
-    async for doc in cursor:
-        total_students = doc.get("total_students", 0)
-        total_teachers = doc.get("total_teachers", 1)
-        classrooms = doc.get("classrooms", 1)
-        
+    if not districts and not query and not cursor and dataset_state.has_data("schools"):
+        # Rollups not built yet (e.g. first request right after an import)
+        districts = _sort_summaries(await aggregate_districts(), sort_by, sort_order)
+        if limit:
+            districts = districts[:limit]
+    return districts
+
+async def get_district_from_db(district_code: str) -> Optional[DistrictSummary]:
+    """Point read of a single district rollup"""
+    doc = await db.district_rollups.find_one({"district_code": district_code}, ROLLUP_EXCLUDED_FIELDS)
+    if doc:
+        return DistrictSummary(**doc)
+    if dataset_state.has_data("schools") and not await db.district_rollups.find_one({}, {"_id": 1}):
+        # Rollups not built yet; answer like get_districts_from_db does
+        return next((d for d in await aggregate_districts() if d.district_code == district_code), None)
+    return None
+
+async def get_blocks_from_db(
+    district_code: str = None,
+    rag_filter: Optional[str] = None,
+    sort_by: str = "shi_score",
+    sort_order: str = "desc",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> List[BlockSummary]:
+    """Get block summaries for a district from the block_rollups collection"""
+    query = {}
+    if district_code:
+        query["district_code"] = district_code
+    if rag_filter:
+        query["rag_status"] = rag_filter
+    blocks = await _find_rollups("block_rollups", BlockSummary, query, sort_by, sort_order, "block_code", limit, cursor)
+    
+    if not blocks and not rag_filter and not cursor and dataset_state.has_data("schools") \
+            and not await db.block_rollups.find_one({}, {"_id": 1}):
+        # Rollups not built yet (e.g. first request right after an import)
+        blocks = _sort_summaries(await aggregate_blocks(district_code=district_code), sort_by, sort_order)
+        if limit:
+            blocks = blocks[:limit]
+    return blocks
+
+async def get_block_from_db(block_code: str) -> Optional[BlockSummary]:
+    """Point read of a single block rollup"""
+    doc = await db.block_rollups.find_one({"block_code": block_code}, ROLLUP_EXCLUDED_FIELDS)
+    if doc:
+        return BlockSummary(**doc)
+    if dataset_state.has_data("schools") and not await db.block_rollups.find_one({}, {"_id": 1}):
+        # Rollups not built yet; answer like get_blocks_from_db does
+        return next((b for b in await aggregate_blocks() if b.block_code == block_code), None)
+    return None
+
+def school_from_doc(doc: dict) -> SchoolDetail:
+    """Build a SchoolDetail from a school document.
+
+    Uses the persisted SHI fields written by utils.shi.recompute_school_scores;
+    documents that have not been scored yet are scored on the fly.
+    """
+    total_students = doc.get("total_students", 0)
+    total_teachers = doc.get("total_teachers", 1)
+    classrooms = doc.get("classrooms", 1)
+    ptr = doc.get("ptr")
+    if ptr is None:
         ptr = round(total_students / max(total_teachers, 1), 1)
+    students_per_classroom = doc.get("students_per_classroom")
+    if students_per_classroom is None:
         students_per_classroom = round(total_students / max(classrooms, 1), 1)
-        
+    
+    shi = doc.get("shi_score")
+    if shi is None:
         shi = calculate_shi({
             "aadhaar_percentage": doc.get("aadhaar_percentage", 0),
             "apaar_percentage": doc.get("apaar_percentage", 0),
@@ -388,32 +612,70 @@ async def get_schools_from_db(block_code: str = None, block_name: str = None, di
             "ptr": ptr,
             "certified": doc.get("certified", False)
         })
-        
-        schools.append(SchoolDetail(
-            udise_code=doc.get("udise_code", ""),
-            school_name=doc.get("school_name", "Unknown School"),
-            district_code=doc.get("district_code", ""),
-            district_name=doc.get("district_name", ""),
-            block_code=doc.get("block_code", ""),
-            block_name=doc.get("block_name", ""),
-            school_category=doc.get("school_category"),
-            school_management=doc.get("school_management"),
-            total_students=total_students,
-            total_teachers=total_teachers,
-            ptr=ptr,
-            aadhaar_percentage=doc.get("aadhaar_percentage", 0.0),
-            apaar_percentage=doc.get("apaar_percentage", 0.0),
-            water_available=doc.get("water_available", True),
-            toilets_available=doc.get("toilets_available", True),
-            classrooms=classrooms,
-            students_per_classroom=students_per_classroom,
-            data_entry_status=doc.get("data_entry_status", "pending"),
-            certified=doc.get("certified", False),
-            shi_score=shi,
-            rag_status=get_rag_status(shi)
-        ))
     
-    return schools
+    return SchoolDetail(
+        udise_code=doc.get("udise_code", ""),
+        school_name=doc.get("school_name", "Unknown School"),
+        district_code=doc.get("district_code", ""),
+        district_name=doc.get("district_name", ""),
+        block_code=doc.get("block_code", ""),
+        block_name=doc.get("block_name", ""),
+        school_category=doc.get("school_category"),
+        school_management=doc.get("school_management"),
+        total_students=total_students,
+        total_teachers=total_teachers,
+        ptr=ptr,
+        aadhaar_percentage=doc.get("aadhaar_percentage", 0.0),
+        apaar_percentage=doc.get("apaar_percentage", 0.0),
+        water_available=doc.get("water_available", True),
+        toilets_available=doc.get("toilets_available", True),
+        classrooms=classrooms,
+        students_per_classroom=students_per_classroom,
+        data_entry_status=doc.get("data_entry_status", "pending"),
+        certified=doc.get("certified", False),
+        shi_score=shi,
+        rag_status=doc.get("rag_status") or get_rag_status(shi),
+        shi_components=doc.get("shi_components")
+    )
+
+async def get_schools_from_db(
+    block_code: str = None,
+    block_name: str = None,
+    district_name: str = None,
+    limit: int = 100,
+    rag_filter: Optional[str] = None,
+    sort_by: str = "shi_score",
+    sort_order: str = "desc",
+    cursor: Optional[str] = None
+) -> Tuple[List[SchoolDetail], Optional[str]]:
+    """Get a filtered, sorted, keyset-paged list of schools from MongoDB.
+
+    shi_score, rag_status and ptr are persisted per school, so filter, sort and
+    limit all run as one indexed query. Returns the page and the cursor for the
+    next one, taken from the stored document (unscored schools are scored on
+    the fly, so the model may not hold the stored sort value).
+    """
+    query = {}
+    if block_code:
+        query["block_code"] = block_code
+    if block_name:
+        query["block_name"] = block_name
+    if district_name:
+        query["district_name"] = district_name
+    
+    match = _and_match(
+        query,
+        {"rag_status": rag_filter} if rag_filter else {},
+        keyset_match(cursor, sort_by, sort_order, "udise_code"),
+    )
+    find_cursor = (
+        db.schools.find(match, {"_id": 0, "shi_components": 0})
+        .sort(sort_spec(sort_by, sort_order, "udise_code"))
+        .limit(limit)
+    )
+    docs = [doc async for doc in find_cursor]
+    next_cursor = _next_cursor(docs[-1] if docs else None, len(docs), sort_by, "udise_code", limit)
+    return [school_from_doc(doc) for doc in docs], next_cursor
 
 # ============= MOCK DATA FUNCTIONS (Fallback) =============
 
@@ -568,13 +830,18 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "dataset": dataset_state.describe(),
+        "mongo": mongo.describe(),
+    }
 
 # State Overview
 @api_router.get("/state/overview", response_model=KPIStats)
 async def get_state_overview():
     """Get state-level KPI statistics"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     
     if has_data:
         districts = await get_districts_from_db()
@@ -608,38 +875,39 @@ async def get_state_overview():
 async def get_districts(
     sort_by: str = Query("shi_score", description="Field to sort by"),
     sort_order: str = Query("desc", description="Sort order: asc or desc"),
-    rag_filter: Optional[str] = Query(None, description="Filter by RAG status")
+    rag_filter: Optional[str] = Query(None, description="Filter by RAG status"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (omit for all districts)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
 ):
     """Get all districts with summary statistics"""
-    has_data = await get_data_from_db()
+    validate_sort(sort_by, sort_order, DISTRICT_SORT_FIELDS)
+    validate_rag_filter(rag_filter)
+    has_data = get_data_from_db()
     
     if has_data:
-        districts = await get_districts_from_db()
-    else:
-        districts = generate_mock_district_data()
+        districts = await get_districts_from_db(
+            rag_filter=rag_filter, sort_by=sort_by, sort_order=sort_order, limit=limit, cursor=cursor
+        )
+        return _summary_page(districts, sort_by, "district_code", limit)
+    
+    districts = generate_mock_district_data()
     
     # Apply RAG filter
     if rag_filter:
         districts = [d for d in districts if d.rag_status == rag_filter]
     
-    # Sort
-    reverse = sort_order == "desc"
-    if districts and hasattr(districts[0], sort_by):
-        districts.sort(key=lambda x: getattr(x, sort_by), reverse=reverse)
-    
-    return districts
+    districts = _sort_summaries(districts, sort_by, sort_order)
+    return districts[:limit] if limit else districts
 
 @api_router.get("/districts/{district_code}", response_model=DistrictSummary)
 async def get_district_detail(district_code: str):
     """Get detailed information for a specific district"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     
     if has_data:
-        districts = await get_districts_from_db()
+        district = await get_district_from_db(district_code)
     else:
-        districts = generate_mock_district_data()
-    
-    district = next((d for d in districts if d.district_code == district_code), None)
+        district = next((d for d in generate_mock_district_data() if d.district_code == district_code), None)
     
     if not district:
         raise HTTPException(status_code=404, detail="District not found")
@@ -650,37 +918,39 @@ async def get_district_detail(district_code: str):
 async def get_blocks(
     district_code: str,
     sort_by: str = Query("shi_score", description="Field to sort by"),
-    sort_order: str = Query("desc", description="Sort order")
+    sort_order: str = Query("desc", description="Sort order"),
+    rag_filter: Optional[str] = Query(None, description="Filter by RAG status"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (omit for all blocks)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
 ):
     """Get all blocks in a district"""
-    has_data = await get_data_from_db()
+    validate_sort(sort_by, sort_order, BLOCK_SORT_FIELDS)
+    validate_rag_filter(rag_filter)
+    has_data = get_data_from_db()
     
     if has_data:
-        district_name = DISTRICT_CODE_TO_NAME.get(district_code)
-        blocks = await get_blocks_from_db(district_code=district_code, district_name=district_name)
-    else:
-        blocks = generate_mock_block_data(district_code)
+        blocks = await get_blocks_from_db(
+            district_code=district_code, rag_filter=rag_filter, sort_by=sort_by,
+            sort_order=sort_order, limit=limit, cursor=cursor
+        )
+        return _summary_page(blocks, sort_by, "block_code", limit)
     
-    reverse = sort_order == "desc"
-    if blocks and hasattr(blocks[0], sort_by):
-        blocks.sort(key=lambda x: getattr(x, sort_by), reverse=reverse)
-    
-    return blocks
+    blocks = generate_mock_block_data(district_code)
+    if rag_filter:
+        blocks = [b for b in blocks if b.rag_status == rag_filter]
+    blocks = _sort_summaries(blocks, sort_by, sort_order)
+    return blocks[:limit] if limit else blocks
 
 @api_router.get("/blocks/{block_code}", response_model=BlockSummary)
 async def get_block_detail(block_code: str):
     """Get detailed information for a specific block"""
-    district_code = block_code[:4]
-    
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     
     if has_data:
-        district_name = DISTRICT_CODE_TO_NAME.get(district_code)
-        blocks = await get_blocks_from_db(district_code=district_code, district_name=district_name)
+        block = await get_block_from_db(block_code)
     else:
-        blocks = generate_mock_block_data(district_code)
-    
-    block = next((b for b in blocks if b.block_code == block_code), None)
+        blocks = generate_mock_block_data(block_code[:4])
+        block = next((b for b in blocks if b.block_code == block_code), None)
     
     if not block:
         raise HTTPException(status_code=404, detail="Block not found")
@@ -690,77 +960,42 @@ async def get_block_detail(block_code: str):
 @api_router.get("/blocks/{block_code}/schools", response_model=List[SchoolDetail])
 async def get_schools(
     block_code: str,
-    limit: int = Query(50, description="Number of schools to return"),
+    limit: int = Query(50, ge=1, le=1000, description="Number of schools to return"),
     sort_by: str = Query("shi_score", description="Field to sort by"),
     sort_order: str = Query("desc", description="Sort order"),
-    rag_filter: Optional[str] = Query(None, description="Filter by RAG status")
+    rag_filter: Optional[str] = Query(None, description="Filter by RAG status"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
 ):
-    """Get all schools in a block"""
-    has_data = await get_data_from_db()
+    """Get a page of schools in a block (filter, sort and paging run in Mongo)"""
+    validate_sort(sort_by, sort_order, SCHOOL_SORT_FIELDS)
+    validate_rag_filter(rag_filter)
+    has_data = get_data_from_db()
     
     if has_data:
-        schools = await get_schools_from_db(block_code=block_code, limit=limit)
-    else:
-        schools = generate_mock_schools(block_code, limit)
+        schools, next_cursor = await get_schools_from_db(
+            block_code=block_code, limit=limit, rag_filter=rag_filter,
+            sort_by=sort_by, sort_order=sort_order, cursor=cursor
+        )
+        return _page_response(schools, next_cursor)
+    
+    schools = generate_mock_schools(block_code, limit)
     
     # Apply RAG filter
     if rag_filter:
         schools = [s for s in schools if s.rag_status == rag_filter]
     
-    # Sort
-    reverse = sort_order == "desc"
-    if schools and hasattr(schools[0], sort_by):
-        schools.sort(key=lambda x: getattr(x, sort_by), reverse=reverse)
-    
-    return schools
+    return _sort_summaries(schools, sort_by, sort_order)
 
 @api_router.get("/schools/{udise_code}", response_model=SchoolDetail)
 async def get_school_detail(udise_code: str):
     """Get detailed information for a specific school"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     
     if has_data:
         doc = await db.schools.find_one({"udise_code": udise_code}, {"_id": 0})
         if doc:
-            total_students = doc.get("total_students", 0)
-            total_teachers = doc.get("total_teachers", 1)
-            classrooms = doc.get("classrooms", 1)
-            ptr = round(total_students / max(total_teachers, 1), 1)
-            students_per_classroom = round(total_students / max(classrooms, 1), 1)
-            
-            shi = calculate_shi({
-                "aadhaar_percentage": doc.get("aadhaar_percentage", 0),
-                "apaar_percentage": doc.get("apaar_percentage", 0),
-                "water_available": doc.get("water_available", True),
-                "toilets_available": doc.get("toilets_available", True),
-                "students_per_classroom": students_per_classroom,
-                "ptr": ptr,
-                "certified": doc.get("certified", False)
-            })
-            
-            return SchoolDetail(
-                udise_code=doc.get("udise_code", udise_code),
-                school_name=doc.get("school_name", "Unknown School"),
-                district_code=doc.get("district_code", ""),
-                district_name=doc.get("district_name", ""),
-                block_code=doc.get("block_code", ""),
-                block_name=doc.get("block_name", ""),
-                school_category=doc.get("school_category"),
-                school_management=doc.get("school_management"),
-                total_students=total_students,
-                total_teachers=total_teachers,
-                ptr=ptr,
-                aadhaar_percentage=doc.get("aadhaar_percentage", 0.0),
-                apaar_percentage=doc.get("apaar_percentage", 0.0),
-                water_available=doc.get("water_available", True),
-                toilets_available=doc.get("toilets_available", True),
-                classrooms=classrooms,
-                students_per_classroom=students_per_classroom,
-                data_entry_status=doc.get("data_entry_status", "pending"),
-                certified=doc.get("certified", False),
-                shi_score=shi,
-                rag_status=get_rag_status(shi)
-            )
+            doc.setdefault("udise_code", udise_code)
+            return school_from_doc(doc)
     
     # Fallback to mock
     block_code = udise_code[:6]
@@ -775,26 +1010,54 @@ async def get_school_detail(udise_code: str):
 
 # Rankings
 @api_router.get("/rankings/districts/top", response_model=List[DistrictSummary])
-async def get_top_districts(limit: int = Query(10)):
+async def get_top_districts(limit: int = Query(10, ge=1, le=100)):
     """Get top performing districts by SHI score"""
-    has_data = await get_data_from_db()
-    districts = await get_districts_from_db() if has_data else generate_mock_district_data()
+    if get_data_from_db():
+        return ORJSONResponse(await get_districts_from_db(sort_by="shi_score", sort_order="desc", limit=limit))
+    districts = generate_mock_district_data()
     districts.sort(key=lambda x: x.shi_score, reverse=True)
     return districts[:limit]
 
 @api_router.get("/rankings/districts/bottom", response_model=List[DistrictSummary])
-async def get_bottom_districts(limit: int = Query(10)):
+async def get_bottom_districts(limit: int = Query(10, ge=1, le=100)):
     """Get lowest performing districts by SHI score"""
-    has_data = await get_data_from_db()
-    districts = await get_districts_from_db() if has_data else generate_mock_district_data()
+    if get_data_from_db():
+        return ORJSONResponse(await get_districts_from_db(sort_by="shi_score", sort_order="asc", limit=limit))
+    districts = generate_mock_district_data()
     districts.sort(key=lambda x: x.shi_score)
     return districts[:limit]
 
+# SHI what-if
+@api_router.get("/shi/weights")
+async def get_shi_weights():
+    """Weights currently used for the persisted SHI scores"""
+    return DEFAULT_WEIGHTS
+
+@api_router.post("/shi/what-if")
+async def shi_what_if(request: WhatIfRequest):
+    """Rescore every school under alternative SHI weights (in memory, no DB reads).
+
+    Weights are normalized to sum to 1. Each scenario returns the RAG
+    distribution, district/block rankings and top/bottom schools compared
+    with the current weights.
+    """
+    matrix = get_score_matrix()
+    if matrix is None or len(matrix) == 0:
+        raise HTTPException(status_code=409, detail="No scored schools loaded yet; import school data first")
+    try:
+        results = [
+            matrix.what_if(weights.model_dump(), request.district_code, request.top_n)
+            for weights in request.scenarios
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"generation": matrix.generation, "scenarios": results}
+
 # Analytics endpoints
 @api_router.get("/analytics/identity-compliance")
 async def get_identity_compliance():
     """Get identity compliance analytics (Aadhaar/APAAR)"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     districts = await get_districts_from_db() if has_data else generate_mock_district_data()
     
     return {
@@ -815,7 +1078,7 @@ async def get_identity_compliance():
 @api_router.get("/analytics/infrastructure")
 async def get_infrastructure_analytics():
     """Get infrastructure analytics"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     districts = await get_districts_from_db() if has_data else generate_mock_district_data()
     
     return {
@@ -836,7 +1099,7 @@ async def get_infrastructure_analytics():
 @api_router.get("/analytics/teachers")
 async def get_teacher_analytics():
     """Get teacher staffing analytics"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     districts = await get_districts_from_db() if has_data else generate_mock_district_data()
     
     return {
@@ -857,7 +1120,7 @@ async def get_teacher_analytics():
 @api_router.get("/analytics/data-quality")
 async def get_data_quality_analytics():
     """Get data entry and quality analytics"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     districts = await get_districts_from_db() if has_data else generate_mock_district_data()
     
     return {
@@ -877,7 +1140,7 @@ async def get_data_quality_analytics():
 @api_router.get("/analytics/shi-distribution")
 async def get_shi_distribution():
     """Get SHI score distribution"""
-    has_data = await get_data_from_db()
+    has_data = get_data_from_db()
     districts = await get_districts_from_db() if has_data else generate_mock_district_data()
     
     excellent = [d for d in districts if d.shi_score >= 85]
@@ -911,7 +1174,7 @@ app.include_router(api_router)
 # Import all domain routers
 from routers.auth import router as auth_router, init_db as init_auth_db, create_default_admin
 from routers.export import router as export_router, init_db as init_export_db
-from routers.analytics import router as analytics_router, init_db as init_analytics_db
+from routers.analytics import router as analytics_router, init_db as init_analytics_db, refresh_precomputed
 from routers.aadhaar import router as aadhaar_router, init_db as init_aadhaar_db
 from routers.apaar import router as apaar_router, init_db as init_apaar_db
 from routers.dropbox import router as dropbox_router, init_db as init_dropbox_db
@@ -925,22 +1188,46 @@ from routers.classrooms_toilets import router as classrooms_toilets_router, init
 from routers.executive import router as executive_router, init_db as init_executive_db
 from routers.scope import router as scope_router, init_db as init_scope_db
 
-# Initialize all routers with database
-init_auth_db(db)
-init_export_db(db)
-init_analytics_db(db)
-init_aadhaar_db(db, UPLOADS_DIR)
-init_apaar_db(db, UPLOADS_DIR)
-init_dropbox_db(db, UPLOADS_DIR)
-init_enrolment_db(db, UPLOADS_DIR)
-init_infrastructure_db(db, UPLOADS_DIR)
-init_teacher_db(db, UPLOADS_DIR)
-init_data_entry_db(db, UPLOADS_DIR)
-init_age_enrolment_db(db, UPLOADS_DIR)
-init_ctteacher_db(db, UPLOADS_DIR)
-init_classrooms_toilets_db(db, UPLOADS_DIR)
-init_executive_db(db)
-init_scope_db(db)
+def wire_database(database):
+    """Inject the database into this module, the shared utils and all routers"""
+    global db
+    db = database
+    dataset_state.init_db(database)
+    snapshot.init_db(database)
+    export_jobs.init_db(database)
+    auth.init_db(database)
+    init_auth_db(database)
+    init_export_db(database)
+    init_analytics_db(database)
+    init_aadhaar_db(database, UPLOADS_DIR)
+    init_apaar_db(database, UPLOADS_DIR)
+    init_dropbox_db(database, UPLOADS_DIR)
+    init_enrolment_db(database, UPLOADS_DIR)
+    init_infrastructure_db(database, UPLOADS_DIR)
+    init_teacher_db(database, UPLOADS_DIR)
+    init_data_entry_db(database, UPLOADS_DIR)
+    init_age_enrolment_db(database, UPLOADS_DIR)
+    init_ctteacher_db(database, UPLOADS_DIR)
+    init_classrooms_toilets_db(database, UPLOADS_DIR)
+    init_executive_db(database)
+    init_scope_db(database)
+
+# Predictions and executive summaries for every state/district/block scope
+dataset_state.on_change(refresh_precomputed)
+
+async def run_startup_tasks():
+    """One-time work for a deployment (run by a single worker)"""
+    await create_default_admin(db)
+    await ensure_indexes()
+    await metrics.ensure_indexes(db)
+    await export_jobs.ensure_indexes(db)
+
+# GET /batch on every dashboard router, so a page loads its widgets in one request
+for dashboard_router in (
+    aadhaar_router, apaar_router, dropbox_router, enrolment_router, infrastructure_router, teacher_router,
+    data_entry_router, age_enrolment_router, ctteacher_router, classrooms_toilets_router, executive_router,
+):
+    batch.add_batch_route(dashboard_router)
 
 # Register all routers with /api prefix
 app.include_router(auth_router, prefix="/api")
@@ -959,6 +1246,13 @@ app.include_router(classrooms_toilets_router, prefix="/api")
 app.include_router(executive_router, prefix="/api")
 app.include_router(scope_router, prefix="/api")
 
+# Public GET responses are cached per generation (inner), everything else is
+# compressed on the way out; cache hits are already compressed. Conditional
+# GETs are answered before any of it runs (outer).
+app.add_middleware(response_cache.ResponseCacheMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(conditional.ConditionalGetMiddleware)
+
 # CORS middleware
 def _as_bool(v: str) -> bool:
     return str(v or "").strip().lower() in ("1", "true", "yes", "y", "on")
@@ -985,13 +1279,5 @@ app.add_middleware(
     allow_origin_regex=allow_origin_regex,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
-
-@app.on_event("startup")
-async def startup_event():
-    # Create default admin user
-    await create_default_admin(db)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
@@ -1,7 +1,10 @@
 """Authentication utilities"""
+import hashlib
 import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -23,6 +26,7 @@ SECRET_KEY = (
 )
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+ACCESS_TOKEN_TYPE = "access"
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -30,6 +34,28 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
+# A page load sends the same token to 10+ endpoints. Decoded payloads are kept
+# per token digest (never past the token's own expiry), and the account state
+# that can revoke a valid token (role, district, is_active) is re-read from
+# Mongo at most every USER_STATE_TTL_SECONDS. The auth router drops a user's
+# state as soon as an admin changes or deletes the account; other workers
+# pick the change up within the TTL.
+TOKEN_CACHE_SIZE = 4096
+USER_STATE_CACHE_SIZE = 4096
+USER_STATE_TTL_SECONDS = float(os.environ.get("USER_STATE_TTL_SECONDS", "60"))
+
+# token digest -> (expires at, payload)
+_tokens: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+# email -> (expires at, state or None when there is no such user)
+_user_states: "OrderedDict[str, Tuple[float, Optional[dict]]]" = OrderedDict()
+
+# Database will be injected
+db = None
+
+def init_db(database):
+    global db
+    db = database
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -40,7 +66,7 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
-    to_encode = data.copy()
+    to_encode = {**data, "type": ACCESS_TOKEN_TYPE}
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -66,31 +92,86 @@ def verify_reset_token(token: str) -> Optional[str]:
         return None
 
 def decode_token(token: str) -> Optional[dict]:
-    """Decode a JWT token"""
+    """Decode a JWT token (cached until it expires)"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+    cached = _tokens.get(key)
+    if cached is not None:
+        if cached[0] > now:
+            _tokens.move_to_end(key)
+            return cached[1]
+        del _tokens[key]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    if isinstance(payload.get("exp"), (int, float)):
+        _tokens[key] = (float(payload["exp"]), payload)
+        if len(_tokens) > TOKEN_CACHE_SIZE:
+            _tokens.popitem(last=False)
+    return payload
 
-async def get_current_user_optional(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current user from token (optional - returns None if no token)"""
-    if credentials is None:
+async def get_user_state(email: Optional[str]) -> Optional[dict]:
+    """Role, district_code and is_active of an account (cached), or None if it does not exist"""
+    if not email:
         return None
-    
-    token = credentials.credentials
+    now = time.monotonic()
+    cached = _user_states.get(email)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    user = await db.users.find_one({"email": email}, {"_id": 0, "role": 1, "district_code": 1, "is_active": 1})
+    state = {
+        "role": user.get("role"),
+        "district_code": user.get("district_code"),
+        "is_active": user.get("is_active", True),
+    } if user else None
+    _user_states[email] = (now + USER_STATE_TTL_SECONDS, state)
+    _user_states.move_to_end(email)
+    if len(_user_states) > USER_STATE_CACHE_SIZE:
+        _user_states.popitem(last=False)
+    return state
+
+def invalidate_user(email: Optional[str]):
+    """Forget the cached state of an account after it was changed"""
+    if email:
+        _user_states.pop(email, None)
+
+async def _user_from_token(token: str) -> Tuple[Optional[dict], Optional[dict]]:
+    """(payload, current account state) for a token; either is None when invalid or revoked"""
     payload = decode_token(token)
-    if payload is None:
-        return None
-    
+    # Reset tokens are signed with the same key; they must never work as bearer
+    # tokens. Access tokens issued before the type claim existed have none.
+    if payload is None or payload.get("type", ACCESS_TOKEN_TYPE) != ACCESS_TOKEN_TYPE:
+        return None, None
+    return payload, await get_user_state(payload.get("sub"))
+
+async def token_is_authorized(token: str) -> bool:
+    """True when get_current_user would accept `token` (access token of an existing, active account)"""
+    _, state = await _user_from_token(token)
+    return state is not None and state["is_active"]
+
+def _current_user(payload: dict, state: dict) -> dict:
     return {
         "email": payload.get("sub"),
-        "role": payload.get("role"),
-        "district_code": payload.get("district_code"),
+        "role": state["role"],
+        "district_code": state["district_code"],
         "user_id": payload.get("user_id"),
         "full_name": payload.get("full_name")
     }
 
+async def get_current_user_optional(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current user from token (optional - returns None if no token)"""
+    if credentials is None:
+        return None
+    
+    payload, state = await _user_from_token(credentials.credentials)
+    if state is None or not state["is_active"]:
+        return None
+    
+    return _current_user(payload, state)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from token (required)"""
     credentials_exception = HTTPException(
@@ -102,18 +183,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if credentials is None:
         raise credentials_exception
     
-    token = credentials.credentials
-    payload = decode_token(token)
-    if payload is None:
+    payload, state = await _user_from_token(credentials.credentials)
+    if state is None:
+        # Bad or expired token, or the account was deleted
         raise credentials_exception
+    if not state["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is disabled"
+        )
     
-    return {
-        "email": payload.get("sub"),
-        "role": payload.get("role"),
-        "district_code": payload.get("district_code"),
-        "user_id": payload.get("user_id"),
-        "full_name": payload.get("full_name")
-    }
+    return _current_user(payload, state)
 
 def require_role(*allowed_roles):
     """Decorator to require specific roles"""
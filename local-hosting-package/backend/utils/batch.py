@@ -0,0 +1,111 @@
+"""Batched widget requests.
+
+A dashboard page loads 6-10 widgets from one router for the same scope.
+`add_batch_route(router)` adds `GET <prefix>/batch?widgets=a,b&<scope>`, which
+runs the named widget handlers of that router concurrently and returns their
+payloads in one response: one round trip, one cache entry and one ETag
+instead of ten.
+
+Widgets are the router's GET routes without path parameters, required query
+parameters or dependencies, named by their path (`overview`, `block-wise`).
+The scope parameters are passed to every widget that accepts them; other
+parameters keep their defaults.
+"""
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.params import Depends
+from fastapi.routing import APIRoute
+from pydantic_core import PydanticUndefined
+
+logger = logging.getLogger(__name__)
+
+SCOPE_PARAMS = ("district_code", "block_code", "udise_code", "district_name", "block_name", "school_name")
+
+
+def _defaults(endpoint: Callable[..., Any]) -> Optional[Dict[str, Any]]:
+    """Default value of every parameter, or None if the handler needs more than a scope"""
+    defaults = {}
+    for name, param in inspect.signature(endpoint).parameters.items():
+        default = param.default
+        if isinstance(default, Depends) or default is inspect.Parameter.empty:
+            return None
+        if hasattr(default, "default"):
+            # Query(...) declarations
+            if default.default is PydanticUndefined or default.default is Ellipsis:
+                return None
+            default = default.default
+        defaults[name] = default
+    return defaults
+
+
+def _widgets(router: APIRouter) -> Dict[str, Any]:
+    widgets = {}
+    for route in router.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods or "{" in route.path:
+            continue
+        # The undecorated handler returns the payload itself (see utils.responses.ORJSONRoute)
+        endpoint = inspect.unwrap(route.endpoint)
+        defaults = _defaults(endpoint)
+        if defaults is None or not inspect.iscoroutinefunction(endpoint):
+            continue
+        widgets[route.path[len(router.prefix):].strip("/")] = (endpoint, defaults)
+    return widgets
+
+
+async def _run(name: str, endpoint: Callable[..., Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return {"data": await endpoint(**kwargs)}
+    except HTTPException as e:
+        return {"error": {"status_code": e.status_code, "detail": e.detail}}
+    except Exception as e:
+        logger.error(f"Batched widget {name} failed: {str(e)}")
+        return {"error": {"status_code": 500, "detail": "Internal Server Error"}}
+
+
+def add_batch_route(router: APIRouter):
+    """Add `GET /batch` to `router`; call after all of its widget routes are declared"""
+    widgets = _widgets(router)
+
+    async def get_batch(
+        widgets_param: str = Query(..., alias="widgets", description="Comma-separated widget names, e.g. overview,block-wise"),
+        district_code: Optional[str] = Query(None),
+        block_code: Optional[str] = Query(None),
+        udise_code: Optional[str] = Query(None),
+        district_name: Optional[str] = Query(None),
+        block_name: Optional[str] = Query(None),
+        school_name: Optional[str] = Query(None),
+    ):
+        names = list(dict.fromkeys(name.strip() for name in widgets_param.split(",") if name.strip()))
+        unknown = [name for name in names if name not in widgets]
+        if not names or unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown widgets: {', '.join(unknown) or '(none given)'}. Allowed: {', '.join(sorted(widgets))}",
+            )
+
+        scope = {
+            "district_code": district_code,
+            "block_code": block_code,
+            "udise_code": udise_code,
+            "district_name": district_name,
+            "block_name": block_name,
+            "school_name": school_name,
+        }
+        calls = []
+        for name in names:
+            endpoint, defaults = widgets[name]
+            kwargs = {key: scope[key] if key in SCOPE_PARAMS else value for key, value in defaults.items()}
+            calls.append(_run(name, endpoint, kwargs))
+        results = await asyncio.gather(*calls)
+
+        return {
+            "widgets": {name: result["data"] for name, result in zip(names, results) if "data" in result},
+            "errors": {name: result["error"] for name, result in zip(names, results) if "error" in result},
+        }
+
+    get_batch.__doc__ = f"Several {router.prefix.strip('/')} widgets for one scope in a single response"
+    router.add_api_route("/batch", get_batch, methods=["GET"], name=f"{router.prefix.strip('/')}_batch")
@@ -0,0 +1,160 @@
+"""Response compression (brotli, else gzip).
+
+Dashboard JSON compresses roughly tenfold, which matters for district offices
+on slow links. Responses of at least COMPRESSION_MIN_BYTES are compressed with
+the best encoding the client accepts; streamed responses (CSV exports) are
+compressed chunk by chunk. Responses that already carry a Content-Encoding
+(e.g. the precompressed entries of utils.response_cache) and formats that are
+compressed already (xlsx, zip, gzip, PDF, images) pass through untouched.
+"""
+import os
+import zlib
+from typing import Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+
+# Preferred first
+ENCODINGS = ("br", "gzip")
+
+_INCOMPRESSIBLE_TYPES = (
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/pdf",
+    "application/vnd.openxmlformats",
+    "image/",
+    "audio/",
+    "video/",
+)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best of ENCODINGS allowed by an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compressible(content_type: str) -> bool:
+    return not content_type.lower().startswith(_INCOMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return _StreamCompressor(encoding).finish(body)
+
+
+def set_encoding(headers: MutableHeaders, encoding: str, length: Optional[int]):
+    """Mark response headers as encoded with `encoding` (`length` None for streams)"""
+    headers["Content-Encoding"] = encoding
+    if length is None:
+        del headers["Content-Length"]
+    else:
+        headers["Content-Length"] = str(length)
+    headers.add_vary_header("Accept-Encoding")
+
+
+class _StreamCompressor:
+    """Incremental compressor; every chunk is flushed so streamed rows reach the client"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size).send)
+
+
+class _Responder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not compressible(headers.get("content-type", ""))
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            self.compressor = _StreamCompressor(self.encoding)
+            if more_body:
+                set_encoding(headers, self.encoding, None)
+                body = self.compressor.chunk(body)
+            else:
+                body = self.compressor.finish(body)
+                set_encoding(headers, self.encoding, len(body))
+            await self._send(start)
+            await self._send({**message, "body": body})
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+        body = self.compressor.finish(body) if not more_body else self.compressor.chunk(body)
+        await self._send({**message, "body": body})
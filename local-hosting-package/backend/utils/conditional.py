@@ -0,0 +1,104 @@
+"""Conditional GET (ETag / If-None-Match) for the dashboard routes.
+
+A dashboard response only changes when an import lands, so its strong ETag is
+a digest of (ready dataset generation, path, query string). The ready
+generation only moves once the import's change hooks (rollups, scores,
+snapshots) have finished, and no ETag is issued while they run. The frontend refetches
+every widget on each navigation; with these validators the browser revalidates
+instead and gets a 304 answered here, before routing, so no aggregation runs
+and no body is sent.
+
+Authenticated routes (/api/analytics) only get a 304 for a request whose
+bearer token get_current_user would accept (access token, active account). Exports set their own validators
+(utils.export_cache).
+"""
+import hashlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils import auth, dataset_state, response_cache
+
+CACHE_CONTROL = "private, no-cache"
+
+EXCLUDED_PREFIXES = ("/api/auth", "/api/export", "/api/health")
+AUTHENTICATED_PREFIXES = ("/api/analytics",)
+
+
+def applies(scope: Scope) -> bool:
+    path = scope["path"]
+    return (
+        scope["type"] == "http"
+        and scope["method"] in ("GET", "HEAD")
+        and path.startswith("/api/")
+        and not path.startswith(EXCLUDED_PREFIXES)
+    )
+
+
+def etag(scope: Scope) -> str:
+    """Digest of the request's (ready generation, path, query) without quotes"""
+    raw = repr(response_cache.request_key(scope)).encode()
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _tag(digest: str, encoding: Optional[str]) -> str:
+    # Each content coding is its own representation, so it gets its own strong tag
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def _matching_tag(header: str, digest: str) -> Optional[str]:
+    """The If-None-Match entry naming any representation of `digest`, if one does"""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return _tag(digest, None)
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag.strip('"').split("-")[0] == digest:
+            return tag
+    return None
+
+
+async def _authenticated(headers: Headers) -> bool:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and await auth.token_is_authorized(token.strip())
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        digest = etag(scope)
+        headers = Headers(scope=scope)
+        matched = _matching_tag(headers.get("if-none-match", ""), digest)
+        if (
+            matched
+            and (not scope["path"].startswith(AUTHENTICATED_PREFIXES) or await _authenticated(headers))
+        ):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [
+                    (b"etag", matched.encode()),
+                    (b"cache-control", CACHE_CONTROL.encode()),
+                    (b"vary", b"Accept-Encoding"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def with_validators(message: Message):
+            # A body built while change hooks run may mix generations: send it unvalidated
+            if message["type"] == "http.response.start" and message["status"] == 200 and dataset_state.ready():
+                response_headers = MutableHeaders(scope=message)
+                if "etag" not in response_headers:
+                    response_headers["ETag"] = _tag(digest, response_headers.get("content-encoding"))
+                    response_headers["Cache-Control"] = CACHE_CONTROL
+            await send(message)
+
+        await self.app(scope, receive, with_validators)
@@ -0,0 +1,232 @@
+"""Process-wide dataset state registry.
+
+Keeps a cached view of which collections hold data (with approximate document
+counts) plus a dataset *generation* number that is bumped every time an import
+lands. Request handlers read these cached values instead of running
+`count_documents` against Mongo on every call.
+
+The generation lives in the `dataset_state` collection so every process (API
+workers, the standalone ETL script) agrees on it. A lightweight polling watcher
+re-reads that one document and the collection metadata counts, and fires the
+registered change hooks whenever the generation moves.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "dataset_state"
+STATE_DOC_ID = "current"
+
+# Collections whose presence/size the dashboards care about
+TRACKED_COLLECTIONS = [
+    "schools",
+    "aadhaar_analytics",
+    "apaar_analytics",
+    "teacher_analytics",
+    "infrastructure_analytics",
+    "enrolment_analytics",
+    "dropbox_analytics",
+    "data_entry_analytics",
+    "age_enrolment",
+    "ctteacher_analytics",
+    "classrooms_toilets",
+]
+
+POLL_INTERVAL_SECONDS = float(os.environ.get("DATASET_STATE_POLL_SECONDS", "30"))
+
+# Database will be injected
+db = None
+
+_generation: int = 0
+# Random id written with every bump, so a reset database that restarts the
+# counter never reuses the name of an older generation
+_generation_id: str = ""
+# Generation whose change hooks have all finished (None until the first refresh completes)
+_ready_generation: Optional[int] = None
+_counts: Dict[str, int] = {}
+_refreshed_at: Optional[datetime] = None
+_hooks: List[Callable[[], Awaitable[None]]] = []
+_watcher: Optional[asyncio.Task] = None
+_lock: Optional[asyncio.Lock] = None
+
+
+def init_db(database):
+    global db
+    db = database
+
+
+def has_data(collection: str = "schools") -> bool:
+    """True when the collection held documents at the last refresh"""
+    return _counts.get(collection, 0) > 0
+
+
+def count(collection: str) -> int:
+    """Approximate document count from the last refresh (0 if unknown)"""
+    return _counts.get(collection, 0)
+
+
+def generation() -> int:
+    """Current dataset generation (bumped on every import)"""
+    return _generation
+
+
+def generation_id() -> str:
+    """Random id of the current generation ("" for a dataset never bumped)"""
+    return _generation_id
+
+
+def ready_generation() -> Optional[int]:
+    """Latest generation whose change hooks (rollups, scores, snapshots...) have finished.
+
+    Derived data lags `generation()` while the hooks run; caches of responses
+    built from it are keyed on this value instead.
+    """
+    return _ready_generation
+
+
+def ready() -> bool:
+    """True when no change hooks are pending for the current generation"""
+    return _ready_generation is not None and _ready_generation == _generation
+
+
+def describe() -> Dict[str, Any]:
+    """Summary of the cached state, used by the health endpoint"""
+    return {
+        "generation": _generation,
+        "ready_generation": _ready_generation,
+        "refreshed_at": _refreshed_at.isoformat() if _refreshed_at else None,
+        "collections": dict(_counts),
+    }
+
+
+def on_change(hook: Callable[[], Awaitable[None]]):
+    """Register an async hook to run whenever the dataset generation changes.
+
+    Can be used as a decorator. Hooks run sequentially; a failing hook is logged
+    and does not prevent the others from running.
+    """
+    _hooks.append(hook)
+    return hook
+
+
+async def bump_generation(database, collection: Optional[str] = None) -> int:
+    """Atomically increment the shared dataset generation and return the new value"""
+    doc = await database[STATE_COLLECTION].find_one_and_update(
+        {"_id": STATE_DOC_ID},
+        {
+            "$inc": {"generation": 1},
+            "$set": {
+                "generation_id": uuid.uuid4().hex,
+                "updated_at": datetime.now(timezone.utc),
+                "last_collection": collection,
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc.get("generation", 0))
+
+
+async def _read_generation() -> Tuple[int, str]:
+    doc = await db[STATE_COLLECTION].find_one({"_id": STATE_DOC_ID}, {"generation": 1, "generation_id": 1})
+    if not doc:
+        return 0, ""
+    return int(doc.get("generation", 0)), doc.get("generation_id") or ""
+
+
+async def _estimate_counts() -> Dict[str, int]:
+    """Collection sizes from metadata (no collection scan)"""
+    counts = {}
+    for name in TRACKED_COLLECTIONS:
+        try:
+            counts[name] = await db[name].estimated_document_count()
+        except Exception as e:
+            logger.warning(f"Could not estimate count for {name}: {str(e)}")
+            counts[name] = _counts.get(name, 0)
+    return counts
+
+
+async def _run_hooks():
+    for hook in list(_hooks):
+        try:
+            await hook()
+        except Exception as e:
+            logger.error(f"Dataset change hook {getattr(hook, '__name__', hook)} failed: {str(e)}")
+
+
+async def refresh(force: bool = False) -> bool:
+    """Re-read the generation and collection counts.
+
+    Fires the change hooks when the generation moved (or on the first refresh /
+    when forced). Returns True if the hooks ran.
+    """
+    global _generation, _generation_id, _ready_generation, _counts, _refreshed_at, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        gen, gen_id = await _read_generation()
+        counts = await _estimate_counts()
+        changed = force or _refreshed_at is None or gen != _generation or gen_id != _generation_id
+        _generation = gen
+        _generation_id = gen_id
+        _counts = counts
+        _refreshed_at = datetime.now(timezone.utc)
+
+    if changed:
+        logger.info(f"Dataset generation {gen}: {sum(counts.values())} documents across tracked collections")
+        await _run_hooks()
+        if _generation == gen:
+            _ready_generation = gen
+    return changed
+
+
+async def mark_imported(collection: Optional[str] = None):
+    """Record that an import touched `collection`; never raises.
+
+    Called at the end of every import task (successful or not, since imports
+    clear the collection up front).
+    """
+    try:
+        await bump_generation(db, collection)
+        await refresh()
+    except Exception as e:
+        logger.error(f"Failed to record import of {collection}: {str(e)}")
+
+
+async def _watch(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dataset state refresh failed: {str(e)}")
+
+
+def start_watcher(interval: Optional[float] = None):
+    """Start the background polling watcher (idempotent)"""
+    global _watcher
+    if _watcher is not None and not _watcher.done():
+        return
+    _watcher = asyncio.create_task(_watch(interval or POLL_INTERVAL_SECONDS))
+
+
+async def stop_watcher():
+    global _watcher
+    if _watcher is None:
+        return
+    _watcher.cancel()
+    try:
+        await _watcher
+    except asyncio.CancelledError:
+        pass
+    _watcher = None
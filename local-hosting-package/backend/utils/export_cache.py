@@ -0,0 +1,219 @@
+"""On-disk cache of generated export files.
+
+Rendering an Excel workbook or a ReportLab PDF is the expensive part of an
+export, and every officer exporting the same dashboard for the same scope gets
+the same file until the next import. Generated files are therefore kept in
+EXPORT_CACHE_DIR, keyed by (export kind, scope, dataset generation), and
+repeat requests are answered with a FileResponse plus an ETag (or a 304).
+
+The directory is shared by all workers. Files of older generations are purged
+when the dataset changes, and the total size is bounded by evicting the least
+recently served files first (access time is refreshed on every hit).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from utils import dataset_state
+
+logger = logging.getLogger(__name__)
+
+# Set to an empty string to disable caching (every export is rendered on demand)
+_cache_dir = os.environ.get(
+    "EXPORT_CACHE_DIR", str(Path(__file__).resolve().parents[2] / "data" / "export_cache")
+)
+EXPORT_CACHE_DIR = Path(_cache_dir) if _cache_dir else None
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Recently served files are never evicted, so a response that is about to open its file keeps it
+EVICTION_GRACE_SECONDS = 60
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Serializes rendering of the same key within a process (concurrent clicks render once)
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def cache_key(kind: str, scope: Optional[Dict[str, Any]] = None, generation: Optional[int] = None) -> str:
+    """Stable digest of (kind, scope, generation); empty scope values are ignored"""
+    scope = {k: v for k, v in (scope or {}).items() if v}
+    generation = dataset_state.generation() if generation is None else generation
+    raw = json.dumps([kind, scope, generation], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _path(key: str, suffix: str, generation: int) -> Path:
+    return EXPORT_CACHE_DIR / f"g{generation}-{key}{suffix}"
+
+
+def _etag(key: str) -> str:
+    return f'"{key}"'
+
+
+def _touch(path: Path):
+    """Refresh the access time (LRU order) without changing the modification time"""
+    try:
+        st = path.stat()
+        os.utime(path, (time.time(), st.st_mtime))
+    except OSError:
+        pass
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+def _evict(keep: Path):
+    """Remove least recently served files (never `keep`) until the cache fits EXPORT_CACHE_MAX_BYTES"""
+    entries = []
+    for path in EXPORT_CACHE_DIR.glob("g*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_atime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    if total <= EXPORT_CACHE_MAX_BYTES:
+        return
+    cutoff = time.time() - EVICTION_GRACE_SECONDS
+    for atime, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= EXPORT_CACHE_MAX_BYTES:
+            break
+        if atime > cutoff or path == keep:
+            continue
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+
+
+def _file_chunks(path: str) -> Iterator[bytes]:
+    """Stream a temp file in chunks and remove it afterwards"""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
+
+
+async def _render_uncached(suffix: str, media_type: str, filename: str,
+                           render: Callable[[str], Awaitable[None]]) -> StreamingResponse:
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        await render(path)
+    except Exception:
+        os.unlink(path)
+        raise
+    return StreamingResponse(
+        _file_chunks(path),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(os.path.getsize(path)),
+        },
+    )
+
+
+def enabled() -> bool:
+    return EXPORT_CACHE_DIR is not None
+
+
+def has(kind: str, scope: Optional[Dict[str, Any]], suffix: str) -> bool:
+    """True when the export is already rendered for the current generation"""
+    if EXPORT_CACHE_DIR is None:
+        return False
+    generation = dataset_state.generation()
+    return _path(cache_key(kind, scope, generation), suffix, generation).exists()
+
+
+async def ensure(
+    kind: str,
+    scope: Optional[Dict[str, Any]],
+    suffix: str,
+    render: Callable[[str], Awaitable[None]],
+) -> Path:
+    """Path of the cached export, rendering it with `render(path)` on a miss"""
+    generation = dataset_state.generation()
+    key = cache_key(kind, scope, generation)
+    path = _path(key, suffix, generation)
+    lock = _locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            if path.exists():
+                _touch(path)
+                return path
+            EXPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=suffix, dir=EXPORT_CACHE_DIR, prefix=".tmp-")
+            os.close(fd)
+            try:
+                await render(tmp)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            _evict(keep=path)
+            return path
+    finally:
+        # Waiters already hold the lock object; later requests find the file
+        _locks.pop(key, None)
+
+
+async def serve(
+    request: Request,
+    kind: str,
+    scope: Optional[Dict[str, Any]],
+    suffix: str,
+    media_type: str,
+    filename: str,
+    render: Callable[[str], Awaitable[None]],
+) -> Response:
+    """Serve an export from the cache, rendering it with `render(path)` on a miss"""
+    if EXPORT_CACHE_DIR is None:
+        return await _render_uncached(suffix, media_type, filename, render)
+
+    etag = _etag(cache_key(kind, scope))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    path = await ensure(kind, scope, suffix, render)
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
+
+
+async def purge_stale():
+    """Dataset change hook: drop files rendered for other generations"""
+    if EXPORT_CACHE_DIR is None or not EXPORT_CACHE_DIR.exists():
+        return
+    current = f"g{dataset_state.generation()}-"
+    removed = 0
+    for path in EXPORT_CACHE_DIR.iterdir():
+        if path.name.startswith(current):
+            continue
+        try:
+            # Leave in-flight renders of other workers alone unless they are abandoned
+            if path.name.startswith(".tmp-") and time.time() - path.stat().st_mtime < 3600:
+                continue
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        logger.info(f"Removed {removed} cached export files from previous dataset generations")
@@ -0,0 +1,119 @@
+"""Background export jobs.
+
+Exports too large to render within a request run as asyncio tasks in the
+worker that received them. Job state lives in the `export_jobs` collection so
+the status endpoint answers from any worker; the finished file is served from
+the shared export cache. Job ids are the export cache keys, so officers asking
+for the same export share one job instead of starting another. Every user who
+submitted or joined a job is recorded on it, and only they can read its status.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "export_jobs"
+JOB_TTL_SECONDS = 24 * 3600
+# A job still "running" after this long is assumed to have died with its worker
+JOB_STALE_SECONDS = float(os.environ.get("EXPORT_JOB_STALE_SECONDS", "1800"))
+
+# Database will be injected
+db = None
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def init_db(database):
+    global db
+    db = database
+
+
+async def ensure_indexes(database):
+    await database[JOBS_COLLECTION].create_index("created_at", expireAfterSeconds=JOB_TTL_SECONDS)
+
+
+def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": doc["_id"],
+        "status": doc.get("status"),
+        "download_url": doc.get("download_url"),
+        "error": doc.get("error"),
+        "created_at": doc.get("created_at"),
+        "finished_at": doc.get("finished_at"),
+    }
+
+
+async def get(job_id: str, owner: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The job if `owner` submitted or joined it, else None"""
+    doc = await db[JOBS_COLLECTION].find_one({"_id": job_id, "owners": owner})
+    return _public(doc) if doc else None
+
+
+async def active(job_id: str, owner: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The job if it is currently running (and not stale), joined by `owner`; else None"""
+    since = datetime.now(timezone.utc) - timedelta(seconds=JOB_STALE_SECONDS)
+    doc = await db[JOBS_COLLECTION].find_one_and_update(
+        {"_id": job_id, "status": "running", "updated_at": {"$gte": since}},
+        {"$addToSet": {"owners": owner}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return _public(doc) if doc else None
+
+
+async def submit(job_id: str, owner: Optional[str], download_url: str,
+                 work: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+    """Start `work` as job `job_id` unless it is already running; returns the job"""
+    now = datetime.now(timezone.utc)
+    restartable = {"$or": [
+        {"status": {"$ne": "running"}},
+        {"updated_at": {"$lt": now - timedelta(seconds=JOB_STALE_SECONDS)}},
+    ]}
+    try:
+        doc = await db[JOBS_COLLECTION].find_one_and_update(
+            {"_id": job_id, **restartable},
+            {"$set": {
+                "status": "running",
+                "owners": [owner],
+                "download_url": download_url,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+                "finished_at": None,
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Already running (possibly in another worker)
+        doc = await db[JOBS_COLLECTION].find_one_and_update(
+            {"_id": job_id},
+            {"$addToSet": {"owners": owner}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return _public(doc)
+
+    task = asyncio.create_task(_run(job_id, work))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return _public(doc)
+
+
+async def _run(job_id: str, work: Callable[[], Awaitable[Any]]):
+    update: Dict[str, Any]
+    try:
+        await work()
+        update = {"status": "done"}
+    except Exception as e:
+        logger.error(f"Export job {job_id} failed: {str(e)}")
+        update = {"status": "failed", "error": str(e)}
+    now = datetime.now(timezone.utc)
+    await db[JOBS_COLLECTION].update_one(
+        {"_id": job_id},
+        {"$set": {**update, "updated_at": now, "finished_at": now}},
+    )
@@ -0,0 +1,272 @@
+"""Excel and PDF rendering for the export routes.
+
+Everything here is synchronous and works on plain data (lists, dicts and file
+paths), never on the database, so it can run in a worker process of
+utils.render_pool instead of on the event loop. Large tables arrive as row
+spool files (one JSON array per line) and are streamed into write-only
+workbooks, keeping memory flat on both sides of the process boundary.
+"""
+import json
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
+# Excel styling
+HEADER_FILL = PatternFill(start_color="1E3A5F", end_color="1E3A5F", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF", size=11)
+DATA_FONT = Font(size=10)
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# Named styles registered on every workbook; write-only cells refer to them by name
+EXCEL_STYLES = {
+    "export_title": {"font": Font(bold=True, size=14), "alignment": Alignment(horizontal='center')},
+    "export_header": {"fill": HEADER_FILL, "font": HEADER_FONT, "border": THIN_BORDER,
+                      "alignment": Alignment(horizontal='center', vertical='center')},
+    "export_number": {"font": DATA_FONT, "border": THIN_BORDER, "alignment": Alignment(horizontal='center')},
+    "export_text": {"font": DATA_FONT, "border": THIN_BORDER, "alignment": Alignment(horizontal='left')},
+}
+# Rows buffered before the header is written, to size columns and pick per-column styles
+EXCEL_SAMPLE_ROWS = 200
+
+# ============== EXCEL ==============
+
+def new_workbook() -> Workbook:
+    """Write-only workbook: rows go straight to temp storage instead of an in-memory cell grid"""
+    wb = Workbook(write_only=True)
+    for name, style in EXCEL_STYLES.items():
+        wb.add_named_style(NamedStyle(name=name, **style))
+    return wb
+
+def _cell(ws, value: Any, style: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+def write_title(ws, title: str, span: int):
+    """Title row (merged across the table width) followed by the generated-at line"""
+    ws.append([_cell(ws, title, "export_title")])
+    ws.merged_cells.add(f"A1:{get_column_letter(max(span, 1))}1")
+    ws.append([])
+    ws.append([f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"])
+    ws.append([])
+
+def write_table(ws, headers: List[str], rows: Iterable[list], title: str = None, span: int = None) -> int:
+    """Append an optional title, a styled header and data rows; returns the number of data rows.
+
+    Column widths and the number/text style of each column come from the
+    header and the first EXCEL_SAMPLE_ROWS rows. A write-only sheet emits its
+    column widths with the first row, so they are set before the title.
+    """
+    source = iter(rows)
+    sample = []
+    for row in source:
+        sample.append(row)
+        if len(sample) >= EXCEL_SAMPLE_ROWS:
+            break
+    
+    column_styles = []
+    for col, header in enumerate(headers):
+        values = [row[col] for row in sample if col < len(row) and row[col] not in (None, "")]
+        width = max([len(str(header))] + [len(str(v)) for v in values])
+        ws.column_dimensions[get_column_letter(col + 1)].width = min(width + 2, 50)
+        numeric = bool(values) and isinstance(values[0], (int, float)) and not isinstance(values[0], bool)
+        column_styles.append("export_number" if numeric else "export_text")
+    
+    def cells(row):
+        return [_cell(ws, value, column_styles[i] if i < len(column_styles) else "export_text") for i, value in enumerate(row)]
+    
+    if title:
+        write_title(ws, title, span or len(headers))
+    ws.append([_cell(ws, header, "export_header") for header in headers])
+    count = 0
+    for row in sample:
+        ws.append(cells(row))
+        count += 1
+    for row in source:
+        ws.append(cells(row))
+        count += 1
+    return count
+
+def read_spool(path: str) -> Iterator[list]:
+    """Rows from a spool file written by the export routes"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def build_workbook(path: str, sheets: List[Dict[str, Any]]):
+    """Write a workbook with one table per sheet.
+
+    Each sheet is {"name", "headers", "rows" | "rows_file"} plus an optional
+    "title" (merged over "span" columns, default the table width).
+    """
+    wb = new_workbook()
+    for sheet in sheets:
+        ws = wb.create_sheet(sheet["name"][:31])  # Excel sheet name limit
+        rows = read_spool(sheet["rows_file"]) if "rows_file" in sheet else sheet["rows"]
+        write_table(ws, sheet["headers"], rows, title=sheet.get("title"), span=sheet.get("span"))
+    wb.save(path)
+
+# ============== PDF ==============
+
+def build_executive_summary_pdf(path: str, shi_data: Dict[str, Any], block_data: List[Dict[str, Any]]):
+    """Executive summary PDF: SHI table, key statistics and block rankings"""
+    doc = SimpleDocTemplate(path, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=20)
+    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=1, textColor=colors.grey)
+    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=14, spaceBefore=15, spaceAfter=10)
+    
+    elements = []
+    
+    # Title
+    elements.append(Paragraph("Maharashtra Education Dashboard", title_style))
+    elements.append(Paragraph("Executive Summary Report", subtitle_style))
+    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", subtitle_style))
+    elements.append(Spacer(1, 20))
+    
+    # School Health Index section
+    elements.append(Paragraph("School Health Index (SHI)", heading_style))
+    
+    shi_table_data = [
+        ["Metric", "Score", "Status"],
+        ["School Health Index", f"{shi_data.get('shi', 0)}", shi_data.get('rag_status', 'Red')],
+        ["Student Identity", f"{shi_data.get('identity_index', 0)}", "25% Weight"],
+        ["Infrastructure", f"{shi_data.get('infra_index', 0)}", "25% Weight"],
+        ["Teacher Quality", f"{shi_data.get('teacher_index', 0)}", "25% Weight"],
+        ["Operational", f"{shi_data.get('ops_index', 0)}", "25% Weight"],
+    ]
+    
+    shi_table = Table(shi_table_data, colWidths=[3*inch, 2*inch, 2*inch])
+    shi_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor("#E8F5E9") if shi_data.get('shi', 0) >= 85 else colors.HexColor("#FFEBEE")),
+        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(shi_table)
+    elements.append(Spacer(1, 20))
+    
+    # Key Statistics
+    elements.append(Paragraph("Key Statistics", heading_style))
+    stats_data = [
+        ["Total Schools", "Total Students", "Total Teachers", "Total Classrooms", "Total Toilets"],
+        [f"{shi_data.get('total_schools', 0):,}", f"{shi_data.get('total_students', 0):,}", 
+         f"{shi_data.get('total_teachers', 0):,}", f"{shi_data.get('total_classrooms', 0):,}",
+         f"{shi_data.get('total_toilets', 0):,}"]
+    ]
+    stats_table = Table(stats_data, colWidths=[1.5*inch]*5)
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 1), (-1, 1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(stats_table)
+    elements.append(PageBreak())
+    
+    # Block Rankings
+    elements.append(Paragraph("Block-wise Performance Rankings", heading_style))
+    
+    block_table_data = [["Rank", "Block", "SHI", "Identity", "Infra", "Teacher", "Ops", "Status"]]
+    for b in block_data[:15]:
+        block_table_data.append([
+            str(b["rank"]), b["block_name"], f"{b['shi_score']}", 
+            f"{b['identity']}", f"{b['infra']}", f"{b['teacher']}", f"{b['ops']}", b["rag"]
+        ])
+    
+    block_table = Table(block_table_data, colWidths=[0.5*inch, 1.5*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch])
+    block_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
+    ]))
+    elements.append(block_table)
+    
+    doc.build(elements)
+
+def build_dashboard_pdf(path: str, title: str, data: Dict[str, Any]):
+    """Dashboard PDF: KPI table plus a sample of the detailed rows"""
+    doc = SimpleDocTemplate(path, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=1, spaceAfter=15)
+    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=1, textColor=colors.grey)
+    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=12, spaceBefore=10, spaceAfter=8)
+    
+    elements = []
+    
+    # Title
+    elements.append(Paragraph(f"Maharashtra Education Dashboard - {title}", title_style))
+    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}", subtitle_style))
+    elements.append(Spacer(1, 15))
+    
+    # KPIs
+    if data.get("kpis"):
+        elements.append(Paragraph("Key Performance Indicators", heading_style))
+        kpi_data = [["Metric", "Value", "Status"]]
+        for kpi in data["kpis"][:10]:
+            kpi_data.append([kpi["name"], str(kpi["value"]), kpi.get("status", "-")])
+        
+        kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch, 1.5*inch])
+        kpi_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ]))
+        elements.append(kpi_table)
+        elements.append(Spacer(1, 15))
+    
+    # Data table
+    if data.get("headers") and data.get("rows"):
+        elements.append(Paragraph("Detailed Data", heading_style))
+        table_data = [data["headers"]] + data["rows"]
+        
+        col_width = min(1.2*inch, 10*inch / len(data["headers"]))
+        detail_table = Table(table_data, colWidths=[col_width] * len(data["headers"]))
+        detail_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1E3A5F")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
+        ]))
+        elements.append(detail_table)
+    
+    doc.build(elements)
+
+def zip_files(path: str, files: List[Tuple[str, str]]):
+    """Zip (archive name, file path) pairs into `path`"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arcname, file in files:
+            zf.write(file, arcname)
@@ -0,0 +1,123 @@
+"""Run one-time work in a single process when several API workers start.
+
+A task is claimed through a lease document in the `leader_leases` collection.
+The process that claims it runs the work (renewing the lease while it runs)
+and marks the task done; every other process polls until it is done instead
+of repeating the work. A crashed leader's lease simply expires and another
+process takes over.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LEASE_COLLECTION = "leader_leases"
+LEASE_SECONDS = float(os.environ.get("LEADER_LEASE_SECONDS", "30"))
+WAIT_TIMEOUT_SECONDS = float(os.environ.get("LEADER_WAIT_TIMEOUT_SECONDS", "300"))
+POLL_SECONDS = 0.5
+
+# Identifies this process as a lease owner
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def _claim(database, task: str, done_ttl: Optional[float]) -> bool:
+    now = datetime.now(timezone.utc)
+    not_done = {"status": {"$ne": "done"}}
+    if done_ttl is not None:
+        not_done = {"$or": [not_done, {"finished_at": {"$lt": now - timedelta(seconds=done_ttl)}}]}
+    try:
+        await database[LEASE_COLLECTION].find_one_and_update(
+            {"_id": task, "lease_expires_at": {"$lt": now}, **not_done},
+            {"$set": {
+                "owner": OWNER,
+                "status": "running",
+                "started_at": now,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return True
+    except DuplicateKeyError:
+        # The task document exists but is held by someone else or already done
+        return False
+
+
+async def _renew(database, task: str):
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            await database[LEASE_COLLECTION].update_one(
+                {"_id": task, "owner": OWNER},
+                {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)}},
+            )
+        except Exception as e:
+            logger.warning(f"Could not renew lease for {task}: {str(e)}")
+
+
+async def _finish(database, task: str, status: str):
+    now = datetime.now(timezone.utc)
+    await database[LEASE_COLLECTION].update_one(
+        {"_id": task, "owner": OWNER},
+        {"$set": {"status": status, "finished_at": now, "lease_expires_at": now}},
+    )
+
+
+async def _is_done(database, task: str, done_ttl: Optional[float]) -> bool:
+    doc = await database[LEASE_COLLECTION].find_one({"_id": task}, {"status": 1, "finished_at": 1})
+    if not doc or doc.get("status") != "done":
+        return False
+    if done_ttl is None:
+        return True
+    finished_at = doc.get("finished_at")
+    if finished_at is not None and finished_at.tzinfo is None:
+        finished_at = finished_at.replace(tzinfo=timezone.utc)
+    return finished_at is not None and finished_at >= datetime.now(timezone.utc) - timedelta(seconds=done_ttl)
+
+
+async def run_once(
+    database,
+    task: str,
+    work: Callable[[], Awaitable[None]],
+    done_ttl: Optional[float] = None,
+    wait_timeout: float = None,
+) -> bool:
+    """Run `work` in exactly one process; the others wait for it to finish.
+
+    A finished task is not run again while it is younger than `done_ttl`
+    seconds (forever when None). Returns True if this process ran the work.
+    Failures in the work are raised to the leader only; waiters then retry the
+    claim so another process can take over.
+    """
+    wait_timeout = WAIT_TIMEOUT_SECONDS if wait_timeout is None else wait_timeout
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait_timeout
+
+    while True:
+        if await _claim(database, task, done_ttl):
+            renewer = asyncio.create_task(_renew(database, task))
+            try:
+                await work()
+            except Exception:
+                await _finish(database, task, "failed")
+                raise
+            finally:
+                renewer.cancel()
+            await _finish(database, task, "done")
+            logger.info(f"Leader task {task} completed by {OWNER}")
+            return True
+
+        if await _is_done(database, task, done_ttl):
+            return False
+        if loop.time() >= deadline:
+            logger.warning(f"Timed out waiting for leader task {task}; continuing without it")
+            return False
+        await asyncio.sleep(POLL_SECONDS)
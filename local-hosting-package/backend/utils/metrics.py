@@ -0,0 +1,55 @@
+"""Derived per-school metrics stored on the analytics documents.
+
+Ratios such as an exception rate or a pending count used to be computed in a
+`$project` stage and then sorted, which forces a full collection scan per
+top-N request. Routers register those expressions here; they are written onto
+every document at the end of each import (one server-side update pass), and
+(scope, metric) indexes let top-N reads walk the index and stop after N rows.
+"""
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Index prefixes for the drilldown scopes (state, district, block)
+SCOPE_PREFIXES = ([], ["district_code"], ["block_code"])
+
+_registry: Dict[str, Dict[str, Any]] = {}
+
+# CTET qualified teacher: imports store the code 1 (2 = no, 9 = unknown), older
+# data a boolean. Every dashboard and export counts with this one predicate.
+CTET_QUALIFIED = {"$in": ["$ctet_qualified", [1, True]]}
+
+
+def register(collection: str, fields: Dict[str, Any], indexed: List[str]):
+    """Declare derived `fields` (aggregation expressions) and the metrics to index for `collection`"""
+    _registry[collection] = {"fields": fields, "indexed": indexed}
+
+
+async def materialize(database, collection: str, only_missing: bool = False):
+    """Write the registered derived fields onto the collection's documents; never raises"""
+    spec = _registry[collection]
+    if not spec["fields"]:
+        return
+    query = {"$or": [{name: {"$exists": False}} for name in spec["fields"]]} if only_missing else {}
+    try:
+        result = await database[collection].update_many(query, [{"$set": spec["fields"]}])
+        if result.modified_count:
+            logger.info(f"Derived metrics stored on {result.modified_count} {collection} documents")
+    except Exception as e:
+        logger.error(f"Failed to store derived metrics on {collection}: {str(e)}")
+
+
+async def materialize_all(database, only_missing: bool = False):
+    """Materialize every registered collection (e.g. after the standalone ETL reloaded them)"""
+    for collection in _registry:
+        await materialize(database, collection, only_missing=only_missing)
+
+
+async def ensure_indexes(database):
+    """Create the (scope, metric) indexes and backfill documents imported before a metric existed"""
+    for collection, spec in _registry.items():
+        for metric in spec["indexed"]:
+            for prefix in SCOPE_PREFIXES:
+                await database[collection].create_index([*((field, 1) for field in prefix), (metric, -1)])
+    await materialize_all(database, only_missing=True)
@@ -0,0 +1,165 @@
+"""Motor client construction.
+
+Connection pool size, timeouts, wire compression and read preference come from
+the environment so the number of API workers can be scaled without code
+changes. Unset variables keep the driver defaults, except compression which
+defaults to zstd (falling back to zlib) because dashboard aggregations return
+large, highly compressible result sets.
+
+A connection-pool listener keeps live pool statistics (open and checked-out
+connections, checkout wait times) for the health endpoint.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+DEFAULT_COMPRESSORS = "zstd,zlib"
+
+# env var -> (MongoClient option, converter)
+CLIENT_OPTION_ENV = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_COMPRESSORS": ("compressors", str),  # e.g. "zstd,snappy,zlib"; "none" disables
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+    "MONGO_READ_PREFERENCE": ("readPreference", str),  # e.g. "secondaryPreferred"
+}
+
+
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword options configured through the environment"""
+    options = {"compressors": DEFAULT_COMPRESSORS}
+    for env, (option, convert) in CLIENT_OPTION_ENV.items():
+        value = os.environ.get(env, "").strip()
+        if value:
+            options[option] = convert(value)
+    if options["compressors"].lower() == "none":
+        del options["compressors"]
+    return options
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Aggregates connection-pool events per server address.
+
+    pymongo emits checkout-started and checked-out/failed from the same
+    thread, so the wait time is measured with a thread-local start stamp.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _key(address) -> str:
+        return f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+
+    def _pool(self, address) -> Dict[str, Any]:
+        key = self._key(address)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open_connections": 0,
+                "checked_out": 0,
+                "max_checked_out": 0,
+                "checkouts": 0,
+                "checkout_failures": {},
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+                "pool_clears": 0,
+            }
+        return pool
+
+    def _waited_ms(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(self._key(event.address), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)["open_connections"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open_connections"] = max(0, pool["open_connections"] - 1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited_ms()
+        with self._lock:
+            pool = self._pool(event.address)
+            failures = pool["checkout_failures"]
+            failures[event.reason] = failures.get(event.reason, 0) + 1
+            pool["wait_ms_max"] = max(pool["wait_ms_max"], waited)
+
+    def connection_checked_out(self, event):
+        waited = self._waited_ms()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checkouts"] += 1
+            pool["checked_out"] += 1
+            pool["max_checked_out"] = max(pool["max_checked_out"], pool["checked_out"])
+            pool["wait_ms_total"] += waited
+            pool["wait_ms_max"] = max(pool["wait_ms_max"], waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = {}
+            for address, pool in self._pools.items():
+                stats = dict(pool, checkout_failures=dict(pool["checkout_failures"]))
+                stats["wait_ms_avg"] = round(pool["wait_ms_total"] / max(pool["checkouts"], 1), 3)
+                stats["wait_ms_max"] = round(pool["wait_ms_max"], 3)
+                del stats["wait_ms_total"]
+                pools[address] = stats
+            return pools
+
+
+pool_stats = PoolStatsListener()
+
+
+def describe() -> Dict[str, Any]:
+    """Client configuration and live pool statistics for the health endpoint"""
+    return {"options": client_options(), "pools": pool_stats.snapshot()}
+
+
+def create_client(mongo_url: str = None) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url or os.environ["MONGO_URL"],
+        event_listeners=[pool_stats],
+        **client_options(),
+    )
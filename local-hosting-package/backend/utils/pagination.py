@@ -0,0 +1,68 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token carrying the sort value and tie-breaker
+of the last row on the previous page. The next page is fetched with a range
+match on (sort field, tie-breaker) instead of skip/offset, so deep pages cost
+the same as the first one when the pair is indexed.
+"""
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, tiebreak_value: Any) -> str:
+    raw = json.dumps([sort_value, tiebreak_value], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, tiebreak_value = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, tiebreak_value
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def sort_spec(sort_field: str, sort_order: str, tiebreak_field: str) -> List[Tuple[str, int]]:
+    """Sort on the requested field with a unique tie-breaker in the same direction"""
+    direction = -1 if sort_order == "desc" else 1
+    if sort_field == tiebreak_field:
+        return [(sort_field, direction)]
+    return [(sort_field, direction), (tiebreak_field, direction)]
+
+
+def keyset_match(
+    cursor: Optional[str],
+    sort_field: str,
+    sort_order: str,
+    tiebreak_field: str,
+) -> Dict[str, Any]:
+    """Build the $match that resumes after the row encoded in `cursor`"""
+    if not cursor:
+        return {}
+    sort_value, tiebreak_value = decode_cursor(cursor)
+    op = "$lt" if sort_order == "desc" else "$gt"
+    if sort_field == tiebreak_field:
+        return {sort_field: {op: sort_value}}
+    return {
+        "$or": [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, tiebreak_field: {op: tiebreak_value}},
+        ]
+    }
+
+
+def validate_sort(sort_by: str, sort_order: str, allowed_fields) -> None:
+    """Reject unknown sort fields/orders with a 400 instead of silently ignoring them"""
+    if sort_by not in allowed_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort_by '{sort_by}'. Allowed: {', '.join(sorted(allowed_fields))}",
+        )
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort_order must be 'asc' or 'desc'")
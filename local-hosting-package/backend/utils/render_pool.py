@@ -0,0 +1,83 @@
+"""Bounded worker pool for CPU-heavy export rendering.
+
+ReportLab layout and openpyxl serialization are pure CPU work; run inline they
+stall the event loop for every other dashboard user. Renders go to a small
+process pool instead (EXPORT_RENDER_WORKERS processes per API worker, 0 to use
+the thread pool), and each user may only have EXPORT_USER_CONCURRENCY renders
+in flight at a time.
+
+Functions submitted here must be importable top-level callables taking
+picklable arguments (see utils.export_render).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.environ.get("EXPORT_RENDER_WORKERS", "2"))
+USER_CONCURRENCY = int(os.environ.get("EXPORT_USER_CONCURRENCY", "2"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_user_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: never fork a process that holds Motor's threads and sockets
+        _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+async def run(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run `fn(*args)` in the render pool and return its result"""
+    global _executor
+    if RENDER_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool for the next render
+        logger.error("Export render pool broke; recreating it")
+        _executor = None
+        raise
+
+
+def _slot(user: str) -> asyncio.Semaphore:
+    return _user_slots.setdefault(user, asyncio.Semaphore(USER_CONCURRENCY))
+
+
+def check_capacity(user: str):
+    """Raise 429 when `user` already has the maximum number of renders in flight"""
+    if _slot(user).locked():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many exports in progress; wait for one to finish",
+            headers={"Retry-After": "10"},
+        )
+
+
+@asynccontextmanager
+async def user_slot(user: str, wait: bool = False):
+    """Hold one of the user's render slots; without `wait` a full user gets a 429"""
+    if not wait:
+        check_capacity(user)
+    async with _slot(user):
+        yield
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,182 @@
+"""In-memory cache of public dashboard GET responses.
+
+Dashboard widgets only change when an import lands, so a response is a
+function of (dataset generation, path, query string). Successful JSON
+responses of the public /api routes are kept per worker together with their
+compressed encodings (added the first time a client asks for one), and a
+repeat hit skips the aggregation, the JSON encoding and the compression.
+
+Entries of older generations are dropped when the dataset changes, and the
+total size is bounded by RESPONSE_CACHE_MAX_MB (least recently used first).
+"""
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils import compression, dataset_state
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the cache
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Larger responses are not worth holding in every worker
+MAX_ENTRY_BYTES = RESPONSE_CACHE_MAX_BYTES // 16
+
+# Authenticated, per-user or file routes are never cached
+UNCACHED_PREFIXES = ("/api/auth", "/api/export", "/api/analytics", "/api/health")
+
+# Response headers kept with an entry (encoding headers are set per hit)
+_KEPT_HEADERS = ("content-type", "x-next-cursor")
+
+
+class _Entry:
+    __slots__ = ("headers", "bodies")
+
+    def __init__(self, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.headers = headers
+        # Encoding ("identity", "br", "gzip") -> bytes
+        self.bodies: Dict[str, bytes] = {"identity": body}
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.bodies.values())
+
+
+_entries: "OrderedDict[Tuple[int, str, str], _Entry]" = OrderedDict()
+_size = 0
+
+
+def enabled() -> bool:
+    return RESPONSE_CACHE_MAX_BYTES > 0
+
+
+def cacheable(scope: Scope) -> bool:
+    path = scope["path"]
+    return (
+        enabled()
+        and scope["type"] == "http"
+        and scope["method"] == "GET"
+        and path.startswith("/api/")
+        and not path.startswith(UNCACHED_PREFIXES)
+    )
+
+
+def request_key(scope: Scope) -> Tuple[Optional[int], str, str]:
+    """(ready dataset generation, path, normalized query string) of a request.
+
+    Keyed on dataset_state.ready_generation(): while the change hooks of a new
+    import still run, rollups and snapshots hold the previous import's numbers.
+    """
+    query = scope.get("query_string", b"").decode("latin-1")
+    return dataset_state.ready_generation(), scope["path"], "&".join(sorted(query.split("&"))) if query else ""
+
+
+def _store(key: Tuple[int, str, str], entry: _Entry):
+    global _size
+    old = _entries.pop(key, None)
+    if old is not None:
+        _size -= old.size
+    _entries[key] = entry
+    _size += entry.size
+    while _size > RESPONSE_CACHE_MAX_BYTES and len(_entries) > 1:
+        _, evicted = _entries.popitem(last=False)
+        _size -= evicted.size
+
+
+def _encoded(key: Tuple[int, str, str], entry: _Entry, encoding: Optional[str]) -> Tuple[str, bytes]:
+    """The entry's body in `encoding` (compressed and kept on first use), or identity"""
+    global _size
+    identity = entry.bodies["identity"]
+    if encoding is None or len(identity) < compression.COMPRESSION_MIN_BYTES:
+        return "identity", identity
+    body = entry.bodies.get(encoding)
+    if body is None:
+        body = compression.compress(identity, encoding)
+        entry.bodies[encoding] = body
+        if key in _entries:
+            _size += len(body)
+            _store(key, entry)
+    return encoding, body
+
+
+async def _send_entry(send: Send, key: Tuple[int, str, str], entry: _Entry, encoding: Optional[str]):
+    encoding, body = _encoded(key, entry, encoding)
+    headers = MutableHeaders(raw=list(entry.headers))
+    if encoding == "identity":
+        headers["Content-Length"] = str(len(body))
+    else:
+        compression.set_encoding(headers, encoding, len(body))
+    await send({"type": "http.response.start", "status": 200, "headers": headers.raw})
+    await send({"type": "http.response.body", "body": body})
+
+
+def clear():
+    global _size
+    _entries.clear()
+    _size = 0
+
+
+async def purge_stale():
+    """Dataset change hook: drop entries of other generations"""
+    global _size
+    current = dataset_state.generation()
+    for key in [key for key in _entries if key[0] != current]:
+        _size -= _entries.pop(key).size
+
+
+class ResponseCacheMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not cacheable(scope) or not dataset_state.ready():
+            # Nothing is cached while change hooks run (responses may mix generations)
+            await self.app(scope, receive, send)
+            return
+
+        key = request_key(scope)
+        encoding = compression.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            await _send_entry(send, key, entry, encoding)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def capture(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = Headers(raw=start["headers"])
+            if (
+                start["status"] != 200
+                or message.get("more_body", False)
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith("application/json")
+                or len(body) > MAX_ENTRY_BYTES
+            ):
+                # Streams, errors and odd responses go out as they are
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            entry = _Entry([(k, v) for k, v in start["headers"] if k.decode("latin-1") in _KEPT_HEADERS], body)
+            if dataset_state.ready() and key[0] == dataset_state.ready_generation():
+                _store(key, entry)
+            await _send_entry(send, key, entry, encoding)
+
+        await self.app(scope, receive, capture)
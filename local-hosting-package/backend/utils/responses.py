@@ -0,0 +1,95 @@
+"""JSON encoding for API responses.
+
+Dashboard payloads run to several MB (executive insights, block-wise arrays,
+school lists). FastAPI's default path walks every payload through
+`jsonable_encoder` and then encodes it again with the stdlib `json` module;
+orjson does the same work in one pass, several times faster.
+
+Every type that can reach a response is handled here: datetimes (naive ones
+come from Mongo and are UTC), ObjectId, Decimal, numpy scalars/arrays and
+Pydantic models.
+"""
+import asyncio
+import functools
+import inspect
+from decimal import Decimal
+from typing import Any, Callable
+
+import orjson
+from bson import ObjectId
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        # datetime subclasses orjson does not take natively (e.g. pandas.Timestamp)
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        # numpy scalars of dtypes orjson does not serialize
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=JSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class of the API (see server.py)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _takes_response(endpoint: Callable[..., Any]) -> bool:
+    return any(
+        inspect.isclass(param.annotation) and issubclass(param.annotation, Response)
+        for param in inspect.signature(endpoint).parameters.values()
+    )
+
+
+class ORJSONRoute(APIRoute):
+    """Route that hands plain dict/list results straight to ORJSONResponse.
+
+    Routes without a response_model have nothing to validate, yet FastAPI
+    would still run their result through `jsonable_encoder` first. Routes with
+    a response_model, sync endpoints and endpoints that set headers on an
+    injected Response keep FastAPI's regular handling.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        response_model = kwargs.get("response_model")
+        if (
+            (response_model is None or isinstance(response_model, DefaultPlaceholder))
+            and asyncio.iscoroutinefunction(endpoint)
+            and not _takes_response(endpoint)
+            and not getattr(endpoint, "_encodes_result", False)
+        ):
+            endpoint = _encode_result(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _encode_result(endpoint: Callable[..., Any], status_code: int) -> Callable[..., Any]:
+    @functools.wraps(endpoint)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return ORJSONResponse(result, status_code=status_code)
+
+    # include_router re-creates routes from the already wrapped endpoint
+    wrapper._encodes_result = True
+    return wrapper
@@ -0,0 +1,360 @@
+"""School Health Index (SHI) scoring.
+
+SHI is a weighted sum of five component scores (each 0-100):
+
+    identity (25%) + infrastructure (25%) + teacher (20%)
+    + operational (20%) + age integrity (10%)
+
+The component formulas are vectorized with NumPy so the whole schools
+collection can be rescored in one batch after an import; the scalar
+`calculate_shi` used for ad-hoc/mock data goes through the same code path.
+Per-school results are persisted on the school documents (`shi_score`,
+`shi_components`, `rag_status`) so endpoints read and sort indexed values.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ["identity", "infrastructure", "teacher", "operational", "age_integrity"]
+
+DEFAULT_WEIGHTS = {
+    "identity": 0.25,
+    "infrastructure": 0.25,
+    "teacher": 0.20,
+    "operational": 0.20,
+    "age_integrity": 0.10,
+}
+
+# Age integrity is not measured per school yet; every school gets this score
+DEFAULT_AGE_INTEGRITY = 90.0
+
+# Fields needed from a school document to score it
+SCHOOL_SCORE_FIELDS = [
+    "total_students", "total_teachers", "classrooms",
+    "aadhaar_percentage", "apaar_percentage",
+    "water_available", "toilets_available", "certified",
+]
+
+# Identity fields kept alongside the component matrix for what-if rankings
+SCHOOL_LABEL_FIELDS = ["udise_code", "school_name", "district_code", "district_name", "block_code", "block_name"]
+
+WRITE_BATCH_SIZE = 5000
+
+
+def weight_vector(weights: Dict[str, float] = None) -> np.ndarray:
+    """Weights as an array aligned with COMPONENTS"""
+    weights = weights or DEFAULT_WEIGHTS
+    return np.array([float(weights.get(c, 0.0)) for c in COMPONENTS], dtype=np.float64)
+
+
+def component_scores(
+    aadhaar_pct: np.ndarray,
+    apaar_pct: np.ndarray,
+    water_available: np.ndarray,
+    toilets_available: np.ndarray,
+    students_per_classroom: np.ndarray,
+    ptr: np.ndarray,
+    certified: np.ndarray,
+) -> np.ndarray:
+    """Compute the (n, 5) component score matrix, columns ordered as COMPONENTS"""
+    identity = aadhaar_pct * 0.5 + apaar_pct * 0.3 + 100 * 0.2
+
+    water = np.where(water_available, 100.0, 0.0)
+    toilet = np.where(toilets_available, 100.0, 0.0)
+    classroom = np.minimum(100.0, (40.0 / np.maximum(students_per_classroom, 1.0)) * 100.0)
+    infrastructure = water * 0.4 + toilet * 0.3 + classroom * 0.3
+
+    teacher = np.minimum(100.0, (30.0 / np.maximum(ptr, 1.0)) * 100.0)
+    operational = np.where(certified, 100.0, 50.0)
+    age_integrity = np.full(len(identity), DEFAULT_AGE_INTEGRITY)
+
+    return np.column_stack([identity, infrastructure, teacher, operational, age_integrity])
+
+
+def combine(components: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """Weighted SHI per row, clipped to 0-100 and rounded to one decimal"""
+    if weights is None:
+        weights = weight_vector()
+    return np.round(np.clip(components @ weights, 0.0, 100.0), 1)
+
+
+def rag_bands(shi: np.ndarray) -> np.ndarray:
+    """Vectorized get_rag_status"""
+    return np.where(shi >= 85, "green", np.where(shi >= 50, "amber", "red"))
+
+
+def calculate_shi(school_data: dict) -> float:
+    """Calculate School Health Index (0-100) for a single school/aggregate"""
+    components = component_scores(
+        np.array([school_data.get("aadhaar_percentage", 0)], dtype=np.float64),
+        np.array([school_data.get("apaar_percentage", 0)], dtype=np.float64),
+        np.array([bool(school_data.get("water_available", True))]),
+        np.array([bool(school_data.get("toilets_available", True))]),
+        np.array([school_data.get("students_per_classroom", 40)], dtype=np.float64),
+        np.array([school_data.get("ptr", 30)], dtype=np.float64),
+        np.array([bool(school_data.get("certified", False))]),
+    )
+    return float(combine(components)[0])
+
+
+def get_rag_status(shi_score: float) -> str:
+    """Get RAG status based on SHI score"""
+    if shi_score >= 85:
+        return "green"
+    elif shi_score >= 50:
+        return "amber"
+    else:
+        return "red"
+
+
+def school_inputs(docs: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Column arrays (with the same defaults the API uses) from raw school docs"""
+    n = len(docs)
+
+    def col(field, default, dtype=np.float64):
+        return np.fromiter(
+            ((d.get(field) if d.get(field) is not None else default) for d in docs),
+            dtype=dtype, count=n,
+        )
+
+    total_students = col("total_students", 0)
+    total_teachers = col("total_teachers", 1)
+    classrooms = col("classrooms", 1)
+    return {
+        "ptr": np.round(total_students / np.maximum(total_teachers, 1), 1),
+        "students_per_classroom": np.round(total_students / np.maximum(classrooms, 1), 1),
+        "aadhaar_pct": col("aadhaar_percentage", 0),
+        "apaar_pct": col("apaar_percentage", 0),
+        "water_available": col("water_available", True, bool),
+        "toilets_available": col("toilets_available", True, bool),
+        "certified": col("certified", False, bool),
+    }
+
+
+async def recompute_school_scores(db, generation: int = 0) -> int:
+    """Rescore every school in one vectorized batch and persist the results.
+
+    Returns the number of schools scored.
+    """
+    projection = {field: 1 for field in SCHOOL_SCORE_FIELDS + SCHOOL_LABEL_FIELDS}
+    docs = await db.schools.find({}, projection).batch_size(WRITE_BATCH_SIZE).to_list(length=None)
+    if not docs:
+        return 0
+
+    inputs = school_inputs(docs)
+    components = component_scores(
+        inputs["aadhaar_pct"], inputs["apaar_pct"],
+        inputs["water_available"], inputs["toilets_available"],
+        inputs["students_per_classroom"], inputs["ptr"], inputs["certified"],
+    )
+    shi = combine(components)
+    rag = rag_bands(shi)
+    rounded_components = np.round(components, 1)
+
+    now = datetime.now(timezone.utc)
+    ops = []
+    for i, doc in enumerate(docs):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "ptr": float(inputs["ptr"][i]),
+            "students_per_classroom": float(inputs["students_per_classroom"][i]),
+            "shi_score": float(shi[i]),
+            "rag_status": str(rag[i]),
+            "shi_components": dict(zip(COMPONENTS, rounded_components[i].tolist())),
+            "shi_generation": generation,
+            "shi_updated_at": now,
+        }}))
+        if len(ops) >= WRITE_BATCH_SIZE:
+            await db.schools.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await db.schools.bulk_write(ops, ordered=False)
+
+    # Built from the persisted (rounded) values so every worker sees the same matrix
+    set_score_matrix(ScoreMatrix(rounded_components, docs, generation))
+    logger.info(f"SHI recomputed for {len(docs)} schools (generation {generation})")
+    return len(docs)
+
+
+async def load_score_matrix(db, generation: int = 0) -> Optional["ScoreMatrix"]:
+    """Build the what-if matrix from persisted component scores (no rescoring)"""
+    projection = {"shi_components": 1, **{field: 1 for field in SCHOOL_LABEL_FIELDS}}
+    cursor = db.schools.find({"shi_components": {"$exists": True}}, projection).batch_size(WRITE_BATCH_SIZE)
+    docs = await cursor.to_list(length=None)
+    if not docs:
+        return None
+    components = np.array(
+        [[float(d["shi_components"].get(c, 0.0)) for c in COMPONENTS] for d in docs],
+        dtype=np.float64,
+    )
+    return ScoreMatrix(components, docs, generation)
+
+
+# ============= WHAT-IF ANALYSIS =============
+
+class ScoreMatrix:
+    """Columnar in-memory copy of every school's component scores.
+
+    Lets planners try alternative SHI weights: rescoring all schools is a
+    single (n, 5) @ (5,) product plus bincount group-bys, with no Mongo I/O.
+    """
+
+    def __init__(self, components: np.ndarray, docs: List[Dict[str, Any]], generation: int = 0):
+        self.generation = generation
+        self.components = np.ascontiguousarray(components, dtype=np.float64)
+        self.udise_codes = np.array([str(d.get("udise_code") or "") for d in docs], dtype=object)
+        self.school_names = np.array([d.get("school_name") or "" for d in docs], dtype=object)
+
+        district_keys = [(str(d.get("district_code") or ""), d.get("district_name") or "") for d in docs]
+        block_keys = [(str(d.get("block_code") or ""), d.get("block_name") or "", str(d.get("district_code") or "")) for d in docs]
+        self.districts, self.district_idx = self._encode(district_keys)
+        self.blocks, self.block_idx = self._encode(block_keys)
+
+        self.baseline_shi = combine(self.components)
+
+    @staticmethod
+    def _encode(keys: list):
+        """Categorical-encode label tuples -> (unique labels, int32 codes)"""
+        lookup: Dict[tuple, int] = {}
+        codes = np.fromiter((lookup.setdefault(k, len(lookup)) for k in keys), dtype=np.int32, count=len(keys))
+        labels = [None] * len(lookup)
+        for k, i in lookup.items():
+            labels[i] = k
+        return labels, codes
+
+    def __len__(self):
+        return len(self.udise_codes)
+
+    def _group_means(self, values: np.ndarray, idx: np.ndarray, size: int, mask: np.ndarray = None):
+        if mask is not None:
+            values, idx = values[mask], idx[mask]
+        counts = np.bincount(idx, minlength=size)
+        sums = np.bincount(idx, weights=values, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return means, counts
+
+    @staticmethod
+    def _ranks(means: np.ndarray) -> np.ndarray:
+        """1-based rank by descending mean (groups without schools rank last)"""
+        order = np.argsort(np.where(np.isnan(means), -np.inf, -means), kind="stable")
+        ranks = np.empty(len(means), dtype=np.int64)
+        ranks[order] = np.arange(1, len(means) + 1)
+        return ranks
+
+    def _school_rows(self, rows: np.ndarray, shi: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                "udise_code": self.udise_codes[i],
+                "school_name": self.school_names[i],
+                "district_code": self.districts[self.district_idx[i]][0],
+                "block_code": self.blocks[self.block_idx[i]][0],
+                "block_name": self.blocks[self.block_idx[i]][1],
+                "shi_score": float(shi[i]),
+                "baseline_shi_score": float(self.baseline_shi[i]),
+                "rag_status": get_rag_status(float(shi[i])),
+            }
+            for i in rows
+        ]
+
+    def what_if(self, weights: Dict[str, float], district_code: Optional[str] = None, top_n: int = 10) -> Dict[str, Any]:
+        """Rescore, re-band and re-rank all schools under alternative weights"""
+        w = weight_vector(weights)
+        total = w.sum()
+        if total <= 0:
+            raise ValueError("At least one SHI weight must be positive")
+        w = w / total
+
+        shi = combine(self.components, w)
+        mask = None
+        if district_code:
+            d_rows = [i for i, (code, _) in enumerate(self.districts) if code == district_code]
+            mask = np.isin(self.district_idx, d_rows)
+
+        scoped_shi = shi if mask is None else shi[mask]
+        scoped_base = self.baseline_shi if mask is None else self.baseline_shi[mask]
+        new_band = rag_bands(scoped_shi)
+        old_band = rag_bands(scoped_base)
+
+        # District rankings are always statewide so a district can see where it lands
+        d_means, d_counts = self._group_means(shi, self.district_idx, len(self.districts))
+        d_base, _ = self._group_means(self.baseline_shi, self.district_idx, len(self.districts))
+        d_rank, d_base_rank = self._ranks(d_means), self._ranks(d_base)
+        district_rankings = sorted(
+            (
+                {
+                    "rank": int(d_rank[i]),
+                    "baseline_rank": int(d_base_rank[i]),
+                    "rank_change": int(d_base_rank[i] - d_rank[i]),
+                    "district_code": code,
+                    "district_name": name,
+                    "total_schools": int(d_counts[i]),
+                    "avg_shi": round(float(d_means[i]), 1),
+                    "baseline_avg_shi": round(float(d_base[i]), 1),
+                }
+                for i, (code, name) in enumerate(self.districts) if d_counts[i] > 0
+            ),
+            key=lambda r: r["rank"],
+        )
+
+        b_means, b_counts = self._group_means(shi, self.block_idx, len(self.blocks), mask)
+        b_base, _ = self._group_means(self.baseline_shi, self.block_idx, len(self.blocks), mask)
+        b_rank, b_base_rank = self._ranks(b_means), self._ranks(b_base)
+        block_rankings = sorted(
+            (
+                {
+                    "rank": int(b_rank[i]),
+                    "baseline_rank": int(b_base_rank[i]),
+                    "rank_change": int(b_base_rank[i] - b_rank[i]),
+                    "block_code": code,
+                    "block_name": name,
+                    "district_code": d_code,
+                    "total_schools": int(b_counts[i]),
+                    "avg_shi": round(float(b_means[i]), 1),
+                    "baseline_avg_shi": round(float(b_base[i]), 1),
+                }
+                for i, (code, name, d_code) in enumerate(self.blocks) if b_counts[i] > 0
+            ),
+            key=lambda r: r["rank"],
+        )
+
+        rows = np.arange(len(shi)) if mask is None else np.flatnonzero(mask)
+        n = min(top_n, len(rows))
+        top_rows, bottom_rows = rows[:0], rows[:0]
+        if n:
+            top_part = rows[np.argpartition(-scoped_shi, n - 1)[:n]]
+            bottom_part = rows[np.argpartition(scoped_shi, n - 1)[:n]]
+            top_rows = top_part[np.argsort(-shi[top_part], kind="stable")]
+            bottom_rows = bottom_part[np.argsort(shi[bottom_part], kind="stable")]
+
+        return {
+            "weights": dict(zip(COMPONENTS, np.round(w, 4).tolist())),
+            "summary": {
+                "total_schools": int(len(scoped_shi)),
+                "avg_shi": round(float(scoped_shi.mean()), 1) if len(scoped_shi) else 0.0,
+                "baseline_avg_shi": round(float(scoped_base.mean()), 1) if len(scoped_base) else 0.0,
+                "rag_distribution": {band: int((new_band == band).sum()) for band in ("green", "amber", "red")},
+                "baseline_rag_distribution": {band: int((old_band == band).sum()) for band in ("green", "amber", "red")},
+                "schools_changed_band": int((new_band != old_band).sum()),
+            },
+            "district_rankings": district_rankings,
+            "block_rankings": block_rankings,
+            "top_schools": self._school_rows(top_rows, shi),
+            "bottom_schools": self._school_rows(bottom_rows, shi),
+        }
+
+
+_score_matrix: Optional[ScoreMatrix] = None
+
+
+def set_score_matrix(matrix: Optional[ScoreMatrix]):
+    global _score_matrix
+    _score_matrix = matrix
+
+
+def get_score_matrix() -> Optional[ScoreMatrix]:
+    return _score_matrix
@@ -0,0 +1,387 @@
+"""In-process columnar snapshots of the analytics collections.
+
+After every import each analytics collection that a router registered (see
+`register`) is loaded into a pandas
+DataFrame (numeric columns as NumPy arrays, district/block encoded as
+categoricals). Dashboards whose queries are plain scope filters, group-bys
+and top-N can answer from the snapshot with array operations instead of
+running a Mongo aggregation.
+
+A snapshot is only served while it matches the current dataset generation;
+during a reload (or when disabled/too large) `get` returns None and callers
+fall back to Mongo. Frames are shared between worker processes through
+memory-mapped files (see SHARED ON-DISK SNAPSHOTS below).
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import dataset_state
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.environ.get("ANALYTICS_SNAPSHOT_ENABLED", "true").lower() in ("1", "true", "yes")
+SNAPSHOT_MAX_ROWS = int(os.environ.get("ANALYTICS_SNAPSHOT_MAX_ROWS", "250000"))
+
+# Where generations are published for sharing between workers; set to an empty
+# string to keep a private in-memory copy per process instead
+_snapshot_dir = os.environ.get(
+    "ANALYTICS_SNAPSHOT_DIR", str(Path(__file__).resolve().parents[2] / "data" / "snapshots")
+)
+SNAPSHOT_DIR = Path(_snapshot_dir) if _snapshot_dir else None
+
+# Collections some router reads from a snapshot; only these are loaded (see register)
+SNAPSHOT_COLLECTIONS: List[str] = []
+
+# Scope columns are normalized to strings; the repeated ones become categoricals
+SCOPE_FIELDS = ["district_code", "block_code", "udise_code"]
+CATEGORICAL_FIELDS = ["district_code", "district_name", "block_code", "block_name"]
+
+FETCH_BATCH_SIZE = 5000
+
+# Database will be injected
+db = None
+
+_snapshots: Dict[str, "Snapshot"] = {}
+
+
+def init_db(database):
+    global db
+    db = database
+
+
+def register(collection: str):
+    """Declare that a router answers from the snapshot of `collection`"""
+    if collection not in SNAPSHOT_COLLECTIONS:
+        SNAPSHOT_COLLECTIONS.append(collection)
+
+
+class Snapshot:
+    """One collection held as columns"""
+
+    def __init__(self, collection: str, frame: pd.DataFrame, generation: int):
+        self.collection = collection
+        self.frame = frame
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.frame)
+
+    def scoped(
+        self,
+        district_code: Optional[str] = None,
+        block_code: Optional[str] = None,
+        udise_code: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Rows matching the drilldown scope (same semantics as build_scope_match)"""
+        frame = self.frame
+        mask = None
+        for field, value in (("district_code", district_code), ("block_code", block_code), ("udise_code", udise_code)):
+            if not value:
+                continue
+            if field not in frame.columns:
+                return frame.iloc[0:0]
+            cond = (frame[field] == str(value)).to_numpy(dtype=bool, na_value=False)
+            mask = cond if mask is None else mask & cond
+        return frame if mask is None else frame[mask]
+
+
+def column(frame: pd.DataFrame, field: str) -> np.ndarray:
+    """Numeric column as an array; a missing column reads as zeros (like $sum)"""
+    if field not in frame.columns:
+        return np.zeros(len(frame), dtype=np.int64)
+    return frame[field].to_numpy()
+
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def sums(frame: pd.DataFrame, fields: Iterable[str]) -> Dict[str, Any]:
+    """Equivalent of {"$group": {"_id": None, field: {"$sum": "$field"}}}"""
+    return {field: _native(column(frame, field).sum()) for field in fields}
+
+
+def group_sums(
+    frame: pd.DataFrame,
+    by: str,
+    fields: Sequence[str],
+    count_field: Optional[str] = None,
+    first: Sequence[str] = (),
+    sort_by: Optional[str] = None,
+    descending: bool = True,
+    derived: Optional[Dict[str, np.ndarray]] = None,
+) -> List[Dict[str, Any]]:
+    """Equivalent of a $group on `by` with $sum / $first accumulators.
+
+    `derived` supplies computed per-row arrays (e.g. an $add of several fields)
+    that are summed like regular fields. Rows come back shaped like the Mongo
+    output (`_id` holds the group key) so routers can share their response
+    formatting between both paths.
+    """
+    if frame.empty:
+        return []
+    derived = derived or {}
+    keys = frame[by] if by in frame.columns else pd.Series([None] * len(frame), index=frame.index)
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    size = len(uniques)
+    _, first_pos = np.unique(codes, return_index=True)
+
+    groups: Dict[str, np.ndarray] = {}
+    for field in list(fields) + list(derived):
+        values = derived[field] if field in derived else column(frame, field)
+        totals = np.bincount(codes, weights=values, minlength=size)
+        groups[field] = np.rint(totals).astype(np.int64) if values.dtype.kind in "iub" else totals
+    if count_field:
+        groups[count_field] = np.bincount(codes, minlength=size)
+    for field in first:
+        if field in frame.columns:
+            groups[field] = frame[field].to_numpy(dtype=object)[first_pos]
+
+    order = np.arange(size)
+    if sort_by:
+        order = np.argsort(-groups[sort_by] if descending else groups[sort_by], kind="stable")
+
+    rows = []
+    for i in order:
+        key = uniques[i]
+        row = {"_id": None if pd.isna(key) else key}
+        row.update({name: _native(values[i]) for name, values in groups.items()})
+        rows.append(row)
+    return rows
+
+
+def top_n(values: np.ndarray, n: int, descending: bool = True) -> np.ndarray:
+    """Positions of the n largest (or smallest) values, ordered, via argpartition"""
+    n = min(n, len(values))
+    if n <= 0:
+        return np.array([], dtype=np.int64)
+    keyed = -values if descending else values
+    part = np.argpartition(keyed, n - 1)[:n]
+    return part[np.argsort(keyed[part], kind="stable")]
+
+
+def records(frame: pd.DataFrame, positions: np.ndarray, fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Selected rows as plain dicts (only the fields present in the snapshot)"""
+    present = [f for f in fields if f in frame.columns]
+    rows = frame.iloc[positions][present].astype(object).to_dict("records")
+    return [{k: _native(v) for k, v in row.items()} for row in rows]
+
+
+def _categorical(series: pd.Series) -> pd.Series:
+    """Text column as a categorical of strings (NaN kept as missing)"""
+    return series.where(series.isna(), series.astype(str)).astype("category")
+
+
+def _to_frame(docs: List[Dict[str, Any]]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(docs)
+    for name in frame.columns:
+        series = frame[name]
+        if name in SCOPE_FIELDS or name in CATEGORICAL_FIELDS:
+            frame[name] = _categorical(series)
+            continue
+        if pd.api.types.is_float_dtype(series.dtype):
+            frame[name] = series.fillna(0)
+            continue
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biumM":
+            continue
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().sum() != series.notna().sum():
+            frame[name] = _categorical(series)  # text column
+            continue
+        numeric = numeric.fillna(0)
+        if (numeric % 1 == 0).all():
+            numeric = numeric.astype(np.int64)
+        frame[name] = numeric
+    return frame
+
+
+async def _fetch_frame(collection: str) -> Optional[pd.DataFrame]:
+    """Read one collection from Mongo into a frame (None when empty or too large)"""
+    total = dataset_state.count(collection)
+    if total == 0 or total > SNAPSHOT_MAX_ROWS:
+        if total:
+            logger.info(f"Skipping snapshot of {collection}: {total} rows exceeds {SNAPSHOT_MAX_ROWS}")
+        return None
+
+    docs = []
+    async for doc in db[collection].find({}, {"_id": 0, "updated_at": 0}).batch_size(FETCH_BATCH_SIZE):
+        docs.append(doc)
+    return _to_frame(docs) if docs else None
+
+
+async def _fetch_all() -> Dict[str, pd.DataFrame]:
+    frames = {}
+    for collection in SNAPSHOT_COLLECTIONS:
+        try:
+            frame = await _fetch_frame(collection)
+        except Exception as e:
+            logger.error(f"Snapshot load failed for {collection}: {str(e)}")
+            continue
+        if frame is not None:
+            frames[collection] = frame
+    return frames
+
+
+# ============= SHARED ON-DISK SNAPSHOTS =============
+#
+# With several uvicorn workers each process would otherwise hold its own copy
+# of every frame. Instead one worker writes the frames of a generation as .npy
+# files (numeric columns raw, text columns as categorical codes) into
+# SNAPSHOT_DIR/gen-<n>-<generation id>, publishing the directory with an atomic rename. Every
+# worker then maps the files read-only, so the column data lives once in the OS
+# page cache. Generation directories are immutable; a new import produces a
+# new directory and older ones are pruned.
+
+MANIFEST_FILE = "manifest.json"
+LOCK_WAIT_SECONDS = float(os.environ.get("ANALYTICS_SNAPSHOT_LOCK_WAIT_SECONDS", "120"))
+
+
+def _generation_dir(generation: int, generation_id: str) -> Path:
+    """Directory for a generation. Every worker derives the same name from the
+    shared counter and the random id stored with it, and a reset database that
+    restarts the counter gets new ids, so it never maps a leftover directory."""
+    return SNAPSHOT_DIR / f"gen-{generation:06d}-{generation_id or 'initial'}"
+
+
+def _dir_generation(path: Path) -> Optional[int]:
+    """Generation number of a published directory name, None for anything else"""
+    try:
+        return int(path.name.split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _write_generation(target: Path, frames: Dict[str, pd.DataFrame]) -> bool:
+    """Write frames to a temp dir and rename it into place; False if another process won"""
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    manifest: Dict[str, Any] = {"collections": {}}
+    for c_index, (collection, frame) in enumerate(frames.items()):
+        columns = []
+        for index, name in enumerate(frame.columns):
+            series = frame[name]
+            filename = f"{c_index}_{index}.npy"
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                np.save(tmp / filename, series.array.codes)
+                columns.append({"name": name, "file": filename, "categories": [str(c) for c in series.cat.categories]})
+            else:
+                np.save(tmp / filename, series.to_numpy())
+                columns.append({"name": name, "file": filename})
+        manifest["collections"][collection] = {"rows": len(frame), "columns": columns}
+
+    with open(tmp / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f)
+    try:
+        os.rename(tmp, target)
+        return True
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+
+
+def _map_generation(path: Path) -> Dict[str, pd.DataFrame]:
+    """Memory-map every column of a published generation (read-only, zero copy)"""
+    with open(path / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    frames = {}
+    for collection, meta in manifest["collections"].items():
+        data = {}
+        for column_meta in meta["columns"]:
+            values = np.load(path / column_meta["file"], mmap_mode="r")
+            if "categories" in column_meta:
+                values = pd.Categorical.from_codes(values, column_meta["categories"], validate=False)
+            data[column_meta["name"]] = values
+        frames[collection] = pd.DataFrame(data, copy=False)
+    return frames
+
+
+def _prune(keep: Path, generation: int):
+    """Remove generations older than `generation`, and other directories of the
+    same number (left by a reset database). Pages stay valid for workers still
+    mapping them. Newer ones are left alone, so a worker that fell behind never
+    deletes a directory the others have moved on to."""
+    for path in SNAPSHOT_DIR.glob("gen-*"):
+        if path == keep or not path.is_dir() or ".tmp-" in path.name:
+            continue
+        number = _dir_generation(path)
+        if number is not None and number <= generation:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+async def _shared_frames(generation: int, generation_id: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """Frames for `generation` mapped from SNAPSHOT_DIR, writing them first if needed.
+
+    The first worker to take the generation's lock file reads Mongo and
+    publishes; the others wait for the directory to appear. Returns None when
+    the directory cannot be used so the caller keeps private frames instead.
+    """
+    target = _generation_dir(generation, generation_id)
+    lock = target.with_name(f"{target.name}.lock")
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not target.exists():
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            owner = True
+        except FileExistsError:
+            owner = False
+
+        if owner:
+            try:
+                frames = await _fetch_all()
+                await asyncio.to_thread(_write_generation, target, frames)
+            finally:
+                lock.unlink(missing_ok=True)
+        else:
+            waited = 0.0
+            while not target.exists() and lock.exists() and waited < LOCK_WAIT_SECONDS:
+                await asyncio.sleep(0.5)
+                waited += 0.5
+            if not target.exists():
+                logger.warning(f"Snapshot generation {generation} was not published by another worker")
+                return None
+
+    frames = await asyncio.to_thread(_map_generation, target)
+    _prune(target, generation)
+    return frames
+
+
+async def refresh_all():
+    """Rebuild every snapshot for the current generation (dataset change hook)"""
+    if not SNAPSHOT_ENABLED:
+        return
+    generation = dataset_state.generation()
+    frames = None
+    if SNAPSHOT_DIR:
+        try:
+            frames = await _shared_frames(generation, dataset_state.generation_id())
+        except Exception as e:
+            logger.warning(f"Shared snapshot unavailable, keeping a private copy: {str(e)}")
+    if frames is None:
+        frames = await _fetch_all()
+
+    _snapshots.clear()
+    for collection, frame in frames.items():
+        _snapshots[collection] = Snapshot(collection, frame, generation)
+    logger.info(f"Analytics snapshots loaded for generation {generation}: {len(frames)} collections")
+
+
+def get(collection: str) -> Optional[Snapshot]:
+    """Snapshot for `collection` if enabled and current, else None (use Mongo)"""
+    if not SNAPSHOT_ENABLED:
+        return None
+    snap = _snapshots.get(collection)
+    if snap is None or snap.generation != dataset_state.generation():
+        return None
+    return snap
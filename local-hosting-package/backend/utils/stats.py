@@ -0,0 +1,99 @@
+"""NumPy-backed statistics over lists of result rows.
+
+The insight builders work on lists of dicts (one per block/school). These
+helpers pull a field out once as a float array and answer percentiles,
+z-scores, top/bottom-k and grouped reductions in O(n) without re-sorting the
+full list for every question.
+"""
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def column(items: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    """Float array of `item[key]` (missing/None/"" as 0)"""
+    return np.fromiter((float(item.get(key, 0) or 0) for item in items), dtype=float, count=len(items))
+
+
+def percentile(values: Iterable[float], p: float) -> float:
+    arr = np.asarray(values, dtype=float)
+    if arr.size == 0:
+        return 0.0
+    return float(np.percentile(arr, p))
+
+
+def z_scores(values: Iterable[float]) -> np.ndarray:
+    """Population z-scores; all zeros when the spread is zero"""
+    arr = np.asarray(values, dtype=float)
+    if arr.size < 2:
+        return np.zeros(arr.size)
+    std = arr.std()
+    if std == 0.0:
+        return np.zeros(arr.size)
+    return (arr - arr.mean()) / std
+
+
+def top_k(values: Iterable[float], k: int, descending: bool = True) -> np.ndarray:
+    """Positions of the k largest (or smallest) values, best first.
+
+    Uses argpartition to find the k-th value, then orders only the candidates.
+    Ties keep their original order, matching a stable full sort.
+    """
+    keys = np.asarray(values, dtype=float)
+    if descending:
+        keys = -keys
+    k = min(int(k), keys.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < keys.size:
+        kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+        candidates = np.flatnonzero(keys <= kth)
+    else:
+        candidates = np.arange(keys.size)
+    order = np.lexsort((candidates, keys[candidates]))
+    return candidates[order[:k]]
+
+
+def top(items: Sequence[Dict[str, Any]], key: str, n: int = 5, values: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """The n items with the highest `key` (pass `values` to reuse an extracted column)"""
+    values = column(items, key) if values is None else values
+    return [items[i] for i in top_k(values, n)]
+
+
+def bottom(items: Sequence[Dict[str, Any]], key: str, n: int = 5, values: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """The n items with the lowest `key` (pass `values` to reuse an extracted column)"""
+    values = column(items, key) if values is None else values
+    return [items[i] for i in top_k(values, n, descending=False)]
+
+
+def group_reduce(
+    keys: Sequence[Hashable],
+    values: Optional[Iterable[float]] = None,
+    reducer: str = "sum",
+) -> Dict[Hashable, float]:
+    """Reduce `values` per distinct key ("sum", "mean", "max", "min" or "count").
+
+    Keys come back in first-seen order. Without `values` every row counts as
+    1, so the default gives row counts.
+    """
+    if len(keys) == 0:
+        return {}
+    codes, labels = pd.factorize(np.asarray(keys, dtype=object), use_na_sentinel=False)
+    arr = np.ones(len(keys)) if values is None else np.asarray(values, dtype=float)
+
+    if reducer in ("sum", "count", "mean"):
+        counts = np.bincount(codes, minlength=labels.size)
+        if reducer == "count":
+            reduced = counts.astype(float)
+        else:
+            reduced = np.bincount(codes, weights=arr, minlength=labels.size)
+            if reducer == "mean":
+                reduced = reduced / np.maximum(counts, 1)
+    elif reducer in ("max", "min"):
+        ufunc = np.maximum if reducer == "max" else np.minimum
+        reduced = np.full(labels.size, -np.inf if reducer == "max" else np.inf)
+        ufunc.at(reduced, codes, arr)
+    else:
+        raise ValueError(f"Unknown reducer '{reducer}'")
+    return dict(zip(labels.tolist(), reduced.tolist()))
@@ -7,6 +7,25 @@ import { Download, FileSpreadsheet, FileText, Loader2 } from "lucide-react";
 import { getBackendUrl } from "@/lib/backend";
 
 const BACKEND_URL = getBackendUrl();
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// Large exports are rendered as background jobs (HTTP 202): poll the job, then download the file
+const fetchExport = async (endpoint) => {
+  const response = await axios.get(endpoint, { responseType: "blob" });
+  if (response.status !== 202) {
+    return response;
+  }
+
+  let job = JSON.parse(await response.data.text());
+  while (job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    job = (await axios.get(`${BACKEND_URL}/api/export/jobs/${job.job_id}`)).data;
+  }
+  if (job.status !== "done") {
+    throw new Error(job.error || "Export job failed");
+  }
+  return fetchExport(`${BACKEND_URL}${job.download_url}`);
+};
 
 const ExportPanel = ({ dashboardName, dashboardTitle }) => {
   const [exporting, setExporting] = useState(null);
@@ -27,9 +46,7 @@ const ExportPanel = ({ dashboardName, dashboardTitle }) => {
         ? `${BACKEND_URL}/api/export/excel/${dashboardName}`
         : `${BACKEND_URL}/api/export/pdf/${dashboardName}`;
       
-      const response = await axios.get(endpoint, {
-        responseType: "blob"
-      });
+      const response = await fetchExport(endpoint);
       
       // Create download link
       const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -62,9 +79,7 @@ const ExportPanel = ({ dashboardName, dashboardTitle }) => {
         ? `${BACKEND_URL}/api/export/excel/executive-summary`
         : `${BACKEND_URL}/api/export/pdf/executive-summary`;
       
-      const response = await axios.get(endpoint, {
-        responseType: "blob"
-      });
+      const response = await fetchExport(endpoint);
       
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement("a");
@@ -83,6 +98,33 @@ const ExportPanel = ({ dashboardName, dashboardTitle }) => {
     }
   };
 
+  const handleExportBundle = async (format) => {
+    if (!canExport) {
+      toast.error("You don't have permission to export data");
+      return;
+    }
+
+    setExporting(`bundle-${format}`);
+    try {
+      const response = await fetchExport(`${BACKEND_URL}/api/export/bundle?format=${format}`);
+      
+      const url = window.URL.createObjectURL(new Blob([response.data]));
+      const link = document.createElement("a");
+      link.href = url;
+      link.setAttribute("download", `dashboards_${new Date().toISOString().split('T')[0]}.${format === "excel" ? "xlsx" : "zip"}`);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+      
+      toast.success("All dashboards exported successfully!");
+    } catch (error) {
+      toast.error("Export failed. Please try again.");
+    } finally {
+      setExporting(null);
+    }
+  };
+
   if (!canExport) {
     return null;
   }
@@ -120,6 +162,14 @@ const ExportPanel = ({ dashboardName, dashboardTitle }) => {
               <FileText className="w-4 h-4 mr-2 text-purple-600" />
               Full Report (PDF)
             </DropdownMenuItem>
+            <DropdownMenuItem onClick={() => handleExportBundle("excel")} disabled={!!exporting}>
+              <FileSpreadsheet className="w-4 h-4 mr-2 text-blue-600" />
+              All Dashboards (Excel)
+            </DropdownMenuItem>
+            <DropdownMenuItem onClick={() => handleExportBundle("pdf")} disabled={!!exporting}>
+              <FileText className="w-4 h-4 mr-2 text-purple-600" />
+              All Dashboards (PDF zip)
+            </DropdownMenuItem>
           </>
         )}
       </DropdownMenuContent>
@@ -176,7 +176,27 @@ const CTTeacherDashboard = () => {
         apiUrl: API
       });
 
-      // Make API calls - the interceptor will merge scope params from localStorage
+      // One batched request for all widgets - the interceptor will merge scope params from localStorage
+      const widgetNames = [
+        "overview",
+        "block-wise",
+        "gender-distribution",
+        "social-category",
+        "qualification",
+        "age-distribution",
+        "service-tenure",
+        "training-demand",
+        "data-quality",
+        "certification"
+      ];
+      const batchRes = await axios.get(`${API}/ctteacher/batch`, {
+        params: { ...requestParams, widgets: widgetNames.join(",") }
+      });
+      const widgets = batchRes?.data?.widgets || {};
+      const failed = Object.keys(batchRes?.data?.errors || {});
+      if (failed.length) {
+        console.warn("CTTeacher widgets failed:", batchRes.data.errors);
+      }
       const [
         overviewRes,
         blockRes,
@@ -188,18 +208,7 @@ const CTTeacherDashboard = () => {
         trainingRes,
         qualityRes,
         certRes
-      ] = await Promise.all([
-        axios.get(`${API}/ctteacher/overview`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/block-wise`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/gender-distribution`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/social-category`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/qualification`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/age-distribution`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/service-tenure`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/training-demand`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/data-quality`, { params: requestParams }),
-        axios.get(`${API}/ctteacher/certification`, { params: requestParams })
-      ]);
+      ] = widgetNames.map((name) => ({ data: widgets[name] }));
       
       // Log successful fetch
       const overviewData = overviewRes?.data || {};